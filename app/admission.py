@@ -0,0 +1,188 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+from fastapi import Depends, HTTPException
+
+from app.auth import redis_client, verify_token
+
+# Peso de cada tienda en unidades de capacidad (~ navegadores/páginas que
+# mantiene abiertos y por cuánto tiempo). Walmart recorre siete sucursales.
+STORE_WEIGHTS: Dict[str, int] = {
+    "walmart": 4,
+    "vidri": 2,
+    "curacao": 2,
+    "prismamoda": 2,
+    "siman": 1,
+    "selectos": 1,
+}
+
+ADMISSION_CAPACITY = int(os.getenv("ADMISSION_CAPACITY", "8"))
+ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", "16"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "30"))
+
+# Token bucket por usuario (sub del JWT): tokens por segundo y ráfaga máxima
+USER_QUOTA_RATE = float(os.getenv("USER_QUOTA_RATE", "0.2"))
+USER_QUOTA_BURST = float(os.getenv("USER_QUOTA_BURST", "10"))
+
+# Recarga y consumo atómicos en Redis. Retorna {permitido, tokens*1000, espera_ms}
+TOKEN_BUCKET_LUA = """
+local key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local state = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait_ms = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  wait_ms = math.ceil((cost - tokens) / rate * 1000)
+end
+redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', key, math.ceil(burst / rate) + 60)
+return {allowed, math.floor(tokens * 1000), wait_ms}
+"""
+
+
+class WeightedLimiter:
+    """
+    Semáforo con pesos y cola FIFO acotada. Un request entra si hay
+    capacidad libre y nadie esperando antes que él; si la cola está llena
+    se rechaza de inmediato en vez de acumular trabajo.
+    """
+
+    def __init__(self, capacity: int, max_queue: int, max_wait: float):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_use = 0
+        self.active = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.admitted = 0
+        self._queue = deque()
+        self._cond = threading.Condition()
+        # Promedio móvil del tiempo que se retiene cada unidad de peso
+        self._avg_hold = 10.0
+
+    def retry_after(self, weight: int) -> int:
+        queued = sum(w for _, w in self._queue)
+        return max(1, math.ceil(self._avg_hold * (queued + weight) / self.capacity))
+
+    def acquire(self, weight: int):
+        weight = min(weight, self.capacity)
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise HTTPException(status_code=503, detail="Servicio saturado, intente más tarde",
+                                    headers={"Retry-After": str(self.retry_after(weight))})
+
+            ticket = (object(), weight)
+            self._queue.append(ticket)
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while self._queue[0] is not ticket or self.in_use + weight > self.capacity:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        raise HTTPException(status_code=503, detail="Tiempo de espera en cola agotado",
+                                            headers={"Retry-After": str(self.retry_after(weight))})
+                    self._cond.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+            self.in_use += weight
+            self.active += 1
+            self.admitted += 1
+
+    def release(self, weight: int, held: float):
+        weight = min(weight, self.capacity)
+        with self._cond:
+            self.in_use -= weight
+            self.active -= 1
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * (held / weight)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "in_use": self.in_use,
+                "active": self.active,
+                "queue_depth": len(self._queue),
+                "queue_limit": self.max_queue,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+                "rejected_quota": quota_rejections,
+                "avg_hold_s_per_unit": round(self._avg_hold, 2)
+            }
+
+
+limiter = WeightedLimiter(ADMISSION_CAPACITY, ADMISSION_QUEUE, ADMISSION_MAX_WAIT)
+quota_rejections = 0
+_token_bucket = redis_client.register_script(TOKEN_BUCKET_LUA)
+
+
+def check_quota(username: str, cost: int):
+    global quota_rejections
+    # Un costo mayor que la ráfaga nunca podría pagarse
+    cost = min(cost, USER_QUOTA_BURST)
+    try:
+        allowed, _, wait_ms = _token_bucket(
+            keys=[f"quota:{username}"],
+            args=[USER_QUOTA_RATE, USER_QUOTA_BURST, cost, time.time()]
+        )
+    except Exception as e:
+        # Sin Redis no se bloquea el servicio; el límite global sigue activo
+        print(f"Cuota no verificada para {username}: {e}")
+        return
+    if not int(allowed):
+        quota_rejections += 1
+        raise HTTPException(status_code=429, detail="Cuota de scraping excedida",
+                            headers={"Retry-After": str(max(1, math.ceil(int(wait_ms) / 1000)))})
+
+
+class Admission:
+    """
+    Admisión diferida de un /scrape/*. El token ya está validado; la cuota
+    y la capacidad se cobran solo cuando hace falta scrapear, así un 304 o
+    un resultado de la caché negativa no cuestan nada.
+    """
+
+    def __init__(self, username: str, store: str):
+        self.username = username
+        self.weight = STORE_WEIGHTS.get(store, 1)
+
+    def charge(self):
+        check_quota(self.username, self.weight)
+
+    @contextmanager
+    def slot(self):
+        """Capacidad global mientras dura el bloque; solo la toma el líder de un vuelo."""
+        limiter.acquire(self.weight)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            limiter.release(self.weight, time.monotonic() - start)
+
+
+def admission(store: str):
+    """Dependencia para las rutas /scrape/*: valida el token y arma la Admission de la tienda."""
+
+    def dependency(username: str = Depends(verify_token)) -> Admission:
+        return Admission(username, store)
+
+    return dependency
@@ -0,0 +1,133 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Servidores de navegador remotos separados por coma. "ws://..." usa el
+# protocolo de Playwright (chromium.connect, p. ej. `playwright run-server`);
+# "cdp+http://..." o "cdp+ws://..." se conecta por CDP (connect_over_cdp) a un
+# Chrome con --remote-debugging-port. Vacío: Chromium local como siempre.
+BROWSER_ENDPOINTS = [e.strip() for e in os.getenv("BROWSER_ENDPOINTS", "").split(",") if e.strip()]
+BROWSER_CONNECT_TIMEOUT = int(os.getenv("BROWSER_CONNECT_TIMEOUT", "10000"))
+# Segundos que un endpoint caído queda fuera de rotación
+BROWSER_RETRY_AFTER = float(os.getenv("BROWSER_RETRY_AFTER", "15"))
+# "1": si ningún servidor responde se lanza Chromium local (necesita la imagen completa)
+BROWSER_LOCAL_FALLBACK = os.getenv("BROWSER_LOCAL_FALLBACK", "0") == "1"
+
+
+class BrowserUnavailable(Exception):
+    pass
+
+
+class EndpointPool:
+    """
+    Balancea sesiones entre servidores de navegador: elige el endpoint sano
+    con menos sesiones abiertas (empate: el que lleva más tiempo sin usarse)
+    y saca de rotación por un rato a los que no aceptan conexión.
+    """
+
+    def __init__(self, endpoints: List[str]):
+        self.endpoints = list(endpoints)
+        self._lock = threading.Lock()
+        self._active: Dict[str, int] = {e: 0 for e in self.endpoints}
+        self._last_used: Dict[str, float] = {e: 0.0 for e in self.endpoints}
+        self._down_until: Dict[str, float] = {e: 0.0 for e in self.endpoints}
+        self.failures: Dict[str, int] = {e: 0 for e in self.endpoints}
+
+    def candidates(self) -> List[str]:
+        """Endpoints en orden de preferencia; los caídos van al final."""
+        with self._lock:
+            now = time.monotonic()
+            return sorted(self.endpoints, key=lambda e: (self._down_until[e] > now,
+                                                         self._active[e],
+                                                         self._last_used[e]))
+
+    def acquire(self, endpoint: str):
+        with self._lock:
+            self._active[endpoint] += 1
+            self._last_used[endpoint] = time.monotonic()
+
+    def release(self, endpoint: str):
+        with self._lock:
+            self._active[endpoint] = max(0, self._active[endpoint] - 1)
+
+    def mark_down(self, endpoint: str):
+        with self._lock:
+            self._down_until[endpoint] = time.monotonic() + BROWSER_RETRY_AFTER
+            self.failures[endpoint] += 1
+
+    def mark_up(self, endpoint: str):
+        with self._lock:
+            self._down_until[endpoint] = 0.0
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                e: {"active": self._active[e], "up": self._down_until[e] <= now, "failures": self.failures[e]}
+                for e in self.endpoints
+            }
+
+
+pool = EndpointPool(BROWSER_ENDPOINTS)
+
+
+def _connect(p, endpoint: str):
+    if endpoint.startswith("cdp+"):
+        return p.chromium.connect_over_cdp(endpoint[len("cdp+"):], timeout=BROWSER_CONNECT_TIMEOUT)
+    return p.chromium.connect(endpoint, timeout=BROWSER_CONNECT_TIMEOUT)
+
+
+def launch(p, headless: bool = True, args: Optional[List[str]] = None):
+    """
+    Reemplazo de p.chromium.launch() para los scrapers. Con endpoints
+    configurados se conecta a un servidor remoto (las flags de lanzamiento
+    las decide el servidor); si el servidor se cae, la siguiente sesión se
+    reconecta a otro de la lista.
+    """
+    if not pool.endpoints:
+        return p.chromium.launch(headless=headless, args=args or [])
+
+    errors = []
+    for endpoint in pool.candidates():
+        try:
+            browser = _connect(p, endpoint)
+        except Exception as e:
+            print(f"Servidor de navegador no disponible {endpoint}: {e}")
+            pool.mark_down(endpoint)
+            errors.append(f"{endpoint}: {e}")
+            continue
+        pool.mark_up(endpoint)
+        pool.acquire(endpoint)
+        browser.on("disconnected", lambda _browser, endpoint=endpoint: pool.release(endpoint))
+        return browser
+
+    if BROWSER_LOCAL_FALLBACK:
+        print("Ningún servidor de navegador respondió, se usa Chromium local")
+        return p.chromium.launch(headless=headless, args=args or [])
+    raise BrowserUnavailable("; ".join(errors))
+
+
+def serve(host: str = "0.0.0.0", port: int = 3000) -> subprocess.Popen:
+    """
+    Servidor de navegador local (`playwright run-server`) para pruebas y
+    para la imagen "browser": cada conexión recibe su propio Chromium.
+    """
+    return subprocess.Popen([sys.executable, "-m", "playwright", "run-server",
+                             "--host", host, "--port", str(port)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de navegador para BROWSER_ENDPOINTS")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=3000)
+    args = parser.parse_args()
+    print(f"Servidor de navegador en ws://{args.host}:{args.port}/")
+    sys.exit(serve(args.host, args.port).wait())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+import anyio.from_thread
+
+from app.deadline import Deadline
+
+# Cortar el scrape cuando el cliente cierra la conexión. Apagado, el
+# scrape sigue hasta el final aunque nadie vaya a leer la respuesta.
+CANCEL_ON_DISCONNECT = os.getenv("CANCEL_ON_DISCONNECT", "1") == "1"
+# Cada cuánto se revisa si el cliente sigue conectado
+DISCONNECT_POLL_S = float(os.getenv("DISCONNECT_POLL_S", "0.5"))
+
+
+class CancelStats:
+    """
+    Por tienda: clientes que se fueron con el scrape en curso, cuántos de
+    esos scrapes se cortaron y cuántos siguieron porque otros requests
+    esperaban el mismo resultado. El trabajo ahorrado se estima contra la
+    duración habitual de un scrape completo de la tienda.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stores: Dict[str, Dict] = {}
+
+    def _entry(self, store: str) -> Dict:
+        return self._stores.setdefault(store, {
+            "disconnects": 0,
+            "cancelled": 0,
+            "kept": 0,
+            "saved_s": 0.0,
+            "skipped_branches": 0,
+            "stop_ms_total": 0.0,
+            "avg_scrape_s": None
+        })
+
+    def completed(self, store: str, elapsed: float):
+        with self._lock:
+            entry = self._entry(store)
+            avg = entry["avg_scrape_s"]
+            entry["avg_scrape_s"] = elapsed if avg is None else 0.8 * avg + 0.2 * elapsed
+
+    def kept(self, store: str):
+        with self._lock:
+            entry = self._entry(store)
+            entry["disconnects"] += 1
+            entry["kept"] += 1
+
+    def cancelled(self, store: str, elapsed: float, stop_s: float, skipped: int = 0):
+        with self._lock:
+            entry = self._entry(store)
+            entry["disconnects"] += 1
+            entry["cancelled"] += 1
+            entry["stop_ms_total"] += stop_s * 1000
+            entry["skipped_branches"] += skipped
+            # Sin scrapes completos previos no hay con qué comparar
+            if entry["avg_scrape_s"] is not None:
+                entry["saved_s"] += max(0.0, entry["avg_scrape_s"] - elapsed)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                store: {
+                    "disconnects": entry["disconnects"],
+                    "cancelled": entry["cancelled"],
+                    "kept": entry["kept"],
+                    "saved_s": round(entry["saved_s"], 1),
+                    "skipped_branches": entry["skipped_branches"],
+                    "avg_stop_ms": round(entry["stop_ms_total"] / entry["cancelled"], 1) if entry["cancelled"] else None,
+                    "avg_scrape_s": round(entry["avg_scrape_s"], 2) if entry["avg_scrape_s"] is not None else None
+                }
+                for store, entry in self._stores.items()
+            }
+
+
+stats = CancelStats()
+
+
+async def _poll(request, on_disconnect: Callable[[], None]):
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_S)
+    on_disconnect()
+
+
+def _start(request, on_disconnect: Callable[[], None]) -> asyncio.Task:
+    # Corre en el hilo del event loop (anyio.from_thread.run_sync)
+    return asyncio.get_running_loop().create_task(_poll(request, on_disconnect))
+
+
+@contextmanager
+def watch(request, store: str, deadline: Deadline, can_cancel: Callable[[], bool], scraper=None):
+    """
+    Vigila la conexión del cliente mientras corre el bloque (un scrape en
+    proceso, desde el hilo del handler). Si se desconecta y `can_cancel()`
+    lo permite (nadie más espera el resultado), cancela `deadline`: el
+    scraper corta en su próximo punto de control, cierra páginas y
+    contextos y libera su turno y la capacidad de admisión.
+    """
+    if not CANCEL_ON_DISCONNECT or request is None:
+        yield
+        return
+
+    started = time.monotonic()
+    cancelled_at = []
+
+    def on_disconnect():
+        if can_cancel():
+            cancelled_at.append(time.monotonic())
+            deadline.cancel()
+        else:
+            stats.kept(store)
+
+    try:
+        task = anyio.from_thread.run_sync(_start, request, on_disconnect)
+    except RuntimeError as e:
+        # Fuera de un hilo de trabajo de anyio no hay event loop al que pedirle
+        print(f"No se vigila la conexión del cliente: {e}")
+        task = None
+
+    try:
+        yield
+        if not deadline.expired():
+            stats.completed(store, time.monotonic() - started)
+    finally:
+        if task is not None:
+            try:
+                anyio.from_thread.run_sync(task.cancel)
+            except RuntimeError:
+                pass
+        if cancelled_at:
+            finished = time.monotonic()
+            stats.cancelled(store, finished - started, finished - cancelled_at[0],
+                            getattr(scraper, "last_skipped", 0))
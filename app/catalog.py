@@ -0,0 +1,281 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Callable, Dict, Hashable, List, Optional
+
+from app.changes import product_key
+from app.product import Product
+from app.utils import data_path
+
+# Catálogo local: todo producto que devuelve un scraper queda indexado
+# (SQLite FTS5) para responder /search sin lanzar navegadores
+CATALOG_PATH = os.getenv("CATALOG_PATH")
+CATALOG_MAX_AGE_DAYS = float(os.getenv("CATALOG_MAX_AGE_DAYS", "30"))
+# /search?refresh=true scrapea en segundo plano si lo local es más viejo que
+# esto o hay menos de CATALOG_MIN_RESULTS resultados
+CATALOG_STALE_AFTER = int(os.getenv("CATALOG_STALE_AFTER", "3600"))
+CATALOG_MIN_RESULTS = int(os.getenv("CATALOG_MIN_RESULTS", "5"))
+CATALOG_REFRESH_WORKERS = int(os.getenv("CATALOG_REFRESH_WORKERS", "4"))
+# Refrescos pendientes (en cola o corriendo); los que no entran se descartan
+CATALOG_REFRESH_QUEUE = int(os.getenv("CATALOG_REFRESH_QUEUE", "32"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    store TEXT NOT NULL,
+    name TEXT NOT NULL,
+    brand TEXT,
+    model TEXT,
+    price REAL,
+    list_price REAL,
+    price_original TEXT,
+    price_discount TEXT,
+    url TEXT,
+    image TEXT,
+    query TEXT,
+    seen_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_store_price ON products (store, price);
+CREATE INDEX IF NOT EXISTS products_seen ON products (seen_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    name, brand, model, store,
+    content='products', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, name, brand, model, store)
+    VALUES (new.id, new.name, new.brand, new.model, new.store);
+END;
+CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, brand, model, store)
+    VALUES ('delete', old.id, old.name, old.brand, old.model, old.store);
+END;
+CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, brand, model, store)
+    VALUES ('delete', old.id, old.name, old.brand, old.model, old.store);
+    INSERT INTO products_fts (rowid, name, brand, model, store)
+    VALUES (new.id, new.name, new.brand, new.model, new.store);
+END;
+"""
+
+UPSERT = """
+INSERT INTO products (key, store, name, brand, model, price, list_price, price_original,
+                      price_discount, url, image, query, seen_at)
+VALUES (:key, :store, :name, :brand, :model, :price, :list_price, :price_original,
+        :price_discount, :url, :image, :query, :seen_at)
+ON CONFLICT (key) DO UPDATE SET
+    name = excluded.name,
+    brand = COALESCE(excluded.brand, products.brand),
+    model = COALESCE(excluded.model, products.model),
+    price = excluded.price,
+    list_price = excluded.list_price,
+    price_original = excluded.price_original,
+    price_discount = excluded.price_discount,
+    url = excluded.url,
+    image = excluded.image,
+    query = excluded.query,
+    seen_at = excluded.seen_at
+"""
+
+# Un solo escritor: SQLite serializa escrituras y así el request no espera el índice
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog")
+_schema_lock = threading.Lock()
+_schema_ready = False
+_writes = 0
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _db() -> sqlite3.Connection:
+    global _schema_ready
+    conn = sqlite3.connect(CATALOG_PATH or data_path("catalog.db"), timeout=10)
+    conn.row_factory = sqlite3.Row
+    if not _schema_ready:
+        with _schema_lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            _schema_ready = True
+    return conn
+
+
+def _row(store: str, query: str, item: Product, now: float) -> Optional[Dict]:
+    key = product_key(item)
+    if not key or not item.name:
+        return None
+    return {
+        "key": f"{store}:{key}",
+        "store": store,
+        "name": item.name,
+        "brand": item.brand,
+        "model": item.model,
+        "price": item.price,
+        "list_price": item.list_price,
+        "price_original": item.price_original,
+        "price_discount": item.price_discount,
+        "url": item.url,
+        "image": item.image,
+        "query": query,
+        "seen_at": now
+    }
+
+
+def index_results(store: str, query: str, results: List[Product]) -> int:
+    """Inserta o actualiza los productos de un scrape. Retorna cuántos se indexaron."""
+    global _writes
+    now = time.time()
+    rows = [row for row in (_row(store, query, item, now) for item in results) if row]
+    if not rows:
+        return 0
+    with closing(_db()) as conn, conn:
+        conn.executemany(UPSERT, rows)
+        _writes += 1
+        if _writes % 100 == 0:
+            conn.execute("DELETE FROM products WHERE seen_at < ?", (now - CATALOG_MAX_AGE_DAYS * 86400,))
+    return len(rows)
+
+
+def _index_safely(store: str, query: str, results: List[Product]):
+    try:
+        index_results(store, query, results)
+    except sqlite3.Error as e:
+        print(f"No se pudo indexar {store}/{query} en el catálogo: {e}")
+
+
+def index_async(store: str, query: str, results: List[Product]):
+    """Encola la indexación en el escritor del catálogo (copia la lista: puede estar compartida)."""
+    _writer.submit(_index_safely, store, query, list(results))
+
+
+def match_expression(query: str) -> Optional[str]:
+    """Consulta FTS5: cada palabra como prefijo, todas obligatorias ("tele" encuentra "televisor")."""
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search(query: str, stores: Optional[List[str]] = None, min_price: Optional[float] = None,
+           max_price: Optional[float] = None, limit: int = 20) -> List[Dict]:
+    """
+    Productos del catálogo ordenados por relevancia BM25 (el nombre pesa
+    más que marca, modelo y tienda), con su antigüedad en segundos.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+    clauses = ["products_fts MATCH ?"]
+    params: List = [expression]
+    if stores:
+        clauses.append(f"p.store IN ({','.join('?' for _ in stores)})")
+        params.extend(stores)
+    if min_price is not None:
+        clauses.append("p.price >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        clauses.append("p.price <= ?")
+        params.append(max_price)
+    sql = f"""
+        SELECT p.*, bm25(products_fts, 10.0, 4.0, 4.0, 1.0) AS score
+        FROM products_fts JOIN products p ON p.id = products_fts.rowid
+        WHERE {' AND '.join(clauses)}
+        ORDER BY score
+        LIMIT ?
+    """
+    now = time.time()
+    with closing(_db()) as conn:
+        rows = conn.execute(sql, (*params, limit)).fetchall()
+    return [{
+        "store": row["store"],
+        "name": row["name"],
+        "brand": row["brand"],
+        "model": row["model"],
+        "price": row["price"],
+        "list_price": row["list_price"],
+        "price_original": row["price_original"],
+        "price_discount": row["price_discount"],
+        "url": row["url"],
+        "image": row["image"],
+        "seen_at": row["seen_at"],
+        "age_s": int(now - row["seen_at"]),
+        # bm25 en SQLite es negativo: más bajo = más relevante
+        "score": round(-row["score"], 3)
+    } for row in rows]
+
+
+def stale_stores(results: List[Dict], stores: List[str], stale_after: int = CATALOG_STALE_AFTER,
+                 min_results: int = CATALOG_MIN_RESULTS) -> List[str]:
+    """
+    Tiendas que conviene volver a scrapear: ninguna si lo local alcanza y
+    está fresco; si no, las que no aportan ningún resultado reciente.
+    """
+    fresh = {item["store"] for item in results if item["age_s"] <= stale_after}
+    newest = min((item["age_s"] for item in results), default=None)
+    if len(results) >= min_results and newest is not None and newest <= stale_after:
+        return []
+    return [store for store in stores if store not in fresh]
+
+
+class RefreshQueue:
+    """
+    Scrapes en segundo plano de /search?refresh=true: uno por clave
+    (tienda, consulta) aunque muchos /search lo pidan, y a lo sumo
+    `max_pending` entre los que esperan y los que corren. Lo que no entra
+    se descarta: el catálogo sigue sirviendo lo que tenía.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self.submitted = 0
+        self.deduped = 0
+        self.dropped = 0
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refresh")
+
+    def pending(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._pending
+
+    def full(self) -> bool:
+        with self._lock:
+            return len(self._pending) >= self.max_pending
+
+    def submit(self, key: Hashable, fn: Callable, *args) -> bool:
+        """Encola fn(*args) salvo que `key` ya esté pendiente o la cola esté llena."""
+        with self._lock:
+            if key in self._pending:
+                self.deduped += 1
+                return False
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending.add(key)
+            self.submitted += 1
+
+        def run():
+            try:
+                fn(*args)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+        self._executor.submit(run)
+        return True
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "max_pending": self.max_pending,
+                "submitted": self.submitted,
+                "deduped": self.deduped,
+                "dropped": self.dropped
+            }
+
+
+refresher = RefreshQueue(CATALOG_REFRESH_WORKERS, CATALOG_REFRESH_QUEUE)
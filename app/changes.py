@@ -0,0 +1,147 @@
+import hashlib
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+import httpx
+import orjson
+
+from app.auth import redis_client
+from app.product import Product
+
+FEED_KEY = "changes:feed"
+FEED_MAXLEN = int(os.getenv("CHANGES_FEED_MAXLEN", "50000"))
+CHANGES_WEBHOOK_URL = os.getenv("CHANGES_WEBHOOK_URL")
+# IDs del stream de Redis: "<ms>-<secuencia>"
+CURSOR_RE = re.compile(r"^\d+-\d+$")
+
+
+def _digest(*parts) -> str:
+    raw = "\x1f".join("" if p is None else str(p) for p in parts)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def product_key(item: Product) -> Optional[str]:
+    return item.url or item.name
+
+
+def product_fingerprint(item: Product) -> str:
+    """Huella compacta de lo que interesa aguas abajo: precio, descuento y stock."""
+    return _digest(item.price_original, item.price_discount, item.stock)
+
+
+def set_fingerprint(fingerprints: Dict[str, str]) -> str:
+    return _digest(*sorted(f"{k}={v}" for k, v in fingerprints.items()))
+
+
+def _summary(item: Product) -> Dict:
+    return {
+        "name": item.name,
+        "price_original": item.price_original,
+        "price_discount": item.price_discount,
+        "stock": item.stock
+    }
+
+
+def record_changes(store: str, query: str, results: List[Product]) -> str:
+    """
+    Compara el resultado con las huellas guardadas para (tienda, consulta),
+    publica en el feed solo los productos agregados, eliminados o con
+    cambio de precio/stock, y retorna la huella del conjunto.
+    """
+    current: Dict[str, str] = {}
+    items: Dict[str, Product] = {}
+    for item in results:
+        key = product_key(item)
+        if not key:
+            continue
+        current[key] = product_fingerprint(item)
+        items[key] = item
+    fingerprint = set_fingerprint(current)
+
+    # Un resultado vacío casi siempre es un scraping fallido (timeout,
+    # bloqueo); no se publican bajas masivas por eso.
+    if not current:
+        return fingerprint
+
+    fp_key = f"changes:fp:{store}:{query}"
+    set_key = f"changes:set:{store}:{query}"
+    try:
+        if redis_client.get(set_key) == fingerprint:
+            return fingerprint
+
+        previous = redis_client.hgetall(fp_key)
+        events = []
+        for key, fp in current.items():
+            if key not in previous:
+                events.append({"type": "added", "url": key, **_summary(items[key])})
+            elif previous[key] != fp:
+                events.append({"type": "repriced", "url": key, **_summary(items[key])})
+        for key in previous:
+            if key not in current:
+                events.append({"type": "removed", "url": key})
+
+        pipe = redis_client.pipeline()
+        for event in events:
+            pipe.xadd(FEED_KEY, {"store": store, "query": query, "event": orjson.dumps(event)},
+                      maxlen=FEED_MAXLEN, approximate=True)
+        pipe.delete(fp_key)
+        pipe.hset(fp_key, mapping=current)
+        pipe.set(set_key, fingerprint)
+        replies = pipe.execute()
+    except Exception as e:
+        print(f"No se pudo registrar cambios de {store}/{query}: {e}")
+        return fingerprint
+
+    if events and CHANGES_WEBHOOK_URL:
+        cursor = replies[len(events) - 1]
+        payload = {"store": store, "query": query, "cursor": cursor, "changes": events}
+        threading.Thread(target=_post_webhook, args=(payload,), daemon=True).start()
+    return fingerprint
+
+
+def _post_webhook(payload: Dict):
+    try:
+        httpx.post(CHANGES_WEBHOOK_URL, content=orjson.dumps(payload),
+                   headers={"Content-Type": "application/json"}, timeout=10)
+    except httpx.HTTPError as e:
+        print(f"Webhook de cambios falló: {e}")
+
+
+def read_changes(since: Optional[str], store: Optional[str] = None,
+                 query: Optional[str] = None, limit: int = 500) -> Dict:
+    """
+    Eventos posteriores al cursor `since` (ID del stream). Sin cursor
+    parte desde el inicio del feed retenido. `query` es la consulta
+    canónica: incluye sus variantes (p. ej. sucursales y modo de Walmart,
+    guardadas como "consulta#variante"). Lanza ValueError si el cursor
+    no es un ID del stream.
+    """
+    if since and not CURSOR_RE.fullmatch(since):
+        raise ValueError(f"Cursor inválido: {since}")
+    start = f"({since}" if since else "-"
+    changes = []
+    cursor = since
+    # Se lee en bloques hasta juntar `limit` eventos que pasen los filtros
+    while len(changes) < limit:
+        entries = redis_client.xrange(FEED_KEY, min=start, max="+", count=limit)
+        if not entries:
+            break
+        for entry_id, fields in entries:
+            cursor = entry_id
+            if store and fields.get("store") != store:
+                continue
+            if query and not _same_query(fields.get("query") or "", query):
+                continue
+            event = orjson.loads(fields["event"])
+            event.update({"id": entry_id, "store": fields.get("store"), "query": fields.get("query")})
+            changes.append(event)
+            if len(changes) >= limit:
+                break
+        start = f"({cursor}"
+    return {"cursor": cursor, "changes": changes}
+
+
+def _same_query(recorded: str, query: str) -> bool:
+    return recorded == query or recorded.startswith(f"{query}#")
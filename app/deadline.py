@@ -0,0 +1,57 @@
+import math
+import threading
+import time
+from typing import Optional
+
+
+class Deadline:
+    """
+    Presupuesto de tiempo de un request (?timeout_ms=). Cada etapa del
+    scraper pide su timeout de siempre a budget() y recibe como mucho lo que
+    queda; los bucles (scroll, extracción, sucursales) consultan expired()
+    para cortar y devolver lo que llevan. Si al terminar el deadline está
+    vencido el resultado se reporta como incompleto.
+
+    Sin timeout_ms no limita nada y budget() devuelve el valor pedido.
+
+    cancel() lo vence de inmediato (el cliente se fue y nadie más espera el
+    resultado): los mismos puntos de corte devuelven lo que llevan y las
+    esperas de Playwright pendientes reciben el mínimo.
+    """
+
+    def __init__(self, timeout_ms: Optional[float] = None):
+        self.timeout_ms = timeout_ms
+        self._expires = time.monotonic() + timeout_ms / 1000 if timeout_ms else None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining_ms(self) -> float:
+        if self._cancelled.is_set():
+            return 0.0
+        if self._expires is None:
+            return math.inf
+        return max(0.0, (self._expires - time.monotonic()) * 1000)
+
+    def expired(self) -> bool:
+        return self._cancelled.is_set() or (self._expires is not None and time.monotonic() >= self._expires)
+
+    def budget(self, ms: float) -> int:
+        """ms acotado al tiempo restante. Nunca 0: en Playwright timeout=0 es infinito."""
+        return max(1, int(min(ms, self.remaining_ms())))
+
+    def budget_s(self, seconds: float) -> float:
+        return self.budget(seconds * 1000) / 1000
+
+    def sleep(self, seconds: float):
+        """time.sleep acotado al tiempo restante; despierta en cuanto se cancela."""
+        self._cancelled.wait(self.budget_s(seconds))
+
+
+class Cancelled(Exception):
+    """El scrape se canceló antes de empezar (p. ej. esperando turno con la tienda)."""
@@ -0,0 +1,153 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import orjson
+
+from app import politeness, static_fetch
+from app.auth import redis_client
+from app.product import Product
+
+ENRICH_TOP_N = int(os.getenv("ENRICH_TOP_N", "5"))
+ENRICH_WORKERS = int(os.getenv("ENRICH_WORKERS", "16"))
+# Tope de espera total: lo que no llegue a tiempo se devuelve sin enriquecer
+# y se termina de cachear en segundo plano para el siguiente request
+ENRICH_TIMEOUT = float(os.getenv("ENRICH_TIMEOUT", "4"))
+ENRICH_CACHE_TTL = int(os.getenv("ENRICH_CACHE_TTL", "3600"))
+
+# Tiendas en VTEX: el detalle sale de la API pública del catálogo
+VTEX_STORES = {"siman", "curacao", "walmart", "prismamoda", "vidri"}
+
+ENRICHED_FIELDS = ("stock", "available", "sku", "seller", "model", "specs")
+
+_executor = ThreadPoolExecutor(max_workers=ENRICH_WORKERS, thread_name_prefix="enrich")
+
+
+def _cache_key(url: str) -> str:
+    return f"enrich:{url}"
+
+
+def _cached(url: str) -> Optional[Dict]:
+    try:
+        raw = redis_client.get(_cache_key(url))
+    except Exception as e:
+        print(f"Caché de detalle no disponible: {e}")
+        return None
+    return orjson.loads(raw) if raw else None
+
+
+def _store_cache(url: str, detail: Dict):
+    try:
+        redis_client.set(_cache_key(url), orjson.dumps(detail), ex=ENRICH_CACHE_TTL)
+    except Exception as e:
+        print(f"Caché de detalle no disponible: {e}")
+
+
+def _vtex_api_url(url: str) -> Optional[str]:
+    parts = urlsplit(url)
+    segments = [s for s in parts.path.split("/") if s]
+    if len(segments) < 2 or segments[-1] != "p":
+        return None
+    return f"{parts.scheme}://{parts.netloc}/api/catalog_system/pub/products/search/{segments[-2]}/p"
+
+
+def parse_vtex_product(data) -> Dict:
+    if not isinstance(data, list) or not data:
+        return {}
+    prod = data[0]
+    items = prod.get("items") or []
+    item = items[0] if items else {}
+    sellers = item.get("sellers") or []
+    seller = next((s for s in sellers if s.get("sellerDefault")), sellers[0] if sellers else {})
+    offer = seller.get("commertialOffer") or {}
+    stock = offer.get("AvailableQuantity")
+    specs = {}
+    for name in prod.get("allSpecifications") or []:
+        values = prod.get(name)
+        if values:
+            specs[name] = ", ".join(str(v) for v in values)
+    return {
+        "stock": stock,
+        "available": bool(stock) if stock is not None else None,
+        "sku": item.get("itemId"),
+        "seller": seller.get("sellerName"),
+        "model": prod.get("productReference") or None,
+        "specs": specs
+    }
+
+
+def parse_jsonld_product(html: str) -> Dict:
+    """Detalle desde el JSON-LD schema.org/Product de la página (tiendas sin API)."""
+    doc = static_fetch.soup(html)
+    for script in doc.select("script[type='application/ld+json']"):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        for node in data if isinstance(data, list) else data.get("@graph", [data]):
+            if not isinstance(node, dict) or node.get("@type") != "Product":
+                continue
+            offers = node.get("offers") or {}
+            if isinstance(offers, list):
+                offers = offers[0] if offers else {}
+            availability = str(offers.get("availability") or "")
+            seller = offers.get("seller") or {}
+            specs = {p.get("name"): str(p.get("value")) for p in node.get("additionalProperty") or []
+                     if isinstance(p, dict) and p.get("name")}
+            return {
+                "stock": None,
+                "available": availability.endswith("InStock") if availability else None,
+                "sku": node.get("sku"),
+                "seller": seller.get("name") if isinstance(seller, dict) else None,
+                "model": node.get("model") or node.get("mpn"),
+                "specs": specs
+            }
+    return {}
+
+
+def fetch_detail(store: str, url: str, user: Optional[str] = None) -> Dict:
+    cached = _cached(url)
+    if cached is not None:
+        return cached
+
+    api_url = _vtex_api_url(url) if store in VTEX_STORES else None
+    # Mismos turnos que los scrapes de la tienda; sin turno dentro de la ventana se omite
+    with politeness.turn(store, user, kind="enrich", timeout=ENRICH_TIMEOUT):
+        if api_url:
+            detail = parse_vtex_product(static_fetch.fetch_json(api_url))
+        else:
+            html = static_fetch.fetch_html(url)
+            detail = parse_jsonld_product(html) if html else {}
+    if detail:
+        _store_cache(url, detail)
+    return detail
+
+
+def enrich(store: str, results: List[Product], top_n: int = ENRICH_TOP_N,
+           timeout: Optional[float] = None, user: Optional[str] = None) -> int:
+    """
+    Completa en el lugar stock, SKU, vendedor, modelo y especificaciones de
+    los primeros `top_n` productos consultando sus detalles en paralelo.
+    No pisa campos que el scraper ya llenó. Retorna cuántos se enriquecieron.
+    """
+    targets = [item for item in results if item.url][:top_n]
+    futures = {_executor.submit(fetch_detail, store, item.url, user): item for item in targets}
+    done, _ = wait(futures, timeout=ENRICH_TIMEOUT if timeout is None else min(timeout, ENRICH_TIMEOUT))
+
+    enriched = 0
+    for future in done:
+        try:
+            detail = future.result()
+        except Exception as e:
+            print(f"Detalle falló para {futures[future].url}: {e}")
+            continue
+        if not detail:
+            continue
+        item = futures[future]
+        for field in ENRICHED_FIELDS:
+            if getattr(item, field) in (None, "") and detail.get(field) not in (None, "", {}):
+                setattr(item, field, detail[field])
+        enriched += 1
+    return enriched
@@ -0,0 +1,287 @@
+import hashlib
+import hmac
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import httpx
+
+from app import static_fetch
+from app.product import Product
+from app.query_cache import SingleFlight
+from app.utils import data_path
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Proxy de imágenes: miniaturas de tamaño fijo servidas desde disco en vez
+# de los originales de cada CDN. Sin Pillow se sirve el original (cacheado).
+IMAGE_SIZES = [int(s) for s in os.getenv("IMAGE_SIZES", "96,160,320,640").split(",") if s.strip()]
+IMAGE_DEFAULT_SIZE = int(os.getenv("IMAGE_DEFAULT_SIZE", "320"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_CACHE_MAX_MB = float(os.getenv("IMAGE_CACHE_MAX_MB", "200"))
+# Originales más grandes que esto no se descargan
+IMAGE_MAX_SOURCE_MB = float(os.getenv("IMAGE_MAX_SOURCE_MB", "8"))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "10"))
+IMAGE_MAX_AGE = int(os.getenv("IMAGE_MAX_AGE", "604800"))
+# Prefijo de las URLs reescritas en las respuestas (p. ej. https://api.ejemplo.com); vacío = relativas
+IMAGE_PROXY_BASE = os.getenv("IMAGE_PROXY_BASE", "").rstrip("/")
+# Firma de las URLs: el proxy solo descarga lo que la API entregó. Clave
+# propia: reutilizar JWT_SECRET expondría el secreto de los tokens a un
+# oráculo HMAC sobre URLs elegidas por terceros
+IMAGE_SIGNING_KEY = os.getenv("IMAGE_SIGNING_KEY", "").encode("utf-8")
+
+logger = logging.getLogger(__name__)
+
+if not IMAGE_SIGNING_KEY:
+    logger.warning("Proxy de imágenes deshabilitado: falta IMAGE_SIGNING_KEY")
+
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+_flights = SingleFlight()
+
+
+class ImageError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def enabled() -> bool:
+    return Image is not None
+
+
+def signing_enabled() -> bool:
+    """Con la clave vacía cualquiera podría firmar URLs: /image queda deshabilitado."""
+    return bool(IMAGE_SIGNING_KEY)
+
+
+def sign(url: str) -> str:
+    return hmac.new(IMAGE_SIGNING_KEY, url.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def verify(url: str, signature: Optional[str]) -> bool:
+    return signing_enabled() and bool(signature) and hmac.compare_digest(sign(url), signature)
+
+
+def proxied_url(url: str, size: Optional[int] = None, fmt: Optional[str] = None) -> str:
+    """URL firmada de /image para la imagen original `url`."""
+    params = {"url": url, "sig": sign(url)}
+    if size:
+        params["w"] = size
+    if fmt:
+        params["fmt"] = fmt
+    return f"{IMAGE_PROXY_BASE}/image?{urlencode(params)}"
+
+
+def rewrite(results: List, size: int, fmt: Optional[str] = None) -> List:
+    """
+    Copias de `results` (Product o filas del catálogo) con `image` apuntando
+    al proxy; la lista puede estar compartida con otros requests. Con el
+    proxy deshabilitado las imágenes quedan como vinieron.
+    """
+    if not signing_enabled():
+        return list(results)
+    out = []
+    for item in results:
+        if isinstance(item, Product):
+            if item.image.startswith(("http://", "https://")):
+                item = item.copy(image=proxied_url(item.image, size, fmt))
+        elif (item.get("image") or "").startswith(("http://", "https://")):
+            item = {**item, "image": proxied_url(item["image"], size, fmt)}
+        out.append(item)
+    return out
+
+
+def snap_size(width: Optional[int]) -> int:
+    """Tamaño fijo más cercano por arriba: pocas variantes por imagen en caché."""
+    if not width:
+        return IMAGE_DEFAULT_SIZE
+    for size in sorted(IMAGE_SIZES):
+        if width <= size:
+            return size
+    return max(IMAGE_SIZES)
+
+
+def negotiate(fmt: Optional[str], accept: str) -> str:
+    """Formato de salida: el pedido, o WebP si el cliente lo acepta. Sin Pillow, siempre el original."""
+    if Image is None:
+        return "original"
+    if fmt in FORMATS or fmt == "original":
+        return fmt
+    return "webp" if "image/webp" in (accept or "") else "jpeg"
+
+
+class DiskLRU:
+    """
+    Variantes ya generadas en $DATA_DIR/images. El índice (tamaño por
+    archivo, en orden de uso) se arma escaneando el directorio la primera
+    vez; cada acierto actualiza el mtime para que el orden sobreviva a un
+    reinicio. Al superar max_bytes se borran las menos usadas.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _load(self):
+        found = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                found.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._total += size
+        self._loaded = True
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            with self._lock:
+                self._total -= self._entries.pop(key, 0)
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._total += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old, size = self._entries.popitem(last=False)
+                self._total -= size
+                self.evictions += 1
+                try:
+                    os.remove(self._path(old))
+                except OSError:
+                    pass
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+cache = DiskLRU(data_path("images"), int(IMAGE_CACHE_MAX_MB * 1024 * 1024))
+
+
+def _fetch(url: str) -> Tuple[bytes, str]:
+    limit = int(IMAGE_MAX_SOURCE_MB * 1024 * 1024)
+    try:
+        with static_fetch.client().stream("GET", url, headers={"Accept": "image/*"},
+                                          timeout=IMAGE_FETCH_TIMEOUT) as resp:
+            if resp.status_code != 200:
+                raise ImageError(502, f"El origen respondió {resp.status_code}")
+            content_type = resp.headers.get("content-type", "").split(";")[0].strip().lower()
+            if not content_type.startswith("image/"):
+                raise ImageError(502, "El origen no devolvió una imagen")
+            chunks, read = [], 0
+            for chunk in resp.iter_bytes():
+                read += len(chunk)
+                if read > limit:
+                    raise ImageError(502, "Imagen de origen demasiado grande")
+                chunks.append(chunk)
+    except httpx.HTTPError as e:
+        print(f"No se pudo descargar la imagen {url}: {e}")
+        raise ImageError(502, "No se pudo descargar la imagen de origen")
+    return b"".join(chunks), content_type
+
+
+def _thumbnail(raw: bytes, size: int, fmt: str) -> bytes:
+    try:
+        img = Image.open(io.BytesIO(raw))
+        # JPEG: decodifica directo a una escala reducida (mucho menos CPU y memoria)
+        img.draft("RGB", (size, size))
+        img.thumbnail((size, size))
+        if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA", "L"):
+            img = img.convert("RGBA")
+        out = io.BytesIO()
+        img.save(out, format=fmt.upper(), quality=IMAGE_QUALITY, **({"method": 4} if fmt == "webp" else {"optimize": True}))
+        return out.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(502, f"Imagen de origen ilegible: {e}")
+
+
+def variant_key(url: str, size: int, fmt: str) -> str:
+    return hashlib.sha256(f"{url}|{size}|{fmt}".encode("utf-8")).hexdigest()
+
+
+def _produce(url: str, size: int, fmt: str, key: str) -> Tuple[bytes, str]:
+    raw, content_type = _fetch(url)
+    if fmt == "original":
+        body = raw
+    else:
+        body, content_type = _thumbnail(raw, size, fmt), FORMATS[fmt]
+    try:
+        cache.put(key, content_type.encode("ascii") + b"\n" + body)
+    except OSError as e:
+        print(f"No se pudo guardar la imagen en caché: {e}")
+    return body, content_type
+
+
+def get(url: str, size: int, fmt: str) -> Tuple[bytes, str]:
+    """
+    (cuerpo, content-type) de la variante pedida. Requests iguales en curso
+    esperan a la misma descarga y conversión.
+    """
+    key = variant_key(url, size, fmt)
+    cached = cache.get(key)
+    if cached is not None:
+        content_type, _, body = cached.partition(b"\n")
+        return body, content_type.decode("ascii")
+    result, _ = _flights.do("image", key, lambda: _produce(url, size, fmt, key))
+    return result
+
+
+def stats() -> Dict:
+    return {**cache.snapshot(), "coalesced": _flights.coalesced, "resize": enabled(), "signing": signing_enabled()}
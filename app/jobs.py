@@ -0,0 +1,97 @@
+import math
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+
+from app.auth import redis_client
+from app.product import from_dicts
+
+# "inline": la API ejecuta los scrapers; "queue": solo encola y espera a los workers
+SCRAPE_EXECUTION = os.getenv("SCRAPE_EXECUTION", "inline")
+
+JOBS_STREAM = os.getenv("JOBS_STREAM", "scrape:jobs")
+DEAD_STREAM = os.getenv("JOBS_DEAD_STREAM", "scrape:dead")
+JOBS_GROUP = os.getenv("JOBS_GROUP", "scrapers")
+JOBS_MAXLEN = int(os.getenv("JOBS_MAXLEN", "10000"))
+
+# Segundos que la API espera un resultado; también marca como colgado un
+# trabajo que lleva ese tiempo sin confirmarse para que otro worker lo tome
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "300"))
+RESULT_GRACE = float(os.getenv("JOB_RESULT_GRACE", "2"))
+# Un trabajo pendiente se reclama recién pasado JOB_TIMEOUT más este margen:
+# ya venció su deadline, así que el reclamo lo descarta en vez de correrlo dos veces
+RECLAIM_MARGIN = float(os.getenv("JOB_RECLAIM_MARGIN", "30"))
+
+
+class JobTimeout(Exception):
+    pass
+
+
+class JobFailed(Exception):
+    pass
+
+
+def enabled() -> bool:
+    return SCRAPE_EXECUTION == "queue"
+
+
+def result_key(job_id: str) -> str:
+    return f"scrape:result:{job_id}"
+
+
+def encode_job(job_id: str, store: str, query: str, kwargs: Dict, attempt: int, deadline: float,
+               budgeted: bool = False, user: str = "") -> Dict[str, str]:
+    return {
+        "id": job_id,
+        "store": store,
+        "query": query,
+        "kwargs": orjson.dumps(kwargs).decode(),
+        "attempt": str(attempt),
+        "deadline": f"{deadline:.3f}",
+        # Con timeout_ms del cliente la API espera menos que JOB_TIMEOUT
+        "budgeted": "1" if budgeted else "0",
+        # Para el reparto justo de turnos por tienda en el worker
+        "user": user
+    }
+
+
+def decode_job(fields: Dict[str, str]) -> Dict:
+    return {
+        "id": fields["id"],
+        "store": fields["store"],
+        "query": fields["query"],
+        "kwargs": orjson.loads(fields.get("kwargs") or "{}"),
+        "attempt": int(fields.get("attempt", "1")),
+        "deadline": float(fields.get("deadline", "0")),
+        "budgeted": fields.get("budgeted") == "1",
+        "user": fields.get("user", "")
+    }
+
+
+def submit(store: str, query: str, kwargs: Optional[Dict] = None,
+           timeout_ms: Optional[float] = None, user: str = "") -> Tuple[List[Dict], Optional[str], bool, Optional[str]]:
+    """
+    Encola un scrape y bloquea hasta que un worker publique el resultado.
+    Retorna (resultados, modo, incompleto, estado) igual que la ejecución en proceso.
+    """
+    job_id = uuid.uuid4().hex
+    budgeted = timeout_ms is not None and timeout_ms / 1000 < JOB_TIMEOUT
+    timeout = timeout_ms / 1000 if budgeted else JOB_TIMEOUT
+    deadline = time.time() + timeout
+    redis_client.xadd(JOBS_STREAM, encode_job(job_id, store, query, kwargs or {}, 1, deadline, budgeted, user),
+                      maxlen=JOBS_MAXLEN, approximate=True)
+
+    # Margen para que el worker publique el parcial después de su deadline
+    wait = math.ceil(timeout + RESULT_GRACE)
+    reply = redis_client.blpop(result_key(job_id), timeout=wait)
+    if reply is None:
+        raise JobTimeout(f"Sin resultado de {store} tras {wait}s")
+    payload = orjson.loads(reply[1])
+    if payload.get("error"):
+        raise JobFailed(payload["error"])
+    return from_dicts(payload["results"]), payload.get("mode"), payload.get("incomplete", False), payload.get("status")
@@ -1,49 +1,347 @@
-from fastapi import FastAPI, Depends, Query
+from contextlib import nullcontext
+from typing import Optional
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+from app import (browser_pool, cancellation, catalog, images, jobs, page_signals, politeness, profiling, snapshots,
+                 static_fetch)
 from app.auth import verify_token
+from app.admission import STORE_WEIGHTS, Admission, admission, check_quota, limiter
+from app.changes import read_changes, record_changes
+from app.deadline import Cancelled, Deadline
+from app.enrich import ENRICH_TOP_N, enrich
+from app.query_cache import (NEGATIVE_CACHE_TTL, fresh_etag, inflight, is_negative, remember_etag,
+                             remember_negative)
+from app.selector_stats import get_store as get_selector_stats
+from app.responses import ResultView, etag_matches, max_age_for, not_modified, scrape_response
+from app.utils import canonicalize_query, search_query
 
 from app.stores.siman_scraper import SimanScraper
 from app.stores.curacao_scraper import CuracaoScraper
 from app.stores.walmart_scraper import WalmartScraper
 from app.stores.prismamoda_scraper import PrismaModaScraper
 from app.stores.superselectos_scraper import SelectosScraper
+from app.stores.vidri_scraper import VidriScraper
+from app.stores import SCRAPERS
 
 
 
 app = FastAPI()
+# Respuesta a un cliente que ya cerró la conexión (convención de nginx); nadie la lee
+CLIENT_CLOSED_REQUEST = 499
+
+@app.get("/stats")
+def stats(username: str = Depends(verify_token)):
+    return {
+        "admission": limiter.stats(),
+        "vidri_strategies": VidriScraper.STRATEGY_STATS.snapshot(),
+        "selectors": get_selector_stats().snapshot(),
+        "static_mode": static_fetch.stats.snapshot(),
+        "coalesced_scrapes": inflight.coalesced,
+        "browser_endpoints": browser_pool.pool.snapshot(),
+        "politeness": politeness.stats(),
+        "images": images.stats(),
+        "cancellations": cancellation.stats.snapshot(),
+        "catalog_refresh": catalog.refresher.snapshot()
+    }
+
+@app.get("/changes")
+def changes(since: Optional[str] = Query(None, description="Cursor devuelto por la llamada anterior"),
+            store: Optional[str] = Query(None),
+            query: Optional[str] = Query(None),
+            limit: int = Query(500, ge=1, le=5000),
+            username: str = Depends(verify_token)):
+    # El feed se guarda por consulta canónica, igual que la caché
+    canonical = canonicalize_query(query) if query else None
+    try:
+        return read_changes(since, store, canonical, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/profiles")
+def profiles(username: str = Depends(verify_token)):
+    return {"profiles": profiling.list_profiles()}
+
+@app.get("/profiles/{profile_id}/{filename}")
+def profile_download(profile_id: str, filename: str, username: str = Depends(verify_token)):
+    path = profiling.profile_file(profile_id, filename)
+    if not path:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return FileResponse(path, filename=f"{profile_id}-{filename}")
+
+@app.get("/snapshots")
+def snapshot_list(store: Optional[str] = Query(None),
+                  query: Optional[str] = Query(None),
+                  since: Optional[float] = Query(None, description="Epoch en segundos"),
+                  limit: int = Query(100, ge=1, le=1000),
+                  username: str = Depends(verify_token)):
+    canonical = canonicalize_query(query) if query else None
+    return {"snapshots": snapshots.list_snapshots(store, canonical, since, limit)}
+
+def _snapshot_or_404(snapshot_id: int):
+    meta = snapshots.get(snapshot_id)
+    if not meta:
+        raise HTTPException(status_code=404, detail="Snapshot no encontrado")
+    return meta
+
+@app.get("/snapshots/{snapshot_id}/html")
+def snapshot_html(snapshot_id: int, username: str = Depends(verify_token)):
+    html = snapshots.load_html(_snapshot_or_404(snapshot_id))
+    if html is None:
+        raise HTTPException(status_code=404, detail="Snapshot no encontrado")
+    return Response(html, media_type="text/html; charset=utf-8")
+
+@app.get("/snapshots/{snapshot_id}/extract")
+def snapshot_extract(snapshot_id: int, username: str = Depends(verify_token)):
+    """Corre el parser actual sobre el DOM archivado: solo CPU, sin navegar."""
+    extracted = snapshots.reextract(_snapshot_or_404(snapshot_id))
+    if extracted is None:
+        raise HTTPException(status_code=404, detail="Snapshot no encontrado")
+    return extracted
+
+@app.post("/snapshots/extract")
+def snapshot_extract_batch(store: Optional[str] = Query(None),
+                           query: Optional[str] = Query(None),
+                           since: Optional[float] = Query(None, description="Epoch en segundos"),
+                           limit: int = Query(100, ge=1, le=1000),
+                           username: str = Depends(verify_token)):
+    """Re-extracción en lote, p. ej. para validar un cambio de selectores contra lo archivado."""
+    canonical = canonicalize_query(query) if query else None
+    extracted = []
+    for meta in snapshots.list_snapshots(store, canonical, since, limit):
+        item = snapshots.reextract(meta)
+        if item is not None:
+            extracted.append(item)
+    return {"snapshots": extracted, "total": len(extracted)}
+
+@app.get("/image")
+def image(request: Request,
+          url: str = Query(..., description="URL original de la imagen, tal como la entregó la API"),
+          sig: str = Query(..., description="Firma que acompaña a la URL en las respuestas"),
+          w: Optional[int] = Query(None, ge=16, le=2048, description="Ancho; se ajusta al tamaño fijo más cercano"),
+          fmt: Optional[str] = Query(None, description="webp, jpeg u original; por defecto según Accept"),
+          username: str = Depends(verify_token)):
+    """Miniatura de una imagen de producto, servida desde la caché en disco."""
+    if not images.signing_enabled():
+        raise HTTPException(status_code=503, detail="Proxy de imágenes deshabilitado: falta IMAGE_SIGNING_KEY")
+    if not url.startswith(("http://", "https://")) or not images.verify(url, sig):
+        raise HTTPException(status_code=403, detail="URL de imagen no firmada por la API")
+    if fmt and fmt not in (*images.FORMATS, "original"):
+        raise HTTPException(status_code=400, detail="Formato no soportado")
+    size = images.snap_size(w)
+    out_fmt = images.negotiate(fmt, request.headers.get("accept", ""))
+    headers = {
+        "ETag": f'"{images.variant_key(url, size, out_fmt)[:32]}"',
+        "Cache-Control": f"private, max-age={images.IMAGE_MAX_AGE}"
+    }
+    if not fmt:
+        headers["Vary"] = "Accept"
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    try:
+        body, content_type = images.get(url, size, out_fmt)
+    except images.ImageError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return Response(content=body, media_type=content_type, headers=headers)
+
+def _scrape(store: str, scraper, query: str, username: str, deadline: Deadline,
+            timeout_ms: Optional[int], scrape_kwargs: dict, admit: Optional[Admission] = None):
+    """
+    Un scrape en proceso o vía workers de `query` (search_query, no la
+    canónica). Retorna (resultados, modo, incompleto, estado).
+
+    La capacidad de admisión se toma antes de la sesión con la tienda:
+    los turnos se piden por navegación y nunca se retienen esperando
+    admisión (ver politeness.session).
+    """
+    with admit.slot() if admit else nullcontext():
+        if jobs.enabled():
+            return jobs.submit(store, query, scrape_kwargs, timeout_ms, username)
+        with politeness.session(store, username, deadline=deadline) as session, profiling.profile(store, query):
+            results = scraper.scrape(query, deadline=deadline, **scrape_kwargs)
+            session.status = getattr(scraper, "last_status", None)
+    return results, getattr(scraper, "last_mode", None), deadline.expired(), getattr(scraper, "last_status", None)
+
+def _run_scrape(request: Request, store: str, scraper, query: str, admit: Admission, view: ResultView,
+                variant: Optional[str] = None, **scrape_kwargs):
+    """
+    La consulta canónica es la clave de caché, deduplicación y feed de
+    cambios; a la tienda va la consulta original recortada (search_query).
+    variant distingue resultados parciales (p. ej. un subconjunto de
+    sucursales).
+
+    Los atajos (304, caché negativa) van antes de cobrar cuota; la
+    capacidad global solo la retiene el request que realmente scrapea.
+    """
+    username = admit.username
+    canonical = canonicalize_query(query)
+    if not canonical:
+        raise HTTPException(status_code=400, detail="Consulta vacía")
+    key = f"{canonical}#{variant}" if variant else canonical
+
+    max_age = max_age_for(store)
+    signature = view.signature()
+    if request.headers.get("if-none-match"):
+        # Sondeo repetido dentro de la ventana de frescura: ni scrape ni cuerpo
+        etag, ttl = fresh_etag(store, key, signature)
+        if etag and etag_matches(request, etag):
+            return not_modified(etag, ttl)
+
+    if is_negative(store, key):
+        meta = {"mode": "negative_cache", "query": canonical}
+        return scrape_response(request, username, [], view, None, meta, min(max_age, NEGATIVE_CACHE_TTL))
+
+    admit.charge()
+    deadline = Deadline(view.timeout_ms)
+    # Solo se comparten scrapes con el mismo presupuesto de tiempo
+    flight_key = f"{key}@{view.timeout_ms}" if view.timeout_ms else key
+
+    def run():
+        # Solo corre en el líder del vuelo. Si su cliente se va y ningún
+        # request coalescido espera el resultado, el scrape se corta. Con
+        # workers el trabajo ya está encolado y no se vigila.
+        # Los coalescidos esperan sin ocupar capacidad.
+        watched = None if jobs.enabled() else request
+        with cancellation.watch(watched, store, deadline, lambda: inflight.abandon(store, flight_key), scraper):
+            return _scrape(store, scraper, search_query(query), username, deadline, view.timeout_ms,
+                           scrape_kwargs, admit)
+
+    try:
+        (results, mode, incomplete, status), shared = inflight.do(store, flight_key, run)
+    except Cancelled:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except jobs.JobTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except jobs.JobFailed as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except politeness.PolitenessTimeout as e:
+        raise HTTPException(status_code=503, detail=f"{e}: demasiados scrapes en cola para la tienda",
+                            headers={"Retry-After": str(e.retry_after)})
+    except browser_pool.BrowserUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Sin servidores de navegador: {e}",
+                            headers={"Retry-After": str(int(browser_pool.BROWSER_RETRY_AFTER))})
+
+    if deadline.cancelled:
+        # Nadie lee la respuesta: lo visto hasta el corte solo va al catálogo
+        catalog.index_async(store, canonical, results)
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+    meta = {"mode": mode, "query": canonical, "coalesced": shared}
+    if status and status != "ok":
+        meta["status"] = status
+    if incomplete:
+        # Un parcial no sirve como "sin resultados" ni como base del feed:
+        # publicaría bajas de productos que simplemente no se alcanzaron a ver
+        meta["incomplete"] = True
+        fingerprint = None
+    else:
+        # Un captcha o una página de error no dicen nada de la consulta
+        if not shared and status not in page_signals.UNRELIABLE and not results:
+            remember_negative(store, key)
+        fingerprint = record_changes(store, key, results)
+
+    if view.enrich and not (fingerprint and view.if_fingerprint == fingerprint):
+        # Copias: la lista puede estar compartida con otros requests coalescidos
+        # y la huella se calcula sin los campos de detalle
+        results = [item.copy() for item in results]
+        meta["enriched"] = enrich(store, results, view.enrich_top or ENRICH_TOP_N,
+                                  timeout=deadline.remaining_ms() / 1000 if view.timeout_ms else None,
+                                  user=username)
+    if not shared:
+        catalog.index_async(store, canonical, results)
+    if incomplete or status in page_signals.UNRELIABLE:
+        return scrape_response(request, username, results, view, fingerprint, meta)
+    response = scrape_response(request, username, results, view, fingerprint, meta, max_age)
+    remember_etag(store, key, signature, response.headers["etag"], max_age)
+    return response
+
+def _refresh_catalog(store: str, canonical: str, query: str, username: str):
+    """
+    Scrape en segundo plano para /search; comparte vuelo con requests
+    iguales en curso y ocupa capacidad de admisión como cualquier scrape
+    (la cuota ya se cobró al encolarlo).
+    """
+    def run():
+        return _scrape(store, SCRAPERS[store](), search_query(query), username, Deadline(), None, {},
+                       Admission(username, store))
+    try:
+        (results, _, incomplete, status), shared = inflight.do(store, canonical, run)
+    except Exception as e:
+        print(f"Refresco de catálogo falló para {store}/{canonical}: {e!r}")
+        return
+    if shared:
+        return
+    if not incomplete and status not in page_signals.UNRELIABLE:
+        record_changes(store, canonical, results)
+    catalog.index_async(store, canonical, results)
+
+@app.get("/search")
+def search(query: str = Query(...),
+           store: Optional[str] = Query(None, description="Tiendas separadas por coma, p. ej. siman,curacao"),
+           min_price: Optional[float] = Query(None, ge=0),
+           max_price: Optional[float] = Query(None, ge=0),
+           limit: int = Query(20, ge=1, le=200),
+           refresh: bool = Query(False, description="Scrapear en segundo plano si lo local está viejo o no alcanza"),
+           thumb: Optional[int] = Query(None, ge=16, le=2048, description="Ancho de miniatura: image pasa por /image"),
+           username: str = Depends(verify_token)):
+    """Búsqueda en el catálogo local de productos ya scrapeados: no lanza navegadores."""
+    canonical = canonicalize_query(query)
+    if not canonical:
+        raise HTTPException(status_code=400, detail="Consulta vacía")
+    stores = [s.strip() for s in store.split(",") if s.strip()] if store else None
+    unknown = [s for s in stores or [] if s not in SCRAPERS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Tiendas desconocidas: {', '.join(unknown)}")
+
+    results = catalog.search(canonical, stores, min_price, max_price, limit)
+    if thumb:
+        results = images.rewrite(results, images.snap_size(thumb))
+    refreshing = []
+    if refresh:
+        for name in catalog.stale_stores(results, stores or list(SCRAPERS)):
+            key = (name, canonical)
+            if catalog.refresher.pending(key):
+                # Ya lo pidió otro /search: no se cobra ni se encola de nuevo
+                refreshing.append(name)
+                continue
+            if catalog.refresher.full():
+                break
+            try:
+                # Cada refresco cuesta cuota como un scrape normal
+                check_quota(username, STORE_WEIGHTS.get(name, 1))
+            except HTTPException:
+                break
+            if catalog.refresher.submit(key, _refresh_catalog, name, canonical, query, username):
+                refreshing.append(name)
+    return {"query": canonical, "total": len(results), "results": results, "refreshing": refreshing}
 
 @app.get("/scrape/siman")
-def scrape_siman(query: str = Query(...), username: str = Depends(verify_token)):
-    scraper = SimanScraper()
-    results = scraper.scrape(query)
-    return {"user": username, "results": results}
+def scrape_siman(request: Request, query: str = Query(...), view: ResultView = Depends(), admit: Admission = Depends(admission("siman"))):
+    return _run_scrape(request, "siman", SimanScraper(), query, admit, view)
 
 @app.get("/scrape/curacao")
-def scrape_curacao(query: str = Query(...), username: str = Depends(verify_token)):
-    scraper = CuracaoScraper()
-    results = scraper.scrape(query)
-    return {"user": username, "results": results}
+def scrape_curacao(request: Request, query: str = Query(...), view: ResultView = Depends(), admit: Admission = Depends(admission("curacao"))):
+    return _run_scrape(request, "curacao", CuracaoScraper(), query, admit, view)
 
 @app.get("/scrape/walmart")
-def scrape_walmart(query: str = Query(...), username: str = Depends(verify_token)):
-    scraper = WalmartScraper()
-    results = scraper.scrape(query)
-    return {"user": username, "results": results}
+def scrape_walmart(request: Request, query: str = Query(...), view: ResultView = Depends(), admit: Admission = Depends(admission("walmart")),
+                   branches: Optional[str] = Query(None, description="Sucursales separadas por coma, p. ej. escalon,santa_ana"),
+                   mode: str = Query("all", pattern="^(all|any|first|best_price)$")):
+    try:
+        selected = WalmartScraper.resolve_branches(branches.split(",") if branches else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    variant = None if (branches is None and mode == "all") else f"{','.join(selected)}:{mode}"
+    return _run_scrape(request, "walmart", WalmartScraper(), query, admit, view, variant=variant,
+                       branches=selected, mode=mode)
 
 @app.get("/scrape/prismamoda")
-def scrape_prismamoda(query: str = Query(...), username: str = Depends(verify_token)):
-    scraper = PrismaModaScraper()
-    results = scraper.scrape(query)
-    return {"user": username, "results": results}
+def scrape_prismamoda(request: Request, query: str = Query(...), view: ResultView = Depends(), admit: Admission = Depends(admission("prismamoda"))):
+    return _run_scrape(request, "prismamoda", PrismaModaScraper(), query, admit, view)
 
 @app.get("/scrape/selectos")
-def scrape_selectos(query: str = Query(...), username: str = Depends(verify_token)):
-    scraper = SelectosScraper()
-    results = scraper.scrape(query)
-    return {"user": username, "results": results}
+def scrape_selectos(request: Request, query: str = Query(...), view: ResultView = Depends(), admit: Admission = Depends(admission("selectos"))):
+    return _run_scrape(request, "selectos", SelectosScraper(), query, admit, view)
 
 @app.get("/scrape/vidri")
-def scrape_vidri(query: str = Query(...), username: str = Depends(verify_token)):
-    from app.stores.vidri_scraper import VidriScraper
-    scraper = VidriScraper()
-    results = scraper.scrape(query)
-    return {"user": username, "results": results}
\ No newline at end of file
+def scrape_vidri(request: Request, query: str = Query(...), view: ResultView = Depends(), admit: Admission = Depends(admission("vidri"))):
+    return _run_scrape(request, "vidri", VidriScraper(), query, admit, view)
\ No newline at end of file
@@ -0,0 +1,157 @@
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+# Estados que una página puede mostrar en vez de productos
+NO_RESULTS = "no_results"
+BLOCKED = "blocked"
+ERROR = "error"
+READY = "ready"
+TIMEOUT = "timeout"
+
+# Orden de evaluación: un bot wall suele traer texto genérico que también
+# parecería "sin resultados", así que se revisa primero.
+ORDER = (BLOCKED, ERROR, NO_RESULTS)
+
+# Estados que no dicen nada de la consulta: no van a la caché negativa
+# ni al feed de cambios
+UNRELIABLE = (BLOCKED, ERROR, TIMEOUT)
+
+COMMON_BLOCKED = {
+    # Sin ".g-recaptcha" ni iframes de reCAPTCHA: aparecen en formularios
+    # normales (newsletter, login) y cortarían búsquedas válidas.
+    "selectors": ["#challenge-form", "#cf-challenge-running", "#px-captcha"],
+    "text": [
+        r"verifica(r)? que (eres|no eres un) (humano|robot)",
+        r"are you a robot", r"attention required", r"access denied",
+        r"acceso denegado", r"unusual traffic", r"tráfico inusual"
+    ]
+}
+
+COMMON_ERROR = {
+    "selectors": [],
+    "text": [
+        r"\berror 5\d\d\b", r"service unavailable", r"bad gateway",
+        r"algo sali[oó] mal", r"p[aá]gina no encontrada", r"estamos en mantenimiento"
+    ]
+}
+
+VTEX_NO_RESULTS = {
+    "selectors": [
+        ".vtex-search-result-3-x-searchNotFound",
+        "[class*='searchNotFound']",
+        "[class*='notFound--layout']"
+    ],
+    "text": [
+        r"no (encontramos|se encontraron) (ning[uú]n )?(resultados|productos)",
+        r"lo sentimos,? no encontramos",
+        r"tu b[uú]squeda .{0,40} no (obtuvo|arroj[oó]) resultados"
+    ]
+}
+
+
+def signals(no_results: Optional[Dict] = None, blocked: Optional[Dict] = None,
+            error: Optional[Dict] = None) -> Dict[str, Dict[str, List[str]]]:
+    """Firmas de una tienda: las comunes de bloqueo/error más las propias."""
+    def merge(base: Dict, extra: Optional[Dict]) -> Dict[str, List[str]]:
+        extra = extra or {}
+        return {
+            "selectors": base["selectors"] + extra.get("selectors", []),
+            "text": base["text"] + extra.get("text", [])
+        }
+    return {
+        BLOCKED: merge(COMMON_BLOCKED, blocked),
+        ERROR: merge(COMMON_ERROR, error),
+        NO_RESULTS: merge({"selectors": [], "text": []}, no_results)
+    }
+
+
+# Un solo predicado evaluado dentro de la página en cada sondeo: la espera
+# de productos y las firmas se vigilan a la vez sin hilos del lado Python.
+_OUTCOME_JS = """
+(cfg) => {
+  if (cfg.ready && document.querySelector(cfg.ready)) return 'ready';
+  const body = document.body ? document.body.innerText.slice(0, 20000) : '';
+  for (const [name, sig] of cfg.order) {
+    for (const sel of sig.selectors) {
+      try { if (document.querySelector(sel)) return name; } catch (e) {}
+    }
+    for (const pattern of sig.text) {
+      if (new RegExp(pattern, 'i').test(body)) return name;
+    }
+  }
+  return false;
+}
+"""
+
+
+def _config(ready: str, store_signals: Dict) -> Dict:
+    return {"ready": ready, "order": [[name, store_signals[name]] for name in ORDER]}
+
+
+def wait_for_outcome(page, ready: str, store_signals: Dict, timeout_ms: int, poll_ms: int = 250,
+                     stop: Optional[Callable[[], bool]] = None) -> str:
+    """
+    Espera lo primero que ocurra: aparecen productos (`ready`), o la página
+    muestra "sin resultados", un captcha/bot wall o un error. Retorna el
+    estado correspondiente o TIMEOUT. Con `stop` (p. ej. deadline.expired)
+    espera en tramos de poll_ms y corta entre uno y otro.
+    """
+    cfg = _config(ready, store_signals)
+    if stop is None:
+        return _outcome(page, cfg, timeout_ms, poll_ms)
+    end = time.monotonic() + timeout_ms / 1000
+    while True:
+        remaining = int((end - time.monotonic()) * 1000)
+        if remaining <= 0 or stop():
+            return TIMEOUT
+        state = _outcome(page, cfg, min(poll_ms, remaining), poll_ms)
+        if state != TIMEOUT:
+            return state
+
+
+def _outcome(page, cfg: Dict, timeout_ms: int, poll_ms: int) -> str:
+    try:
+        handle = page.wait_for_function(_OUTCOME_JS, arg=cfg, timeout=timeout_ms, polling=poll_ms)
+        return handle.json_value() or TIMEOUT
+    except Exception:
+        return TIMEOUT
+
+
+def check(page, ready: str, store_signals: Dict) -> Optional[str]:
+    """
+    Un solo sondeo de wait_for_outcome, sin esperar: READY, el estado de la
+    firma que coincide o None. Para quien ya intercala sus propias esperas
+    (p. ej. las estrategias de StrategyRace).
+    """
+    try:
+        return page.evaluate(_OUTCOME_JS, _config(ready, store_signals)) or None
+    except Exception:
+        return None
+
+
+def classify_html(doc, store_signals: Dict) -> Optional[str]:
+    """Mismas firmas sobre HTML estático (BeautifulSoup); None si ninguna coincide."""
+    body = doc.get_text(" ", strip=True)[:20000]
+    for name in ORDER:
+        sig = store_signals[name]
+        for selector in sig["selectors"]:
+            try:
+                if doc.select_one(selector) is not None:
+                    return name
+            except Exception:
+                continue
+        for pattern in sig["text"]:
+            if re.search(pattern, body, re.IGNORECASE):
+                return name
+    return None
+
+
+def summarize(statuses: List[Optional[str]], has_results: bool) -> str:
+    """Estado de un scrape con varias páginas (p. ej. sucursales de Walmart)."""
+    if has_results:
+        return "ok"
+    for name in ORDER:
+        if name in statuses:
+            return name
+    return "ok"
@@ -0,0 +1,361 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from app import waits
+from app.deadline import Cancelled, Deadline
+
+# Turnos simultáneos y separación mínima (s) entre arranques hacia cada
+# tienda. Son techos: el planificador baja de ahí si la tienda frena.
+STORE_CONCURRENCY: Dict[str, int] = {
+    "walmart": 2,
+    "vidri": 2,
+    "curacao": 3,
+    "prismamoda": 3,
+    "siman": 4,
+    "selectos": 4,
+}
+STORE_MIN_INTERVAL: Dict[str, float] = {
+    "walmart": 1.0,
+    "vidri": 0.5,
+    "curacao": 0.5,
+    "prismamoda": 0.5,
+    "siman": 0.25,
+    "selectos": 0.25,
+}
+
+POLITENESS_ENABLED = os.getenv("POLITENESS_ENABLED", "1") == "1"
+POLITENESS_MAX_WAIT = float(os.getenv("POLITENESS_MAX_WAIT", "60"))
+POLITENESS_MAX_INTERVAL = float(os.getenv("POLITENESS_MAX_INTERVAL", "15"))
+# Latencia reciente por encima de este múltiplo de la habitual cuenta como freno
+POLITENESS_LATENCY_FACTOR = float(os.getenv("POLITENESS_LATENCY_FACTOR", "2.5"))
+# Una sola bajada por ventana: varios turnos que fallan juntos son el mismo evento
+POLITENESS_COOLDOWN = float(os.getenv("POLITENESS_COOLDOWN", "10"))
+# Cada cuánto revisa la cola si quien espera fue cancelado
+CANCEL_CHECK_INTERVAL = 0.25
+
+THROTTLE_CODES = (403, 429)
+
+_local = threading.local()
+
+
+class PolitenessTimeout(Exception):
+    def __init__(self, store: str, retry_after: int):
+        super().__init__(f"Sin turno para {store}")
+        self.store = store
+        self.retry_after = retry_after
+
+
+class Slot:
+    """Turno concedido. El scraper marca aquí lo que vio (429/403, bot wall)."""
+
+    def __init__(self, scheduler: Optional["StoreScheduler"], flow: Tuple[str, str], waited: float):
+        self.scheduler = scheduler
+        self.flow = flow
+        self.waited = waited
+        self.started = time.monotonic()
+        self.throttled = False
+        self.failed = False
+        self.status: Optional[str] = None
+
+
+class StoreScheduler:
+    """
+    Turnos hacia una tienda: a lo sumo `limit` trabajos a la vez y
+    `interval` segundos entre arranques. Cada flujo (usuario, tipo de
+    trabajo) tiene su cola y los flujos se atienden en round robin, así que
+    un usuario con muchos requests no acapara la tienda.
+
+    Ante 429/403, un bot wall o latencia en alza reduce a la mitad la
+    concurrencia y duplica el intervalo; con cada turno sano se recupera
+    de a poco hasta los techos configurados.
+    """
+
+    def __init__(self, store: str, max_concurrency: int, min_interval: float):
+        self.store = store
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self.limit = float(max_concurrency)
+        self.interval = min_interval
+        self.active = 0
+        self.granted = 0
+        self.timeouts = 0
+        self.abandoned = 0
+        self.backoffs = 0
+        self.max_wait = 0.0
+        self._avg_wait = 0.0
+        self._flows: "OrderedDict[Tuple[str, str], deque]" = OrderedDict()
+        self._next_start = 0.0
+        self._last_backoff = 0.0
+        # tipo de trabajo -> [latencia habitual, latencia reciente, muestras]
+        self._latency: Dict[str, list] = {}
+        self._cond = threading.Condition()
+
+    def _head(self):
+        for queue in self._flows.values():
+            return queue[0]
+        return None
+
+    def _queued(self) -> int:
+        return sum(len(q) for q in self._flows.values())
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_wait + self.interval * (self._queued() + 1)))
+
+    def acquire(self, flow: Tuple[str, str], timeout: float,
+                cancelled: Optional[Callable[[], bool]] = None) -> Slot:
+        ticket = object()
+        start = time.monotonic()
+        deadline = start + timeout
+        granted = False
+        with self._cond:
+            self._flows.setdefault(flow, deque()).append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wake = deadline
+                    if self._head() is ticket and self.active < int(self.limit):
+                        if now >= self._next_start:
+                            break
+                        wake = min(deadline, self._next_start)
+                    if cancelled is not None and cancelled():
+                        # Nadie espera ya este turno: deja la cola a los demás
+                        self.abandoned += 1
+                        raise Cancelled(f"Scrape de {self.store} cancelado en cola")
+                    if now >= deadline:
+                        self.timeouts += 1
+                        raise PolitenessTimeout(self.store, self._retry_after())
+                    if cancelled is not None:
+                        wake = min(wake, now + CANCEL_CHECK_INTERVAL)
+                    self._cond.wait(wake - now)
+                granted = True
+            finally:
+                queue = self._flows[flow]
+                queue.remove(ticket)
+                if not queue:
+                    del self._flows[flow]
+                elif granted:
+                    # Atendido: el resto de su cola pasa detrás de los demás flujos
+                    self._flows.move_to_end(flow)
+                self._cond.notify_all()
+
+            self.active += 1
+            self.granted += 1
+            self._next_start = now + self.interval
+            waited = now - start
+            self._avg_wait = 0.8 * self._avg_wait + 0.2 * waited
+            self.max_wait = max(self.max_wait, waited)
+        return Slot(self, flow, waited)
+
+    def release(self, slot: Slot):
+        elapsed = time.monotonic() - slot.started
+        with self._cond:
+            self.active -= 1
+            if slot.throttled or slot.status == "blocked":
+                self._backoff("bloqueo")
+            elif not slot.failed:
+                self._observe_latency(slot.flow[1], elapsed)
+            self._cond.notify_all()
+
+    def penalize(self, reason: str):
+        """Frenada por algo que se vio fuera de un turno (p. ej. bot wall al clasificar la página)."""
+        with self._cond:
+            self._backoff(reason)
+
+    def _observe_latency(self, kind: str, elapsed: float):
+        entry = self._latency.setdefault(kind, [elapsed, elapsed, 0])
+        entry[1] = 0.7 * entry[1] + 0.3 * elapsed
+        entry[2] += 1
+        slow = entry[2] >= 5 and entry[1] > entry[0] * POLITENESS_LATENCY_FACTOR
+        entry[0] = 0.95 * entry[0] + 0.05 * elapsed
+        if slow:
+            self._backoff("latencia")
+        else:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self.interval = max(self.min_interval, self.interval * 0.9)
+
+    def _backoff(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_backoff < POLITENESS_COOLDOWN:
+            return
+        self._last_backoff = now
+        self.backoffs += 1
+        self.limit = max(1.0, self.limit / 2)
+        self.interval = min(POLITENESS_MAX_INTERVAL, max(self.interval * 2, self.min_interval, 0.5))
+        print(f"Frenando {self.store} ({reason}): {int(self.limit)} a la vez, {self.interval:.1f}s entre arranques")
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            return {
+                "concurrency": int(self.limit),
+                "max_concurrency": self.max_concurrency,
+                "interval_s": round(self.interval, 2),
+                "active": self.active,
+                "queued": self._queued(),
+                "flows": len(self._flows),
+                "granted": self.granted,
+                "timeouts": self.timeouts,
+                "abandoned": self.abandoned,
+                "backoffs": self.backoffs,
+                "avg_wait_ms": round(self._avg_wait * 1000, 1),
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+                "latency_ms": {kind: round(entry[0] * 1000, 1) for kind, entry in self._latency.items()}
+            }
+
+
+_schedulers: Dict[str, StoreScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def scheduler(store: str) -> StoreScheduler:
+    with _schedulers_lock:
+        if store not in _schedulers:
+            _schedulers[store] = StoreScheduler(store, STORE_CONCURRENCY.get(store, 2),
+                                                STORE_MIN_INTERVAL.get(store, 0.5))
+        return _schedulers[store]
+
+
+def current() -> Optional[Slot]:
+    return getattr(_local, "slot", None)
+
+
+def observe_status(code: int):
+    """Lo llaman los fetch HTTP: un 429/403 dentro de un turno frena a la tienda."""
+    slot = current()
+    if slot is not None and code in THROTTLE_CODES:
+        slot.throttled = True
+
+
+@contextmanager
+def turn(store: str, user: Optional[str], kind: str = "scrape", timeout: Optional[float] = None,
+         cancelled: Optional[Callable[[], bool]] = None):
+    """
+    Espera turno para golpear a `store` y lo retiene mientras dura el
+    bloque. `timeout` acota la espera en cola (p. ej. lo que queda del
+    deadline del request); sin turno a tiempo lanza PolitenessTimeout.
+    Si `cancelled()` pasa a True mientras espera, sale de la cola con Cancelled.
+    """
+    flow = (user or "-", kind)
+    held = current()
+    if not POLITENESS_ENABLED or (held is not None and held.scheduler is not None and held.scheduler.store == store):
+        # Apagado, o el hilo ya tiene turno con esta tienda (evita esperar por sí mismo)
+        yield held or Slot(None, flow, 0.0)
+        return
+
+    sched = scheduler(store)
+    wait = POLITENESS_MAX_WAIT if timeout is None else min(timeout, POLITENESS_MAX_WAIT)
+    slot = sched.acquire(flow, max(0.0, wait), cancelled)
+    _local.slot = slot
+    try:
+        yield slot
+    except Exception:
+        slot.failed = True
+        raise
+    finally:
+        _local.slot = held
+        sched.release(slot)
+
+
+class Session:
+    """Scrape de un usuario contra una tienda; cada navegación o fetch pide su turno con hit()."""
+
+    def __init__(self, scheduler: Optional[StoreScheduler], flow: Tuple[str, str], deadline: Optional[Deadline]):
+        self.scheduler = scheduler
+        self.flow = flow
+        self.deadline = deadline
+        self.hits = 0
+        self.status: Optional[str] = None
+
+    def acquire(self) -> Slot:
+        remaining = self.deadline.remaining_ms() / 1000 if self.deadline else POLITENESS_MAX_WAIT
+        cancelled = (lambda: self.deadline.cancelled) if self.deadline else None
+        return self.scheduler.acquire(self.flow, max(0.0, min(remaining, POLITENESS_MAX_WAIT)), cancelled)
+
+
+@contextmanager
+def session(store: str, user: Optional[str], kind: str = "scrape", deadline: Optional[Deadline] = None):
+    """
+    Un scrape completo contra `store`. No retiene turno por sí misma: cada
+    navegación o fetch dentro del bloque pide el suyo con hit() y lo
+    suelta al terminar, de modo que concurrencia e intervalo se respetan
+    por golpe a la tienda y no por scrape. Nadie espera capacidad de
+    admisión con un turno en mano (quien llama la toma antes de abrir la
+    sesión), así que las dos colas no se bloquean entre sí. El deadline
+    acota cada espera; cancelado, la espera termina con Cancelled. Al
+    salir, `status` "blocked" frena a la tienda.
+    """
+    flow = (user or "-", kind)
+    if not POLITENESS_ENABLED:
+        yield Session(None, flow, deadline)
+        return
+
+    sched = scheduler(store)
+    sess = Session(sched, flow, deadline)
+    previous = getattr(_local, "session", None)
+    _local.session = sess
+    try:
+        yield sess
+    finally:
+        _local.session = previous
+        if sess.status == "blocked":
+            sched.penalize("bloqueo")
+
+
+@contextmanager
+def hit(store: Optional[str]):
+    """
+    Turno para una navegación o fetch hacia `store` dentro de la sesión del
+    hilo. Sin sesión (un scraper usado suelto) no espera; si el hilo ya
+    tiene turno con la tienda (enrich) lo reutiliza.
+    """
+    held = current()
+    sess: Optional[Session] = getattr(_local, "session", None)
+    if (held is not None and held.scheduler is not None and held.scheduler.store == store) \
+            or sess is None or sess.scheduler is None or sess.scheduler.store != store:
+        yield held
+        return
+
+    slot = sess.acquire()
+    _local.slot = slot
+    try:
+        yield slot
+    except Exception:
+        slot.failed = True
+        raise
+    finally:
+        _local.slot = held
+        sess.hits += 1
+        sess.scheduler.release(slot)
+
+
+def goto(page, store: str, url: str, deadline: Optional[Deadline] = None, **kwargs):
+    """
+    page.goto con turno de la tienda; el status de la respuesta cuenta para
+    frenar igual que en los fetch. Con `deadline`, page.goto solo espera la
+    respuesta ("commit") y la carga hasta `wait_until` se espera en tramos
+    (waits.load_state): un cancel() no queda detrás de 30 s de carga.
+    """
+    wait_until = kwargs.pop("wait_until", "load") if deadline is not None else None
+    started = time.monotonic()
+    with hit(store):
+        if deadline is None:
+            response = page.goto(url, **kwargs)
+        else:
+            response = page.goto(url, wait_until="commit", **kwargs)
+        if response is not None:
+            observe_status(response.status)
+        if wait_until not in (None, "commit"):
+            # El mismo timeout que cubría la navegación completa
+            waits.load_state(page, deadline, wait_until,
+                             kwargs.get("timeout", 30000) - (time.monotonic() - started) * 1000)
+    return response
+
+
+def stats() -> Dict[str, Dict]:
+    with _schedulers_lock:
+        items = list(_schedulers.items())
+    return {store: sched.snapshot() for store, sched in items}
@@ -0,0 +1,99 @@
+import sys
+from typing import Dict, List, Optional
+
+from app.utils import parse_price
+
+# Campos opcionales: solo se serializan si tienen valor, así cada tienda
+# entrega las mismas claves que antes más lo que agregue enrich/Walmart
+OPTIONAL_FIELDS = ("brand", "model", "stock", "available", "sku", "seller", "specs",
+                   "available_stores", "best_price_store", "stores_count")
+
+
+class Product:
+    """
+    Producto de cualquier tienda. Con __slots__ cada instancia ocupa una
+    fracción de un dict con las mismas claves, y el nombre de la tienda
+    se comparte (sys.intern) entre todos los productos de esa tienda.
+
+    price_original/price_discount son los textos tal como los muestra la
+    tienda; price (vigente: el descuento si lo hay) y list_price (el de
+    lista, solo si hay descuento) son los mismos valores ya numéricos.
+    """
+
+    __slots__ = ("store", "name", "url", "image", "price_original", "price_discount", "price", "list_price",
+                 "brand", "model", "stock", "available", "sku", "seller", "specs",
+                 "available_stores", "best_price_store", "stores_count")
+
+    def __init__(self, store: str, name: str, price_original: str = "", price_discount: str = "",
+                 url: str = "", image: str = "", brand: Optional[str] = None, model: Optional[str] = None,
+                 stock=None):
+        self.store = sys.intern(store)
+        self.name = name
+        self.url = url or ""
+        self.image = image or ""
+        self.brand = brand
+        self.model = model
+        self.stock = stock
+        self.available = None
+        self.sku = None
+        self.seller = None
+        self.specs = None
+        self.available_stores = None
+        self.best_price_store = None
+        self.stores_count = None
+        self.set_prices(price_original, price_discount)
+
+    def set_prices(self, original: Optional[str], discount: Optional[str]):
+        """Actualiza los textos de precio y sus valores numéricos juntos."""
+        self.price_original = original or ""
+        self.price_discount = discount or ""
+        self.price = parse_price(self.price_discount) or parse_price(self.price_original)
+        self.list_price = parse_price(self.price_original) if self.price_discount else None
+
+    def to_dict(self) -> Dict:
+        out = {
+            "store": self.store,
+            "name": self.name,
+            "price_original": self.price_original,
+            "price_discount": self.price_discount,
+            "price": self.price,
+            "list_price": self.list_price,
+            "url": self.url,
+            "image": self.image
+        }
+        for field in OPTIONAL_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                out[field] = value
+        return out
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Product":
+        """Inverso de to_dict (resultados que vuelven de un worker por Redis)."""
+        product = cls(data.get("store") or "", data.get("name") or "", data.get("price_original"),
+                      data.get("price_discount"), data.get("url"), data.get("image"))
+        for field in OPTIONAL_FIELDS:
+            if data.get(field) is not None:
+                setattr(product, field, data[field])
+        return product
+
+    def copy(self, **changes) -> "Product":
+        clone = Product.__new__(Product)
+        for field in Product.__slots__:
+            setattr(clone, field, changes.get(field, getattr(self, field)))
+        return clone
+
+    def __repr__(self) -> str:
+        return f"Product({self.store!r}, {self.name!r}, {self.price!r})"
+
+
+def json_default(obj):
+    """Hook `default` de orjson: los Product se serializan sin pasar por listas de dicts."""
+    if isinstance(obj, Product):
+        return obj.to_dict()
+    raise TypeError
+
+
+def from_dicts(items: List[Dict]) -> List[Product]:
+    # Entradas {"store", "error"} de workers con versiones previas no son productos
+    return [Product.from_dict(item) for item in items if "error" not in item]
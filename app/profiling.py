@@ -0,0 +1,196 @@
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from app.utils import data_path
+
+# Opt-in: sin umbral ni muestreo no se traza nada
+PROFILE_THRESHOLD_MS = float(os.getenv("PROFILE_THRESHOLD_MS", "0"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+_local = threading.local()
+_ring_lock = threading.Lock()
+
+
+def profiles_dir() -> str:
+    return os.path.dirname(data_path("profiles", "_"))
+
+
+class StackSampler:
+    """
+    Perfilador por muestreo: cada N ms toma la pila del hilo objetivo y
+    cuenta las pilas colapsadas (formato "folded" de flamegraph.pl/speedscope).
+    """
+
+    def __init__(self, thread_id: int, interval_ms: float):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+    def top(self, n: int = 25) -> List[Dict]:
+        # Tiempo "propio" aproximado: cuenta de la hoja de cada pila
+        leaves: Counter = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [{"frame": f, "samples": c, "pct": round(c * 100 / total, 1)} for f, c in leaves.most_common(n)]
+
+
+class ProfileSession:
+    def __init__(self, store: str, query: str, sampled: bool):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{store}-{uuid.uuid4().hex[:8]}"
+        self.store = store
+        self.query = query
+        self.sampled = sampled
+        self.tmp_dir = tempfile.mkdtemp(prefix="kerro-profile-")
+        self.traces: List[str] = []
+        self.sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS)
+        self.started = time.perf_counter()
+
+    def trace_path(self) -> str:
+        path = os.path.join(self.tmp_dir, f"trace-{len(self.traces)}.zip")
+        self.traces.append(path)
+        return path
+
+    def finish(self, error: Optional[str] = None) -> Optional[str]:
+        self.sampler.stop()
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        slow = PROFILE_THRESHOLD_MS > 0 and elapsed_ms >= PROFILE_THRESHOLD_MS
+        if not (slow or self.sampled):
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            return None
+
+        with open(os.path.join(self.tmp_dir, "profile.folded"), "w", encoding="utf-8") as f:
+            f.write(self.sampler.folded())
+        meta = {
+            "id": self.id,
+            "store": self.store,
+            "query": self.query,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "reason": "slow" if slow else "sampled",
+            "error": error,
+            "created_at": time.time(),
+            "traces": [os.path.basename(t) for t in self.traces if os.path.exists(t)],
+            "top_frames": self.sampler.top()
+        }
+        with open(os.path.join(self.tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+
+        with _ring_lock:
+            shutil.move(self.tmp_dir, os.path.join(profiles_dir(), self.id))
+            _trim_ring()
+        print(f"Perfil guardado ({meta['reason']}, {meta['elapsed_ms']} ms): {self.id}")
+        return self.id
+
+
+def _trim_ring():
+    entries = sorted(e for e in os.listdir(profiles_dir()) if os.path.isdir(os.path.join(profiles_dir(), e)))
+    for old in entries[:max(0, len(entries) - PROFILE_KEEP)]:
+        shutil.rmtree(os.path.join(profiles_dir(), old), ignore_errors=True)
+
+
+def current() -> Optional[ProfileSession]:
+    return getattr(_local, "session", None)
+
+
+@contextmanager
+def profile(store: str, query: str):
+    """
+    Envuelve un scrape(). Si el perfilado está activo, muestrea la pila de
+    Python y habilita trazas de Playwright (ver attach/detach); al terminar
+    se guarda solo si fue lento o si el request cayó en la muestra.
+    """
+    if PROFILE_THRESHOLD_MS <= 0 and PROFILE_SAMPLE_RATE <= 0:
+        yield None
+        return
+
+    session = ProfileSession(store, query, random.random() < PROFILE_SAMPLE_RATE)
+    _local.session = session
+    session.sampler.start()
+    error = None
+    try:
+        yield session
+    except Exception as e:
+        error = repr(e)
+        raise
+    finally:
+        _local.session = None
+        session.finish(error)
+
+
+def attach(context):
+    """Inicia la traza de Playwright del contexto si hay una sesión activa."""
+    if current() is None:
+        return
+    try:
+        context.tracing.start(screenshots=True, snapshots=True, sources=False)
+    except Exception as e:
+        print(f"No se pudo iniciar la traza: {e}")
+
+
+def detach(context):
+    """Detiene la traza del contexto y la guarda en la sesión activa."""
+    session = current()
+    if session is None:
+        return
+    try:
+        context.tracing.stop(path=session.trace_path())
+    except Exception as e:
+        print(f"No se pudo guardar la traza: {e}")
+
+
+def list_profiles() -> List[Dict]:
+    out = []
+    for entry in sorted(os.listdir(profiles_dir()), reverse=True):
+        try:
+            with open(os.path.join(profiles_dir(), entry, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta.pop("top_frames", None)
+        out.append(meta)
+    return out
+
+
+def profile_file(profile_id: str, filename: str) -> Optional[str]:
+    """Ruta de un archivo del perfil, o None si no existe (evita path traversal)."""
+    if profile_id not in os.listdir(profiles_dir()):
+        return None
+    folder = os.path.join(profiles_dir(), profile_id)
+    if filename not in os.listdir(folder):
+        return None
+    return os.path.join(folder, filename)
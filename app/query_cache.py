@@ -0,0 +1,130 @@
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from app.auth import redis_client
+
+# Segundos que una consulta sin resultados evita lanzar navegadores
+NEGATIVE_CACHE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", "300"))
+
+
+def _negative_key(store: str, key: str) -> str:
+    return f"negcache:{store}:{key}"
+
+
+def is_negative(store: str, key: str) -> bool:
+    if NEGATIVE_CACHE_TTL <= 0:
+        return False
+    try:
+        return bool(redis_client.exists(_negative_key(store, key)))
+    except Exception as e:
+        print(f"Caché negativa no disponible: {e}")
+        return False
+
+
+def remember_negative(store: str, key: str):
+    if NEGATIVE_CACHE_TTL <= 0:
+        return
+    try:
+        redis_client.set(_negative_key(store, key), 1, ex=NEGATIVE_CACHE_TTL)
+    except Exception as e:
+        print(f"Caché negativa no disponible: {e}")
+
+
+def _etag_key(store: str, key: str, signature: str) -> str:
+    return f"etag:{store}:{key}:{signature}"
+
+
+def remember_etag(store: str, key: str, signature: str, etag: str, max_age: int):
+    """ETag vigente de (tienda, consulta, vista) mientras el resultado está fresco."""
+    try:
+        redis_client.set(_etag_key(store, key, signature), etag, ex=max_age)
+    except Exception as e:
+        print(f"Caché de ETag no disponible: {e}")
+
+
+def fresh_etag(store: str, key: str, signature: str) -> Tuple[Optional[str], int]:
+    """(etag, segundos de frescura restantes) o (None, 0)."""
+    try:
+        pipe = redis_client.pipeline()
+        pipe.get(_etag_key(store, key, signature))
+        pipe.ttl(_etag_key(store, key, signature))
+        etag, ttl = pipe.execute()
+    except Exception as e:
+        print(f"Caché de ETag no disponible: {e}")
+        return None, 0
+    if not etag or ttl is None or ttl <= 0:
+        return None, 0
+    return etag, ttl
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Deduplica scrapes idénticos en curso: si llega la misma (tienda, consulta
+    canónica) mientras otra ya corre, espera y comparte su resultado en vez
+    de abrir otro navegador.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, str], _Call] = {}
+        self.coalesced = 0
+
+    def waiters(self, store: str, key: str) -> int:
+        with self._lock:
+            call = self._calls.get((store, key))
+            return call.waiters if call else 0
+
+    def abandon(self, store: str, key: str) -> bool:
+        """
+        Suelta el vuelo en curso si nadie más lo espera; retorna False si hay
+        requests coalescidos. Los que lleguen después arrancan uno nuevo en
+        vez de compartir un resultado cortado.
+        """
+        with self._lock:
+            call = self._calls.get((store, key))
+            if call is None or call.waiters:
+                return False
+            del self._calls[(store, key)]
+            return True
+
+    def do(self, store: str, key: str, fn: Callable[[], object]) -> Tuple[object, bool]:
+        """Retorna (resultado, compartido)."""
+        with self._lock:
+            call = self._calls.get((store, key))
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[(store, key)] = call
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get((store, key)) is call:
+                    del self._calls[(store, key)]
+            call.done.set()
+
+
+inflight = SingleFlight()
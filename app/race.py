@@ -0,0 +1,174 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Generator, List, Optional, Tuple
+
+# Una estrategia es un generador que hace un paso de trabajo sobre Playwright
+# y cede (yield) los milisegundos que quiere esperar antes del siguiente paso.
+# Al terminar retorna su lista de resultados (StopIteration.value).
+Strategy = Generator[int, None, list]
+
+
+class StrategyStats:
+    """
+    Estadísticas en memoria por estrategia: intentos, victorias y latencia
+    promedio de las victorias. Compartidas entre instancias del scraper.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, float]] = {}
+
+    def _entry(self, name: str) -> Dict[str, float]:
+        return self._data.setdefault(name, {"attempts": 0, "wins": 0, "win_ms": 0.0})
+
+    def record_attempt(self, name: str):
+        with self._lock:
+            self._entry(name)["attempts"] += 1
+
+    def record_win(self, name: str, elapsed_ms: float):
+        with self._lock:
+            entry = self._entry(name)
+            entry["wins"] += 1
+            entry["win_ms"] += elapsed_ms
+
+    def attempts(self, name: str) -> int:
+        with self._lock:
+            return int(self._data.get(name, {}).get("attempts", 0))
+
+    def win_rate(self, name: str) -> float:
+        with self._lock:
+            entry = self._data.get(name)
+            if not entry or not entry["attempts"]:
+                return 0.0
+            return entry["wins"] / entry["attempts"]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            out = {}
+            for name, entry in self._data.items():
+                attempts = entry["attempts"]
+                wins = entry["wins"]
+                out[name] = {
+                    "attempts": attempts,
+                    "wins": wins,
+                    "win_rate": round(wins / attempts, 3) if attempts else 0.0,
+                    "avg_win_ms": round(entry["win_ms"] / wins, 1) if wins else None
+                }
+            return out
+
+
+class StrategyRace:
+    """
+    Ejecuta varias estrategias de forma intercalada (cooperativa) y se queda
+    con la primera que retorna resultados válidos; el resto se cancela.
+
+    La API sync de Playwright no permite hilos sobre el mismo contexto, pero
+    el navegador sí carga varias páginas a la vez: cada estrategia lanza su
+    navegación y cede el control mientras espera, así las esperas se solapan.
+
+    Las estrategias que casi nunca ganan se arrancan tarde y, con suficientes
+    muestras, se omiten (salvo una fracción de exploración para no quedar
+    ciegos si el sitio cambia).
+    """
+
+    def __init__(self,
+                 stats: StrategyStats,
+                 min_samples: int = 10,
+                 late_below: float = 0.2,
+                 skip_below: float = 0.05,
+                 late_start_ms: int = 2500,
+                 explore: float = 0.1):
+        self.stats = stats
+        self.min_samples = min_samples
+        self.late_below = late_below
+        self.skip_below = skip_below
+        self.late_start_ms = late_start_ms
+        self.explore = explore
+        # True si la última run() se cortó por timeout_ms (no por `stop` ni
+        # porque todas las estrategias terminaran)
+        self.timed_out = False
+
+    def _start_delay(self, name: str) -> Optional[int]:
+        """Retraso inicial en ms para la estrategia, o None si se omite."""
+        if self.stats.attempts(name) < self.min_samples:
+            return 0
+        rate = self.stats.win_rate(name)
+        if rate < self.skip_below and random.random() >= self.explore:
+            return None
+        if rate < self.late_below:
+            return self.late_start_ms
+        return 0
+
+    def run(self,
+            strategies: Dict[str, Callable[[], Strategy]],
+            pump: Callable[[int], None],
+            timeout_ms: int,
+            is_valid: Callable[[list], bool] = bool,
+            stop: Optional[Callable[[], bool]] = None) -> Tuple[Optional[str], list]:
+        """
+        strategies: nombre -> fábrica del generador (se crea al arrancar).
+        pump: espera N ms dejando que Playwright procese eventos.
+        stop: si retorna True se corta la carrera (p. ej. deadline cancelado).
+        Retorna (nombre_ganador, resultados) o (None, []) si ninguna gana.
+        """
+        start = time.monotonic()
+        self.timed_out = False
+        pending: List[Tuple[float, str]] = []
+        for name in strategies:
+            delay = self._start_delay(name)
+            if delay is None:
+                print(f"Estrategia omitida por baja tasa de éxito: {name}")
+                continue
+            pending.append((start + delay / 1000, name))
+        if not pending:
+            pending = [(start, name) for name in strategies]
+
+        running: Dict[str, Tuple[float, Strategy]] = {}
+        try:
+            while pending or running:
+                elapsed_ms = (time.monotonic() - start) * 1000
+                if stop is not None and stop():
+                    break
+                if elapsed_ms >= timeout_ms:
+                    self.timed_out = True
+                    break
+
+                now = time.monotonic()
+                for wake_at, name in list(pending):
+                    if wake_at <= now:
+                        pending.remove((wake_at, name))
+                        self.stats.record_attempt(name)
+                        try:
+                            running[name] = (now, strategies[name]())
+                        except Exception:
+                            continue
+
+                for name, (wake_at, gen) in list(running.items()):
+                    if wake_at > time.monotonic():
+                        continue
+                    try:
+                        wait = next(gen)
+                        running[name] = (time.monotonic() + max(0, wait) / 1000, gen)
+                    except StopIteration as done:
+                        del running[name]
+                        results = done.value or []
+                        if is_valid(results):
+                            self.stats.record_win(name, (time.monotonic() - start) * 1000)
+                            return name, results
+                    except Exception:
+                        del running[name]
+
+                wakes = [w for w, _ in running.values()] + [w for w, _ in pending]
+                if not wakes:
+                    break
+                sleep_ms = (min(wakes) - time.monotonic()) * 1000
+                if sleep_ms > 0:
+                    pump(int(min(sleep_ms, timeout_ms - elapsed_ms)) or 1)
+        finally:
+            for _, gen in running.values():
+                try:
+                    gen.close()
+                except Exception:
+                    pass
+        return None, []
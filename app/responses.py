@@ -0,0 +1,201 @@
+import gzip
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+import orjson
+from fastapi import Query, Request
+from fastapi.responses import Response
+
+from app import images
+from app.product import Product, json_default
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Por debajo de este tamaño comprimir cuesta más de lo que ahorra
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+
+# Segundos que un resultado se considera fresco por tienda (Cache-Control
+# max-age). Walmart consolida siete sucursales y sus precios cambian poco
+# durante el día; las demás publican ofertas con más frecuencia.
+STORE_MAX_AGE: Dict[str, int] = {
+    "walmart": 900,
+    "prismamoda": 900,
+    "vidri": 600,
+    "curacao": 300,
+    "siman": 300,
+    "selectos": 300,
+}
+DEFAULT_MAX_AGE = int(os.getenv("CACHE_MAX_AGE", "300"))
+
+
+def _accepted_encodings(request: Request) -> Dict[str, float]:
+    out = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        out[token.strip().lower()] = q
+    return out
+
+
+def json_response(request: Request, payload, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serializa con orjson (sin pasar por jsonable_encoder) y comprime con
+    brotli o gzip según Accept-Encoding cuando el cuerpo supera el umbral.
+    """
+    body = orjson.dumps(payload, default=json_default)
+    headers = dict(headers or {})
+    headers.setdefault("Vary", "Accept-Encoding")
+
+    if len(body) >= COMPRESS_MIN_BYTES:
+        accepted = _accepted_encodings(request)
+        if brotli is not None and accepted.get("br", 0) > 0:
+            body = brotli.compress(body, quality=4)
+            headers["Content-Encoding"] = "br"
+        elif accepted.get("gzip", 0) > 0:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+class ResultView:
+    """
+    Parámetros comunes de las rutas /scrape/*: proyección de campos
+    (?fields=name,price_discount), ventana de resultados (?limit=&offset=)
+    y la huella del último resultado que ya tiene el cliente
+    (?if_fingerprint=), para no reenviar listas sin cambios. Con ?enrich=1
+    los primeros resultados se completan con datos de su página de detalle.
+    ?timeout_ms= acota el tiempo total del scraping (ver app.deadline).
+    ?thumb=160 reemplaza `image` por miniaturas firmadas del proxy /image.
+    """
+
+    def __init__(self,
+                 fields: Optional[str] = Query(None, description="Campos a incluir, separados por coma"),
+                 limit: Optional[int] = Query(None, ge=1, le=500),
+                 offset: int = Query(0, ge=0),
+                 if_fingerprint: Optional[str] = Query(None, description="Huella del resultado previo"),
+                 enrich: bool = Query(False, description="Agrega stock, SKU, vendedor y especificaciones"),
+                 enrich_top: Optional[int] = Query(None, ge=1, le=50),
+                 timeout_ms: Optional[int] = Query(None, ge=500, le=300000,
+                                                   description="Tiempo máximo; al agotarse se responde parcial"),
+                 thumb: Optional[int] = Query(None, ge=16, le=2048,
+                                              description="Ancho de miniatura: image pasa por /image")):
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        self.limit = limit
+        self.offset = offset
+        self.if_fingerprint = if_fingerprint
+        self.enrich = enrich
+        self.enrich_top = enrich_top
+        self.timeout_ms = timeout_ms
+        self.thumb = images.snap_size(thumb) if thumb else None
+
+    def signature(self) -> str:
+        """Identifica la representación: misma consulta con otra vista es otro ETag."""
+        raw = f"{self.fields}|{self.limit}|{self.offset}|{self.enrich}|{self.enrich_top}"
+        if self.thumb:
+            raw += f"|{self.thumb}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=6).hexdigest()
+
+    def project(self, results: List[Product]) -> List:
+        """
+        Filas con los campos pedidos; una fila sin ninguno no se envía ni
+        se cuenta. Va antes de la ventana para que total, offset y limit
+        hablen de la misma lista.
+        """
+        if not self.fields:
+            return results
+        projected = []
+        for item in results:
+            data = item.to_dict()
+            row = {f: data[f] for f in self.fields if f in data}
+            if row:
+                projected.append(row)
+        return projected
+
+    def window(self, rows: List) -> List:
+        end = self.offset + self.limit if self.limit is not None else None
+        window = rows[self.offset:end]
+        if self.thumb:
+            window = images.rewrite(window, self.thumb)
+        return window
+
+
+def max_age_for(store: str) -> int:
+    return STORE_MAX_AGE.get(store, DEFAULT_MAX_AGE)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Comparación débil contra If-None-Match (lista separada por comas o "*")."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def _cache_headers(etag: str, max_age: int) -> Dict[str, str]:
+    # La respuesta depende del token: las cachés compartidas la guardan por
+    # Authorization y nunca la sirven a otro usuario
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding, Authorization"
+    }
+
+
+def not_modified(etag: str, max_age: int) -> Response:
+    return Response(status_code=304, headers=_cache_headers(etag, max_age))
+
+
+def scrape_response(request: Request, username: str, results: List[Product], view: ResultView,
+                    fingerprint: Optional[str] = None, meta: Optional[Dict] = None,
+                    max_age: Optional[int] = None) -> Response:
+    """
+    Con max_age la respuesta lleva un ETag débil calculado sobre los
+    resultados enviados y Cache-Control; si coincide con If-None-Match se
+    responde 304 sin cuerpo. Sin max_age (resultados parciales) no se cachea.
+    """
+    rows = view.project(results)
+    payload = {
+        "user": username,
+        "total": len(rows),
+        "offset": view.offset,
+        "fingerprint": fingerprint,
+        **(meta or {})
+    }
+    if fingerprint and view.if_fingerprint == fingerprint:
+        payload.update({"unchanged": True, "results": []})
+    else:
+        payload["results"] = view.window(rows)
+
+    if max_age is None:
+        return json_response(request, payload, headers={"Cache-Control": "no-store"})
+
+    digest = hashlib.blake2b(orjson.dumps(payload["results"], default=json_default), digest_size=10)
+    digest.update(f"{payload['total']}|{view.signature()}".encode("utf-8"))
+    etag = f'W/"{digest.hexdigest()}"'
+    if etag_matches(request, etag):
+        return not_modified(etag, max_age)
+    return json_response(request, payload, headers=_cache_headers(etag, max_age))
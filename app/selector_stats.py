@@ -0,0 +1,228 @@
+import atexit
+import copy
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.utils import data_path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+# Cada cuántas victorias se guarda a disco aunque el ganador no cambie
+SAVE_EVERY = 20
+
+
+class SelectorStatsStore:
+    """
+    Estadísticas de selectores por tienda persistidas en un JSON, para que el
+    ganador sobreviva reinicios del servicio.
+
+    Varios procesos (workers de uvicorn, el worker de la cola) comparten el
+    archivo: cada uno guarda bajo un lock de archivo y fusiona con lo que
+    encuentra en disco, sumando solo las victorias propias desde la última
+    escritura. El ganador lo define el cambio más reciente.
+
+    Estructura: {"<tienda>:<slot>": {"winner": sel, "streak": {sel: n},
+                 "wins": {sel: n}, "changed_at": ts}}
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("SELECTOR_STATS_PATH") or data_path("selector_stats.json")
+        self._lock = threading.Lock()
+        self._dirty = 0
+        # Victorias de este proceso aún no escritas: {key: {sel: n}}
+        self._pending: Dict[str, Dict[str, int]] = {}
+        self._data: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _merge(self, disk: Dict[str, Dict]) -> Dict[str, Dict]:
+        for key, wins in self._pending.items():
+            entry = disk.setdefault(key, {"winner": None, "streak": {}, "wins": {}, "changed_at": None})
+            for selector, n in wins.items():
+                entry["wins"][selector] = entry["wins"].get(selector, 0) + n
+            local = self._data.get(key, {})
+            if (local.get("changed_at") or 0) > (entry.get("changed_at") or 0):
+                entry.update(winner=local["winner"], changed_at=local["changed_at"], streak=local.get("streak", {}))
+            elif local.get("winner") == entry.get("winner"):
+                entry["streak"] = local.get("streak", {})
+        return disk
+
+    def _save(self):
+        tmp = f"{self.path}.tmp.{os.getpid()}"
+        try:
+            with self._file_lock():
+                merged = self._merge(self._load())
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(merged, f, ensure_ascii=False, indent=1)
+                os.replace(tmp, self.path)
+            # Queda también lo que guardaron los demás procesos
+            self._data = merged
+            self._pending = {}
+            self._dirty = 0
+        except OSError as e:
+            print(f"No se pudieron guardar estadísticas de selectores: {e}")
+
+    def get(self, key: str) -> Dict:
+        with self._lock:
+            return copy.deepcopy(self._data.get(key, {}))
+
+    def record(self, key: str, selector: str, switch_after: int = 3) -> Optional[str]:
+        """
+        Registra una victoria. Retorna el ganador anterior si el ganador
+        cambió (ver SelectorRanking), o None.
+        """
+        with self._lock:
+            entry = self._data.setdefault(key, {"winner": None, "streak": {}, "wins": {}, "changed_at": None})
+            entry["wins"][selector] = entry["wins"].get(selector, 0) + 1
+            pending = self._pending.setdefault(key, {})
+            pending[selector] = pending.get(selector, 0) + 1
+            previous = entry["winner"]
+            changed = None
+
+            if previous is None:
+                entry["winner"] = selector
+                entry["changed_at"] = time.time()
+            elif selector == previous:
+                entry["streak"] = {}
+            else:
+                # Un solo producto raro no cambia el ganador; se exige una racha
+                streak = entry["streak"].get(selector, 0) + 1
+                entry["streak"] = {selector: streak}
+                if streak >= switch_after:
+                    entry["winner"] = selector
+                    entry["streak"] = {}
+                    entry["changed_at"] = time.time()
+                    changed = previous
+
+            self._dirty += 1
+            if changed or previous is None or self._dirty >= SAVE_EVERY:
+                self._save()
+            return changed
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                key: {"winner": entry.get("winner"), "wins": dict(entry.get("wins", {})),
+                      "changed_at": entry.get("changed_at")}
+                for key, entry in self._data.items()
+            }
+
+
+_store: Optional[SelectorStatsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SelectorStatsStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SelectorStatsStore()
+            atexit.register(_store.flush)
+        return _store
+
+
+class SelectorRanking:
+    """
+    Lista de selectores alternativos de una tienda ordenada por desempeño:
+    primero el último ganador, luego el resto por victorias y, a igualdad,
+    en el orden declarado por el scraper.
+
+    Los candidatos pueden ser selectores CSS o nombres de estrategias
+    (p. ej. un barrido de enlaces); `pick` solo necesita un probe por nombre.
+    """
+
+    def __init__(self, store: str, slot: str, candidates: List[str],
+                 stats: Optional[SelectorStatsStore] = None):
+        self.key = f"{store}:{slot}"
+        self.candidates = list(candidates)
+        self.stats = stats or get_store()
+
+    def ordered(self) -> List[str]:
+        entry = self.stats.get(self.key)
+        winner = entry.get("winner")
+        wins = entry.get("wins", {})
+        ranked = sorted(self.candidates, key=lambda s: (s != winner, -wins.get(s, 0), self.candidates.index(s)))
+        return ranked
+
+    def record(self, selector: str):
+        previous = self.stats.record(self.key, selector)
+        if previous:
+            # Alerta: el selector que funcionaba dejó de hacerlo, probablemente
+            # cambió el layout del sitio.
+            print(f"⚠️ ALERTA selectores [{self.key}]: el ganador cambió de '{previous}' a '{selector}'")
+
+    def choose(self, samples: List[object], probe: Callable[[object, str], object],
+               valid: Callable[[object], bool] = bool) -> List[str]:
+        """
+        Para selectores que se aplican a cada tarjeta: elige el ganador una
+        sola vez por página, el primero en orden de ranking que sirve en la
+        mayoría de `samples` (o el que sirve en más). Registra esa única
+        victoria y retorna los candidatos con el ganador primero, para
+        recorrerlos por tarjeta sin volver a tocar las estadísticas.
+        """
+        ordered = self.ordered()
+        if not samples:
+            return ordered
+        best, best_hits = None, 0
+        for sel in ordered:
+            hits = 0
+            for sample in samples:
+                try:
+                    if valid(probe(sample, sel)):
+                        hits += 1
+                except Exception:
+                    continue
+            if hits * 2 > len(samples):
+                best = sel
+                break
+            if hits > best_hits:
+                best, best_hits = sel, hits
+        if best is None:
+            return ordered
+        self.record(best)
+        return [best] + [sel for sel in ordered if sel != best]
+
+    def pick(self, probe: Callable[[str], object],
+             valid: Callable[[object], bool] = bool) -> Tuple[Optional[str], object]:
+        """
+        Prueba los candidatos en orden de ranking y se detiene en el primero
+        cuyo resultado es válido. Retorna (selector, resultado) o (None, None).
+        """
+        for sel in self.ordered():
+            try:
+                result = probe(sel)
+            except Exception:
+                continue
+            if valid(result):
+                self.record(sel)
+                return sel, result
+        return None, None
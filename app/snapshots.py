@@ -0,0 +1,192 @@
+import gzip
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, List, Optional
+
+from app.utils import canonicalize_query, data_path
+
+# Opt-in: fracción de scrapes cuyo DOM final se archiva (0 = ninguno, 1 = todos)
+SNAPSHOT_SAMPLE_RATE = float(os.getenv("SNAPSHOT_SAMPLE_RATE", "0"))
+SNAPSHOT_MAX_AGE_DAYS = float(os.getenv("SNAPSHOT_MAX_AGE_DAYS", "7"))
+# Tope del archivo comprimido en disco; se borran primero los más viejos
+SNAPSHOT_MAX_MB = float(os.getenv("SNAPSHOT_MAX_MB", "500"))
+
+_lock = threading.Lock()
+_schema_ready = False
+
+
+def enabled() -> bool:
+    return SNAPSHOT_SAMPLE_RATE > 0
+
+
+def _sampled() -> bool:
+    return enabled() and random.random() < SNAPSHOT_SAMPLE_RATE
+
+
+def _object_path(digest: str) -> str:
+    # Direccionado por contenido: la misma página guardada dos veces ocupa un archivo
+    return data_path("snapshots", "objects", digest[:2], f"{digest}.html.gz")
+
+
+def _db() -> sqlite3.Connection:
+    global _schema_ready
+    conn = sqlite3.connect(data_path("snapshots", "index.db"), timeout=10)
+    conn.row_factory = sqlite3.Row
+    # Se guarda la consulta tal como fue a la tienda; el filtro de /snapshots es por la canónica
+    conn.create_function("canonical", 1, canonicalize_query, deterministic=True)
+    if not _schema_ready:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                digest TEXT NOT NULL,
+                store TEXT NOT NULL,
+                query TEXT NOT NULL,
+                url TEXT,
+                mode TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS snapshots_store_query ON snapshots (store, query, created_at);
+            CREATE INDEX IF NOT EXISTS snapshots_created ON snapshots (created_at);
+            CREATE INDEX IF NOT EXISTS snapshots_digest ON snapshots (digest);
+        """)
+        _schema_ready = True
+    return conn
+
+
+def _referenced(conn: sqlite3.Connection, digest: str) -> bool:
+    return conn.execute("SELECT 1 FROM snapshots WHERE digest = ? LIMIT 1", (digest,)).fetchone() is not None
+
+
+def _prune(conn: sqlite3.Connection):
+    """Retención: fuera lo más viejo que SNAPSHOT_MAX_AGE_DAYS y, si aún sobra, hasta bajar de SNAPSHOT_MAX_MB."""
+    cutoff = time.time() - SNAPSHOT_MAX_AGE_DAYS * 86400
+    doomed = {row[0] for row in conn.execute("SELECT DISTINCT digest FROM snapshots WHERE created_at < ?", (cutoff,))}
+    conn.execute("DELETE FROM snapshots WHERE created_at < ?", (cutoff,))
+
+    # Cada objeto cuenta una vez aunque lo compartan varias entradas
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM snapshots)").fetchone()[0]
+    limit = SNAPSHOT_MAX_MB * 1024 * 1024
+    if total > limit:
+        for row in conn.execute("SELECT id, digest, size FROM snapshots ORDER BY created_at").fetchall():
+            if total <= limit:
+                break
+            conn.execute("DELETE FROM snapshots WHERE id = ?", (row["id"],))
+            if not _referenced(conn, row["digest"]):
+                total -= row["size"]
+                doomed.add(row["digest"])
+
+    for digest in doomed:
+        if not _referenced(conn, digest):
+            try:
+                os.remove(_object_path(digest))
+            except OSError:
+                pass
+
+
+def _save(store: str, query: str, url: Optional[str], html: str, mode: str) -> Optional[int]:
+    raw = html.encode("utf-8")
+    digest = hashlib.sha256(raw).hexdigest()
+    path = _object_path(digest)
+    try:
+        with _lock:
+            if not os.path.exists(path):
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with gzip.open(tmp, "wb", compresslevel=6) as f:
+                    f.write(raw)
+                os.replace(tmp, path)
+            with closing(_db()) as conn, conn:
+                cur = conn.execute(
+                    "INSERT INTO snapshots (digest, store, query, url, mode, size, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (digest, store, query, url, mode, os.path.getsize(path), time.time())
+                )
+                _prune(conn)
+                return cur.lastrowid
+    except (OSError, sqlite3.Error) as e:
+        print(f"No se pudo guardar el snapshot de {store}: {e}")
+        return None
+
+
+def capture(store: str, query: str, url: Optional[str], html: Optional[str], mode: str = "static") -> Optional[int]:
+    """Archiva HTML ya descargado si el scrape cae en la muestra. Retorna el id del snapshot."""
+    if not html or not _sampled():
+        return None
+    return _save(store, query, url, html, mode)
+
+
+def capture_page(store: str, query: str, page, mode: str = "browser") -> Optional[int]:
+    """Archiva el DOM renderizado de una página de Playwright; page.content() solo se pide si hay muestra."""
+    if page is None or not _sampled():
+        return None
+    try:
+        html = page.content()
+        url = page.url
+    except Exception as e:
+        print(f"No se pudo leer el DOM para el snapshot de {store}: {e}")
+        return None
+    return _save(store, query, url, html, mode)
+
+
+def _meta(row: sqlite3.Row) -> Dict:
+    return {key: row[key] for key in ("id", "store", "query", "url", "mode", "digest", "size", "created_at")}
+
+
+def list_snapshots(store: Optional[str] = None, query: Optional[str] = None,
+                   since: Optional[float] = None, limit: int = 100) -> List[Dict]:
+    clauses, params = [], []
+    for column, value in (("store", store), ("canonical(query)", query)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        clauses.append("created_at >= ?")
+        params.append(since)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with closing(_db()) as conn:
+        rows = conn.execute(f"SELECT * FROM snapshots {where} ORDER BY created_at DESC LIMIT ?",
+                            (*params, limit)).fetchall()
+    return [_meta(row) for row in rows]
+
+
+def get(snapshot_id: int) -> Optional[Dict]:
+    with closing(_db()) as conn:
+        row = conn.execute("SELECT * FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+    return _meta(row) if row else None
+
+
+def load_html(meta: Dict) -> Optional[str]:
+    try:
+        with gzip.open(_object_path(meta["digest"]), "rb") as f:
+            return f.read().decode("utf-8")
+    except OSError:
+        return None
+
+
+def reextract(meta: Dict) -> Optional[Dict]:
+    """
+    Corre el parser actual de la tienda sobre el HTML archivado, sin
+    navegador ni red. Un DOM renderizado (mode "browser") va a la misma
+    extracción del camino de Playwright (parse_rendered) donde la tienda
+    la separa del parser estático. None si el objeto ya no está en disco.
+    """
+    # Import diferido: los scrapers importan este módulo para capturar
+    from app.stores import SCRAPERS
+
+    html = load_html(meta)
+    if html is None:
+        return None
+    scraper = SCRAPERS[meta["store"]]()
+    parse = scraper.parse_html
+    if meta.get("mode") == "browser":
+        parse = getattr(scraper, "parse_rendered", scraper.parse_html)
+    results = parse(html, meta["query"])
+    out = {**meta, "total": len(results), "results": [item.to_dict() for item in results]}
+    status = getattr(scraper, "last_status", None)
+    if status:
+        out["status"] = status
+    return out
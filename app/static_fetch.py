@@ -0,0 +1,174 @@
+import os
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import httpx
+from bs4 import BeautifulSoup
+
+from app import politeness
+
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+# "auto": intenta HTML estático y cae a Playwright; "off": siempre navegador
+STATIC_MODE = os.getenv("STATIC_MODE", "auto")
+STATIC_MIN_RESULTS = int(os.getenv("STATIC_MIN_RESULTS", "3"))
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Language": "es-ES,es;q=0.9",
+    "Accept": "text/html,application/xhtml+xml,application/json;q=0.9,*/*;q=0.8"
+}
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+
+def client() -> httpx.Client:
+    """Cliente HTTP compartido: reutiliza conexiones keep-alive entre requests."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                headers=HEADERS,
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+            )
+        return _client
+
+
+def enabled() -> bool:
+    return STATIC_MODE != "off"
+
+
+def _timeout_kwargs(timeout: Optional[float]) -> Dict:
+    # httpx interpreta timeout=None como "sin límite"; sin valor usa el del cliente
+    return {} if timeout is None else {"timeout": timeout}
+
+
+def fetch_html(url: str, timeout: Optional[float] = None, store: Optional[str] = None) -> Optional[str]:
+    # Con `store`, el fetch espera su turno dentro de la sesión del scrape (politeness.hit)
+    try:
+        with politeness.hit(store):
+            resp = client().get(url, **_timeout_kwargs(timeout))
+            politeness.observe_status(resp.status_code)
+    except httpx.HTTPError as e:
+        print(f"Fetch estático falló {url}: {e}")
+        return None
+    if resp.status_code != 200:
+        return None
+    return resp.text
+
+
+def fetch_json(url: str, timeout: Optional[float] = None, store: Optional[str] = None):
+    try:
+        with politeness.hit(store):
+            resp = client().get(url, headers={"Accept": "application/json"}, **_timeout_kwargs(timeout))
+            politeness.observe_status(resp.status_code)
+        if resp.status_code != 200:
+            return None
+        return resp.json()
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Fetch estático falló {url}: {e}")
+        return None
+
+
+def soup(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html, PARSER)
+
+
+def text(node) -> str:
+    return node.get_text("\n", strip=True) if node is not None else ""
+
+
+def parse_vtex_gallery(html: str, base: str) -> List[Dict[str, str]]:
+    """
+    Tarjetas de la galería de búsqueda VTEX IO renderizada en servidor.
+    Retorna dicts crudos {name, price_text, full_text, url, image} para que
+    cada scraper aplique su propia limpieza y relevancia.
+    """
+    doc = soup(html)
+    out = []
+    seen = set()
+    for card in doc.select(".vtex-search-result-3-x-galleryItem"):
+        a = card.select_one("a[href*='/p']") or card.select_one("a[href]")
+        if a is None or not a.get("href"):
+            continue
+        url = urljoin(base, a["href"])
+        if url in seen:
+            continue
+        seen.add(url)
+        name_el = (card.select_one(".vtex-product-summary-2-x-nameContainer")
+                   or card.select_one("[class*='productBrand']")
+                   or card.select_one("h3"))
+        name = text(name_el) or a.get("aria-label") or ""
+        price_el = card.select_one(".vtex-product-price-1-x-sellingPrice") or card.select_one("[class*='sellingPrice']")
+        img = card.select_one("img")
+        out.append({
+            "name": name,
+            "price_text": text(price_el),
+            "full_text": text(card),
+            "url": url,
+            "image": (img.get("src") or img.get("data-src") or "") if img else ""
+        })
+    return out
+
+
+class SoupElement:
+    """
+    Nodo de BeautifulSoup con el subconjunto de la API de ElementHandle que
+    usan los extractores (query_selector, inner_text, get_attribute), para
+    correr la misma lógica de Playwright sobre HTML ya descargado.
+    """
+
+    def __init__(self, node):
+        self.node = node
+
+    def query_selector(self, selector: str) -> Optional["SoupElement"]:
+        try:
+            found = self.node.select_one(selector)
+        except Exception:
+            return None
+        return SoupElement(found) if found is not None else None
+
+    def query_selector_all(self, selector: str) -> List["SoupElement"]:
+        try:
+            return [SoupElement(node) for node in self.node.select(selector)]
+        except Exception:
+            return []
+
+    def inner_text(self) -> str:
+        return text(self.node)
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        value = self.node.get(name)
+        return " ".join(value) if isinstance(value, list) else value
+
+
+class StaticStats:
+    """Cuántas veces el modo estático bastó por tienda (hit) o cayó a Playwright."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, int]] = {}
+
+    def record(self, store: str, hit: bool):
+        with self._lock:
+            entry = self._data.setdefault(store, {"static_hits": 0, "browser_fallbacks": 0})
+            entry["static_hits" if hit else "browser_fallbacks"] += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            out = {}
+            for store, entry in self._data.items():
+                total = entry["static_hits"] + entry["browser_fallbacks"]
+                out[store] = {**entry, "hit_rate": round(entry["static_hits"] / total, 3) if total else 0.0}
+            return out
+
+
+stats = StaticStats()
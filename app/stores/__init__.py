@@ -0,0 +1,16 @@
+from app.stores.siman_scraper import SimanScraper
+from app.stores.curacao_scraper import CuracaoScraper
+from app.stores.walmart_scraper import WalmartScraper
+from app.stores.prismamoda_scraper import PrismaModaScraper
+from app.stores.superselectos_scraper import SelectosScraper
+from app.stores.vidri_scraper import VidriScraper
+
+# Tienda -> clase del scraper (nombres de las rutas /scrape/{tienda})
+SCRAPERS = {
+    "siman": SimanScraper,
+    "curacao": CuracaoScraper,
+    "walmart": WalmartScraper,
+    "prismamoda": PrismaModaScraper,
+    "selectos": SelectosScraper,
+    "vidri": VidriScraper,
+}
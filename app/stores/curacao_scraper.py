@@ -1,22 +1,100 @@
 from playwright.sync_api import sync_playwright, TimeoutError
 from urllib.parse import quote, urljoin
+from typing import Optional
 import re
+from app import browser_pool, page_signals, politeness, profiling, snapshots, static_fetch, vtex_capture, waits
+from app.deadline import Deadline
+from app.product import Product
+from app.selector_stats import SelectorRanking
 
 class CuracaoScraper:
     BASE = "https://www.lacuracaonline.com"
     PRICE_RE = re.compile(r"\$\s?\d[\d,\.]*")
+    READY_SELECTOR = ".vtex-search-result-3-x-galleryItem"
+    SIGNALS = page_signals.signals(no_results=page_signals.VTEX_NO_RESULTS)
+    NAME_SELECTORS = [
+        ".vtex-product-summary-2-x-nameContainer",
+        "[class*='nameContainer']",
+        "h3", "h2", "a[href*='/p']"
+    ]
+    PRICE_SELECTORS = [
+        ".vtex-product-price-1-x-sellingPrice",
+        "[class*='sellingPrice']",
+        "[class*='price']"
+    ]
+    # Tarjetas sobre las que se elige el selector ganador de cada página
+    RANKING_SAMPLE = 5
 
     def __init__(self, headless: bool = True, max_items: int = 20):
         self.headless = headless
         self.max_items = max_items
+        self.last_mode = None
+        self.last_status: Optional[str] = None
+        self.deadline = Deadline()
 
-    def scrape(self, query: str) -> list:
+    @property
+    def incomplete(self) -> bool:
+        return self.deadline.expired()
+
+    def scrape(self, query: str, deadline: Optional[Deadline] = None) -> list:
+        self.deadline = deadline or Deadline()
+        self.last_status = None
+        results = []
+        if static_fetch.enabled():
+            results = self._scrape_static(query)
+            hit = len(results) >= min(static_fetch.STATIC_MIN_RESULTS, self.max_items)
+            static_fetch.stats.record("curacao", hit)
+            if hit:
+                self.last_mode = "static"
+                return results
+        if self.deadline.expired() or self.last_status == page_signals.NO_RESULTS:
+            # Sin tiempo para el navegador, o el HTML ya dice que no hay
+            # resultados: se entrega lo que dio el modo estático
+            self.last_mode = "static"
+            return results
+        self.last_mode = "browser"
+        return self._scrape_browser(query)
+
+    def _scrape_static(self, query: str) -> list:
+        url = f"{self.BASE}/elsalvador/{quote(query)}"
+        html = static_fetch.fetch_html(url, timeout=self.deadline.budget_s(10), store="curacao")
+        if not html:
+            return []
+        snapshots.capture("curacao", query, url, html)
+        return self.parse_html(html, query)
+
+    def parse_html(self, html: str, query: str) -> list:
+        """Extracción desde HTML (descargado o archivado en snapshots), sin red."""
+        results = []
+        cards = static_fetch.parse_vtex_gallery(html, self.BASE)
+        if not cards:
+            self.last_status = page_signals.classify_html(static_fetch.soup(html), self.SIGNALS)
+        for card in cards:
+            name = card["name"]
+            if len(name) <= 5 or not self.is_relevant(name, query):
+                continue
+            price = card["price_text"] if "$" in card["price_text"] else ""
+            if not price:
+                m = self.PRICE_RE.search(card["full_text"])
+                price = m.group(0) if m else ""
+
+            prices_clean = self.extract_prices(price)
+            results.append(Product(
+                "La Curacao", self.clean_name(name),
+                prices_clean["original"], prices_clean["discount"],
+                url=card["url"], image=card["image"]
+            ))
+            if len(results) >= self.max_items:
+                break
+        return results
+
+    def _scrape_browser(self, query: str) -> list:
         results = []
-        seen_urls = set()  # Para evitar duplicados
         search_url = f"{self.BASE}/elsalvador/{quote(query)}"
 
         with sync_playwright() as p:
-            browser = p.chromium.launch(
+            browser = browser_pool.launch(
+                p,
                 headless=self.headless,
                 args=[
                     '--disable-blink-features=AutomationControlled',
@@ -24,142 +102,70 @@ class CuracaoScraper:
                     '--no-sandbox'
                 ]
             )
+            context = browser.new_context(
+                viewport={'width': 1920, 'height': 1080},
+                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                locale='es-ES',
+                extra_http_headers={'Accept-Language': 'es-ES,es;q=0.9'}
+            )
+            profiling.attach(context)
+            page = None
             try:
-                context = browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    locale='es-ES',
-                    extra_http_headers={'Accept-Language': 'es-ES,es;q=0.9'}
-                )
-
                 page = context.new_page()
                 page.add_init_script("""
                     Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
                 """)
+                capture = vtex_capture.SearchCapture(page, query, self.BASE)
 
                 try:
-                    page.goto(search_url, wait_until="domcontentloaded", timeout=40000)
-                    page.wait_for_timeout(5000)
+                    politeness.goto(page, "curacao", search_url, deadline=self.deadline, wait_until="domcontentloaded",
+                                    timeout=self.deadline.budget(40000))
+                    state = capture.wait(self.READY_SELECTOR, self.SIGNALS, self.deadline.budget(10000),
+                                          stop=self.deadline.expired)
+                    products = capture.products() if state == vtex_capture.CAPTURED else None
+                    if products is not None:
+                        # JSON de la búsqueda: sin espera fija, scroll ni selectores
+                        if not products:
+                            self.last_status = page_signals.NO_RESULTS
+                        results = self._from_capture(products, query)
+                        print(f"Respuesta de búsqueda capturada: {len(results)}")
+                        return results
+                    self.last_status = state if state in page_signals.ORDER else None
+                    if self.last_status in page_signals.ORDER:
+                        print(f"Página sin productos: {self.last_status}")
+                        return results
+                    waits.pause(page, self.deadline, 5000)
 
                     # Scroll progresivo
                     for i in range(5):
+                        if self.deadline.expired():
+                            break
                         page.evaluate(f"window.scrollTo(0, {i * 400})")
-                        page.wait_for_timeout(400)
+                        waits.pause(page, self.deadline, 400)
 
                 except TimeoutError:
                     pass
 
                 # Esperar galería VTEX
                 try:
-                    page.wait_for_selector(".vtex-search-result-3-x-gallery", timeout=10000)
+                    waits.selector(page, self.deadline, ".vtex-search-result-3-x-gallery", 10000)
                 except TimeoutError:
                     pass
 
-                # Buscar productos con selector heurístico mejorado
-                all_divs = page.query_selector_all("div")
-                products = [
-                    div for div in all_divs
-                    if div.query_selector("a[href*='/p']") and div.query_selector("img")
-                ][:50]
-
+                products = self._find_cards(page)
                 print(f"Productos encontrados: {len(products)}")
 
-                for idx, product in enumerate(products[:self.max_items * 2]):  # Procesar más para compensar filtrado
-                    try:
-                        full_text = ""
-                        try:
-                            full_text = product.inner_text()
-                        except Exception:
-                            pass
-
-                        # Filtrar elementos de navegación/UI
-                        if any(x in full_text.lower() for x in ["resultados de búsqueda", "filtrar por", "ordenar por"]):
-                            continue
-
-                        # URL - debe contener /p/ para ser producto
-                        a = product.query_selector("a[href*='/p']")
-                        if not a:
-                            continue
-
-                        href = a.get_attribute("href")
-                        if not href:
-                            continue
-
-                        if not href.startswith("http"):
-                            href = urljoin(self.BASE, href)
-
-                        # Evitar duplicados por URL
-                        if href in seen_urls:
-                            continue
-                        seen_urls.add(href)
-
-                        # Nombre
-                        name = ""
-                        name_selectors = [
-                            ".vtex-product-summary-2-x-nameContainer",
-                            "[class*='nameContainer']",
-                            "h3", "h2", "a[href*='/p']"
-                        ]
-                        for name_sel in name_selectors:
-                            name_el = product.query_selector(name_sel)
-                            if name_el:
-                                try:
-                                    name = name_el.inner_text().strip()
-                                    if len(name) > 5:
-                                        break
-                                except Exception:
-                                    continue
-
-                        if not name:
-                            continue
-
-                        # Validar relevancia
-                        if not self.is_relevant(name, query):
-                            continue
-
-                        # Imagen
-                        img = product.query_selector("img")
-                        img_src = ""
-                        if img:
-                            img_src = img.get_attribute("src") or img.get_attribute("data-src") or ""
-
-                        # Precio
-                        price = ""
-                        price_selectors = [
-                            ".vtex-product-price-1-x-sellingPrice",
-                            "[class*='sellingPrice']",
-                            "[class*='price']"
-                        ]
-                        for price_sel in price_selectors:
-                            price_el = product.query_selector(price_sel)
-                            if price_el:
-                                try:
-                                    price = price_el.inner_text().strip()
-                                    if "$" in price:
-                                        break
-                                except Exception:
-                                    continue
-
-                        if not price:
-                            m = self.PRICE_RE.search(full_text)
-                            price = m.group(0) if m else ""
-
-                        prices_clean = self.extract_prices(price)
-                        results.append({
-                            "store": "La Curacao",
-                            "name": self.clean_name(name),
-                            "price_original": prices_clean["original"],
-                            "price_discount": prices_clean["discount"],
-                            "url": href,
-                            "image": img_src
-                        })
-
-                        if len(results) >= self.max_items:
-                            break
-
-                    except Exception:
-                        continue
+                # El ganador de nombre y precio se elige una vez por página
+                candidates = products[:self.max_items * 2]
+                sample = candidates[:self.RANKING_SAMPLE]
+                name_order = SelectorRanking("curacao", "name", self.NAME_SELECTORS).choose(
+                    sample, self._selector_text, self._valid_name)
+                price_order = SelectorRanking("curacao", "price", self.PRICE_SELECTORS).choose(
+                    sample, self._selector_text, self._valid_price)
+                results = self._extract_products(candidates, query, name_order, price_order)
             finally:
+                snapshots.capture_page("curacao", query, page)
+                profiling.detach(context)
                 try:
                     browser.close()
                 except Exception:
@@ -168,6 +174,144 @@ class CuracaoScraper:
         print(f"Total resultados válidos: {len(results)}")
         return results
 
+    def parse_rendered(self, html: str, query: str) -> list:
+        """
+        Extracción sobre el DOM que archiva el modo navegador: la misma
+        heurística de tarjetas y selectores, sin tocar el ranking.
+        """
+        doc = static_fetch.soup(html)
+        cards = self._find_cards(static_fetch.SoupElement(doc))
+        if not cards:
+            self.last_status = page_signals.classify_html(doc, self.SIGNALS)
+        return self._extract_products(cards[:self.max_items * 2], query,
+                                      SelectorRanking("curacao", "name", self.NAME_SELECTORS).ordered(),
+                                      SelectorRanking("curacao", "price", self.PRICE_SELECTORS).ordered())
+
+    def _find_cards(self, root) -> list:
+        """Selector heurístico: divs con enlace a producto e imagen (página o static_fetch.SoupElement)."""
+        cards = []
+        for div in root.query_selector_all("div"):
+            if len(cards) >= 50 or self.deadline.expired():
+                break
+            if div.query_selector("a[href*='/p']") and div.query_selector("img"):
+                cards.append(div)
+        return cards
+
+    def _extract_products(self, products, query: str, name_order: list, price_order: list) -> list:
+        """Tarjetas a productos; recibe ElementHandles o nodos static_fetch.SoupElement."""
+        results = []
+        seen_urls = set()  # Para evitar duplicados
+        for product in products:
+            if self.deadline.expired():
+                break
+            try:
+                full_text = ""
+                try:
+                    full_text = product.inner_text()
+                except Exception:
+                    pass
+
+                # Filtrar elementos de navegación/UI
+                if any(x in full_text.lower() for x in ["resultados de búsqueda", "filtrar por", "ordenar por"]):
+                    continue
+
+                # URL - debe contener /p/ para ser producto
+                a = product.query_selector("a[href*='/p']")
+                if not a:
+                    continue
+
+                href = a.get_attribute("href")
+                if not href:
+                    continue
+
+                if not href.startswith("http"):
+                    href = urljoin(self.BASE, href)
+
+                # Evitar duplicados por URL
+                if href in seen_urls:
+                    continue
+                seen_urls.add(href)
+
+                # Nombre
+                name = self._cascade(product, name_order, self._valid_name)
+
+                if not name:
+                    continue
+
+                # Validar relevancia
+                if not self.is_relevant(name, query):
+                    continue
+
+                # Imagen
+                img = product.query_selector("img")
+                img_src = ""
+                if img:
+                    img_src = img.get_attribute("src") or img.get_attribute("data-src") or ""
+
+                # Precio
+                price = self._cascade(product, price_order, self._valid_price)
+
+                if not price:
+                    m = self.PRICE_RE.search(full_text)
+                    price = m.group(0) if m else ""
+
+                prices_clean = self.extract_prices(price)
+                results.append(Product(
+                    "La Curacao", self.clean_name(name),
+                    prices_clean["original"], prices_clean["discount"],
+                    url=href, image=img_src
+                ))
+
+                if len(results) >= self.max_items:
+                    break
+
+            except Exception:
+                continue
+        return results
+
+    def _from_capture(self, products: list, query: str) -> list:
+        """Resultados desde el JSON de búsqueda de VTEX capturado en la página."""
+        results = []
+        for product in products:
+            if len(product["name"]) <= 5 or not self.is_relevant(product["name"], query):
+                continue
+            prices = vtex_capture.format_prices(product)
+            results.append(Product(
+                "La Curacao", self.clean_name(product["name"]),
+                prices["original"], prices["discount"],
+                url=product["url"], image=product["image"]
+            ))
+            if len(results) >= self.max_items:
+                break
+        return results
+
+    def _selector_text(self, root, selector: str) -> str:
+        el = root.query_selector(selector)
+        return el.inner_text().strip() if el else ""
+
+    def _valid_name(self, text: str) -> bool:
+        return len(text) > 5
+
+    def _valid_price(self, text: str) -> bool:
+        return "$" in text
+
+    def _cascade(self, root, selectors: list, valid) -> str:
+        """
+        Primer texto que cumple `valid` en el orden dado. Si ninguno lo
+        cumple se queda el último encontrado, como el recorrido original:
+        un nombre corto sigue siendo un nombre.
+        """
+        found = ""
+        for sel in selectors:
+            try:
+                text = self._selector_text(root, sel)
+            except Exception:
+                continue
+            if valid(text):
+                return text
+            found = text or found
+        return found
+
     def clean_name(self, raw: str) -> str:
         lines = raw.split("\n")
         filtered = [l.strip() for l in lines if l.strip() and not re.search(r"Vendido por|Agregar|\$\d|Añadir", l)]
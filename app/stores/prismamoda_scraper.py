@@ -1,22 +1,92 @@
 from playwright.sync_api import sync_playwright, TimeoutError
 from urllib.parse import quote, urljoin
+from typing import Optional
 import re
+from app import browser_pool, page_signals, politeness, profiling, snapshots, static_fetch, vtex_capture, waits
+from app.deadline import Deadline
+from app.product import Product
+from app.selector_stats import SelectorRanking
 
 class PrismaModaScraper:
     BASE = "https://www.prismamoda.com"
     PRICE_RE = re.compile(r"\$\s?\d[\d,\.]*")
+    READY_SELECTOR = ".vtex-search-result-3-x-galleryItem, .vtex-product-summary-2-x-clearLink"
+    SIGNALS = page_signals.signals(no_results=page_signals.VTEX_NO_RESULTS)
+    VTEX_SELECTORS = [
+        ".vtex-product-summary-2-x-clearLink",
+        "[class*='vtex-product-summary']",
+        ".vtex-search-result-3-x-galleryItem",
+        "[class*='galleryItem']"
+    ]
+    # Barridos completos de enlaces, solo si ningún selector VTEX funciona
+    LINK_SCANS = ["links:product-path", "links:img-relative"]
 
     def __init__(self, headless: bool = True, max_items: int = 20):
         self.headless = headless
         self.max_items = max_items
+        self.last_mode = None
+        self.last_status: Optional[str] = None
+        self.deadline = Deadline()
 
-    def scrape(self, query: str) -> list:
+    @property
+    def incomplete(self) -> bool:
+        return self.deadline.expired()
+
+    def scrape(self, query: str, deadline: Optional[Deadline] = None) -> list:
+        self.deadline = deadline or Deadline()
+        self.last_status = None
+        results = []
+        if static_fetch.enabled():
+            results = self._scrape_static(query)
+            hit = len(results) >= min(static_fetch.STATIC_MIN_RESULTS, self.max_items)
+            static_fetch.stats.record("prismamoda", hit)
+            if hit:
+                self.last_mode = "static"
+                return results
+        if self.deadline.expired() or self.last_status == page_signals.NO_RESULTS:
+            # Sin tiempo para el navegador, o el HTML ya dice que no hay
+            # resultados: se entrega lo que dio el modo estático
+            self.last_mode = "static"
+            return results
+        self.last_mode = "browser"
+        return self._scrape_browser(query)
+
+    def _scrape_static(self, query: str) -> list:
+        url = f"{self.BASE}/{quote(query)}"
+        html = static_fetch.fetch_html(url, timeout=self.deadline.budget_s(10), store="prismamoda")
+        if not html:
+            return []
+        snapshots.capture("prismamoda", query, url, html)
+        return self.parse_html(html, query)
+
+    def parse_html(self, html: str, query: str) -> list:
+        """Extracción desde HTML (descargado o archivado en snapshots), sin red."""
+        results = []
+        cards = static_fetch.parse_vtex_gallery(html, self.BASE)
+        if not cards:
+            self.last_status = page_signals.classify_html(static_fetch.soup(html), self.SIGNALS)
+        for card in cards:
+            name = card["name"]
+            if len(name) < 3 or not self.is_relevant(name, query):
+                continue
+            m = self.PRICE_RE.search(card["price_text"] or card["full_text"])
+            prices_clean = self.extract_prices(m.group(0) if m else "")
+            results.append(Product(
+                "PrismaModa", self.clean_name(name),
+                prices_clean["original"], prices_clean["discount"],
+                url=card["url"], image=card["image"]
+            ))
+            if len(results) >= self.max_items:
+                break
+        return results
+
+    def _scrape_browser(self, query: str) -> list:
         results = []
-        seen_urls = set()
         search_url = f"{self.BASE}/{quote(query)}"
 
         with sync_playwright() as p:
-            browser = p.chromium.launch(
+            browser = browser_pool.launch(
+                p,
                 headless=self.headless,
                 args=[
                     '--disable-blink-features=AutomationControlled',
@@ -24,135 +94,56 @@ class PrismaModaScraper:
                     '--no-sandbox'
                 ]
             )
+            context = browser.new_context(
+                viewport={'width': 1920, 'height': 1080},
+                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                locale='es-ES',
+                extra_http_headers={'Accept-Language': 'es-ES,es;q=0.9'}
+            )
+            profiling.attach(context)
+            page = None
             try:
-                context = browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    locale='es-ES',
-                    extra_http_headers={'Accept-Language': 'es-ES,es;q=0.9'}
-                )
                 page = context.new_page()
                 page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined});")
+                capture = vtex_capture.SearchCapture(page, query, self.BASE)
 
                 try:
-                    page.goto(search_url, wait_until="domcontentloaded", timeout=40000)
-                    page.wait_for_timeout(4000)
+                    politeness.goto(page, "prismamoda", search_url, deadline=self.deadline, wait_until="domcontentloaded",
+                                    timeout=self.deadline.budget(40000))
+                    state = capture.wait(self.READY_SELECTOR, self.SIGNALS, self.deadline.budget(10000),
+                                          stop=self.deadline.expired)
+                    products = capture.products() if state == vtex_capture.CAPTURED else None
+                    if products is not None:
+                        # JSON de la búsqueda: sin espera fija, scroll ni selectores
+                        if not products:
+                            self.last_status = page_signals.NO_RESULTS
+                        return self._from_capture(products, query)
+                    self.last_status = state if state in page_signals.ORDER else None
+                    if self.last_status in page_signals.ORDER:
+                        print(f"Página sin productos: {self.last_status}")
+                        return results
+                    waits.pause(page, self.deadline, 4000)
                     for i in range(6):
+                        if self.deadline.expired():
+                            break
                         page.evaluate(f"window.scrollTo(0, {i * 600})")
-                        page.wait_for_timeout(400)
+                        waits.pause(page, self.deadline, 400)
                 except TimeoutError:
                     pass
 
                 try:
-                    page.wait_for_selector("a:has(img)", timeout=8000)
+                    waits.selector(page, self.deadline, "a:has(img)", 8000)
                 except TimeoutError:
                     pass
 
-                vtex_selectors = [
-                    ".vtex-product-summary-2-x-clearLink",
-                    "[class*='vtex-product-summary']",
-                    ".vtex-search-result-3-x-galleryItem",
-                    "[class*='galleryItem']"
-                ]
+                ranking = SelectorRanking("prismamoda", "products", self.VTEX_SELECTORS + self.LINK_SCANS)
+                _, products = ranking.pick(lambda sel: self._find_products(page, sel))
+                products = products or []
 
-                products = []
-                for sel in vtex_selectors:
-                    found = page.query_selector_all(sel)
-                    if found and len(found) >= 3:
-                        products = found
-                        break
-
-                if not products:
-                    all_links = page.query_selector_all("a[href]")
-                    products = [
-                        link for link in all_links
-                        if link.query_selector("img") and link.get_attribute("href") and (
-                            "/producto/" in link.get_attribute("href") or
-                            "/product/" in link.get_attribute("href") or
-                            "-p-" in link.get_attribute("href"))
-                    ]
-
-                if not products:
-                    all_links = page.query_selector_all("a[href]")
-                    tmp = []
-                    for link in all_links:
-                        img = link.query_selector("img")
-                        href = link.get_attribute("href")
-                        if img and href and len(href) > 15 and href.startswith("/"):
-                            tmp.append(link)
-                    products = tmp
-
-                for product in products[:self.max_items * 2]:
-                    try:
-                        href = product.get_attribute("href")
-                        if not href or href == "#" or len(href) < 5:
-                            continue
-                        if not href.startswith("http"):
-                            href = urljoin(self.BASE, href)
-                        if href in seen_urls:
-                            continue
-                        seen_urls.add(href)
-
-                        name = ""
-                        try:
-                            raw = product.inner_text().strip()
-                            if raw:
-                                lines = [l.strip() for l in raw.split("\n") if len(l.strip()) > 5]
-                                if lines:
-                                    name = lines[0]
-                        except:
-                            pass
-                        if not name or len(name) < 5:
-                            name = product.get_attribute("title") or ""
-                        if (not name or len(name) < 5):
-                            img = product.query_selector("img")
-                            if img:
-                                name = img.get_attribute("alt") or ""
-                        if (not name or len(name) < 5):
-                            name = product.get_attribute("aria-label") or ""
-                        if not name or len(name) < 3:
-                            continue
-                        if not self.is_relevant(name, query):
-                            continue
-
-                        img_src = ""
-                        img = product.query_selector("img")
-                        if img:
-                            img_src = (img.get_attribute("src") or
-                                       img.get_attribute("data-src") or
-                                       img.get_attribute("data-lazy-src") or "")
-
-                        price = ""
-                        try:
-                            parent_text = page.evaluate("""(link) => {
-                                let parent = link.parentElement;
-                                for (let i = 0; i < 3 && parent; i++) {
-                                    if (parent.innerText) return parent.innerText;
-                                    parent = parent.parentElement;
-                                }
-                                return '';
-                            }""", product)
-                            m = self.PRICE_RE.search(parent_text or "")
-                            if m:
-                                price = m.group(0)
-                        except:
-                            pass
-
-                        prices_clean = self.extract_prices(price)
-                        results.append({
-                            "store": "PrismaModa",
-                            "name": self.clean_name(name),
-                            "price_original": prices_clean["original"],
-                            "price_discount": prices_clean["discount"],
-                            "url": href,
-                            "image": img_src
-                        })
-
-                        if len(results) >= self.max_items:
-                            break
-                    except:
-                        continue
+                results = self._extract_products(products, query, lambda link: self._parent_text(page, link))
             finally:
+                snapshots.capture_page("prismamoda", query, page)
+                profiling.detach(context)
                 try:
                     browser.close()
                 except:
@@ -160,6 +151,156 @@ class PrismaModaScraper:
 
         return results
 
+    def parse_rendered(self, html: str, query: str) -> list:
+        """
+        Extracción sobre el DOM que archiva el modo navegador: las mismas
+        búsquedas de enlaces (_find_products) en orden de ranking, sin
+        registrar victorias.
+        """
+        doc = static_fetch.soup(html)
+        root = static_fetch.SoupElement(doc)
+        products = []
+        for candidate in SelectorRanking("prismamoda", "products", self.VTEX_SELECTORS + self.LINK_SCANS).ordered():
+            products = self._find_products(root, candidate)
+            if products:
+                break
+        else:
+            self.last_status = page_signals.classify_html(doc, self.SIGNALS)
+        return self._extract_products(products, query, self._soup_parent_text)
+
+    def _parent_text(self, page, link) -> str:
+        return page.evaluate("""(link) => {
+            let parent = link.parentElement;
+            for (let i = 0; i < 3 && parent; i++) {
+                if (parent.innerText) return parent.innerText;
+                parent = parent.parentElement;
+            }
+            return '';
+        }""", link)
+
+    def _soup_parent_text(self, link) -> str:
+        # Igual que _parent_text pero sobre el árbol de BeautifulSoup
+        parent = link.node.parent
+        for _ in range(3):
+            if parent is None:
+                break
+            content = static_fetch.text(parent)
+            if content:
+                return content
+            parent = parent.parent
+        return ""
+
+    def _extract_products(self, products, query: str, parent_text) -> list:
+        """
+        Enlaces de producto a productos; recibe ElementHandles o nodos
+        static_fetch.SoupElement. `parent_text(link)` da el texto alrededor
+        del enlace, donde está el precio.
+        """
+        results = []
+        seen_urls = set()
+        for product in products[:self.max_items * 2]:
+            if self.deadline.expired():
+                break
+            try:
+                href = product.get_attribute("href")
+                if not href or href == "#" or len(href) < 5:
+                    continue
+                if not href.startswith("http"):
+                    href = urljoin(self.BASE, href)
+                if href in seen_urls:
+                    continue
+                seen_urls.add(href)
+
+                name = ""
+                try:
+                    raw = product.inner_text().strip()
+                    if raw:
+                        lines = [l.strip() for l in raw.split("\n") if len(l.strip()) > 5]
+                        if lines:
+                            name = lines[0]
+                except:
+                    pass
+                if not name or len(name) < 5:
+                    name = product.get_attribute("title") or ""
+                if (not name or len(name) < 5):
+                    img = product.query_selector("img")
+                    if img:
+                        name = img.get_attribute("alt") or ""
+                if (not name or len(name) < 5):
+                    name = product.get_attribute("aria-label") or ""
+                if not name or len(name) < 3:
+                    continue
+                if not self.is_relevant(name, query):
+                    continue
+
+                img_src = ""
+                img = product.query_selector("img")
+                if img:
+                    img_src = (img.get_attribute("src") or
+                               img.get_attribute("data-src") or
+                               img.get_attribute("data-lazy-src") or "")
+
+                price = ""
+                try:
+                    m = self.PRICE_RE.search(parent_text(product) or "")
+                    if m:
+                        price = m.group(0)
+                except:
+                    pass
+
+                prices_clean = self.extract_prices(price)
+                results.append(Product(
+                    "PrismaModa", self.clean_name(name),
+                    prices_clean["original"], prices_clean["discount"],
+                    url=href, image=img_src
+                ))
+
+                if len(results) >= self.max_items:
+                    break
+            except:
+                continue
+        return results
+
+    def _from_capture(self, products: list, query: str) -> list:
+        """Resultados desde el JSON de búsqueda de VTEX capturado en la página."""
+        results = []
+        for product in products:
+            if len(product["name"]) < 3 or not self.is_relevant(product["name"], query):
+                continue
+            prices = vtex_capture.format_prices(product)
+            results.append(Product(
+                "PrismaModa", self.clean_name(product["name"]),
+                prices["original"], prices["discount"],
+                url=product["url"], image=product["image"]
+            ))
+            if len(results) >= self.max_items:
+                break
+        return results
+
+    def _find_products(self, root, candidate: str) -> list:
+        if candidate == "links:product-path":
+            all_links = root.query_selector_all("a[href]")
+            return [
+                link for link in all_links
+                if link.query_selector("img") and link.get_attribute("href") and (
+                    "/producto/" in link.get_attribute("href") or
+                    "/product/" in link.get_attribute("href") or
+                    "-p-" in link.get_attribute("href"))
+            ]
+
+        if candidate == "links:img-relative":
+            all_links = root.query_selector_all("a[href]")
+            tmp = []
+            for link in all_links:
+                img = link.query_selector("img")
+                href = link.get_attribute("href")
+                if img and href and len(href) > 15 and href.startswith("/"):
+                    tmp.append(link)
+            return tmp
+
+        found = root.query_selector_all(candidate)
+        return found if found and len(found) >= 3 else []
+
     def clean_name(self, raw: str) -> str:
         lines = raw.split("\n")
         filtered = [l.strip() for l in lines if l.strip() and not re.search(r"Agregar|\$\d|Comprar|Ver|Añadir", l, re.IGNORECASE)]
@@ -1,103 +1,134 @@
 # app/stores/siman_scraper.py
 from playwright.sync_api import sync_playwright, TimeoutError
 from urllib.parse import quote, urljoin
+from typing import Optional
 import re
+from app import browser_pool, page_signals, politeness, profiling, snapshots, static_fetch, vtex_capture, waits
+from app.deadline import Deadline
+from app.product import Product
+from app.selector_stats import SelectorRanking
 
 class SimanScraper:
     BASE = "https://sv.siman.com"
     SELECTORS = [".ais-Hits-list .ais-Hits-item"]
+    FALLBACK_SELECTOR = ".ais-Hits-item, .vtex-search-result-3-x-resultItem"
     PRICE_RE = re.compile(r"(?:\$|USD|C\$)?\s?\d[\d.,]*")
+    READY_SELECTOR = ".ais-Hits-item, .vtex-search-result-3-x-resultItem"
+    # Solo texto: la lista vacía de Algolia (.ais-Hits--empty) también se ve
+    # mientras carga la primera respuesta
+    SIGNALS = page_signals.signals(no_results={"selectors": [], "text": page_signals.VTEX_NO_RESULTS["text"]})
 
     def __init__(self, headless: bool = True, max_items: int = 20):
         self.headless = headless
         self.max_items = max_items
+        self.last_mode = None
+        self.last_status: Optional[str] = None
+        self.deadline = Deadline()
+
+    @property
+    def incomplete(self) -> bool:
+        return self.deadline.expired()
+
+    def scrape(self, query: str, deadline: Optional[Deadline] = None) -> list:
+        self.deadline = deadline or Deadline()
+        self.last_status = None
+        results = []
+        if static_fetch.enabled():
+            results = self._scrape_static(query)
+            hit = len(results) >= min(static_fetch.STATIC_MIN_RESULTS, self.max_items)
+            static_fetch.stats.record("siman", hit)
+            if hit:
+                self.last_mode = "static"
+                return results
+        if self.deadline.expired() or self.last_status == page_signals.NO_RESULTS:
+            # Sin tiempo para el navegador, o el HTML ya dice que no hay
+            # resultados: se entrega lo que dio el modo estático
+            self.last_mode = "static"
+            return results
+        self.last_mode = "browser"
+        return self._scrape_browser(query)
+
+    def _scrape_static(self, query: str) -> list:
+        url = f"{self.BASE}/search?_q={quote(query)}"
+        html = static_fetch.fetch_html(url, timeout=self.deadline.budget_s(10), store="siman")
+        if not html:
+            return []
+        snapshots.capture("siman", query, url, html)
+        return self.parse_html(html, query)
+
+    def parse_html(self, html: str, query: str) -> list:
+        """Extracción desde HTML (descargado o archivado en snapshots), sin red."""
+        doc = static_fetch.soup(html)
+        products = doc.select(self.SELECTORS[0]) or doc.select(self.FALLBACK_SELECTOR)
 
-    def scrape(self, query: str) -> list:
+        results = []
+        for product in products[:self.max_items]:
+            a = product.select_one("a[href]")
+            href = urljoin(self.BASE, a["href"]) if a is not None and a.get("href") else ""
+            img = product.select_one("img")
+            name = (static_fetch.text(product.select_one("[class*='Name'], [class*='name'], [class*='searchProductsItemName'], h2, h3, a"))
+                    or static_fetch.text(a)
+                    or " ".join(static_fetch.text(product).split())[:200])
+            price = static_fetch.text(product.select_one("[class*='Price'], [class*='price'], [class*='searchProductsItemPrice']"))
+            if not price:
+                m = self.PRICE_RE.search(static_fetch.text(product))
+                price = m.group(0).strip() if m else ""
+
+            if not name or not self.is_relevant(name, query):
+                continue
+
+            prices_clean = self.extract_prices(price)
+            results.append(Product(
+                "Simán", self.clean_name(name),
+                prices_clean["original"], prices_clean["discount"],
+                url=href, image=(img.get("src") or "") if img is not None else ""
+            ))
+        if not products:
+            self.last_status = page_signals.classify_html(doc, self.SIGNALS)
+        return results
+
+    def _scrape_browser(self, query: str) -> list:
         results = []
         search_url = f"{self.BASE}/search?_q={quote(query)}"
 
         with sync_playwright() as p:
-            browser = p.chromium.launch(headless=self.headless)
+            browser = browser_pool.launch(p, headless=self.headless)
+            context = browser.new_context()
+            profiling.attach(context)
+            page = None
             try:
-                page = browser.new_page()
+                page = context.new_page()
                 page.set_extra_http_headers({"Accept-Language": "es-ES"})
+                capture = vtex_capture.SearchCapture(page, query, self.BASE)
                 try:
-                    page.goto(search_url, timeout=30000)
-                    page.wait_for_load_state("networkidle", timeout=20000)
+                    politeness.goto(page, "siman", search_url, deadline=self.deadline, timeout=self.deadline.budget(30000))
+                    state = capture.wait(self.READY_SELECTOR, self.SIGNALS, self.deadline.budget(20000),
+                                          stop=self.deadline.expired)
+                    products = capture.products() if state == vtex_capture.CAPTURED else None
+                    if products is not None:
+                        # JSON de la búsqueda: sin esperar networkidle ni leer el DOM
+                        if not products:
+                            self.last_status = page_signals.NO_RESULTS
+                        results = self._from_capture(products, query)
+                        print("Respuesta de búsqueda capturada, items:", len(results))
+                        return results
+                    self.last_status = state if state in page_signals.ORDER else None
+                    if self.last_status is None:
+                        waits.load_state(page, self.deadline, "networkidle", 20000)
                 except TimeoutError:
                     pass
+                if self.last_status in page_signals.ORDER:
+                    print("Página sin productos:", self.last_status)
+                    return results
 
-                products = []
-                used_selector = None
-                for sel in self.SELECTORS:
-                    found = page.query_selector_all(sel)
-                    if found and len(found) > 0:
-                        products = found
-                        used_selector = sel
-                        break
-
-                if not products:
-                    products = page.query_selector_all(".ais-Hits-item, .vtex-search-result-3-x-resultItem") or []
-                    used_selector = used_selector or "(fallback)"
+                ranking = SelectorRanking("siman", "products", self.SELECTORS + [self.FALLBACK_SELECTOR])
+                used_selector, products = ranking.pick(page.query_selector_all)
+                products = products or []
 
-                for product in products[:self.max_items]:
-                    try:
-                        a = product.query_selector("a[href]")
-                        img = product.query_selector("img")
-                        href = a.get_attribute("href") if a else None
-                        if href and not href.startswith("http"):
-                            href = urljoin(self.BASE, href)
-                        img_src = img.get_attribute("src") if img else None
-
-                        name_el = product.query_selector("[class*='Name'], [class*='name'], [class*='searchProductsItemName'], h2, h3, a")
-                        name = None
-                        if name_el:
-                            try:
-                                name = name_el.inner_text().strip()
-                            except Exception:
-                                name = None
-                        if not name and a:
-                            try:
-                                name = a.inner_text().strip()
-                            except Exception:
-                                name = None
-                        if not name:
-                            try:
-                                tmp = product.inner_text().strip()
-                                name = " ".join(tmp.split())[:200]
-                            except Exception:
-                                name = ""
-
-                        price_el = product.query_selector("[class*='Price'], [class*='price'], [class*='searchProductsItemPrice']")
-                        price = None
-                        if price_el:
-                            try:
-                                price = price_el.inner_text().strip()
-                            except Exception:
-                                price = None
-                        if not price:
-                            try:
-                                text = product.inner_text()
-                                m = self.PRICE_RE.search(text)
-                                price = m.group(0).strip() if m else ""
-                            except Exception:
-                                price = ""
-
-                        if not self.is_relevant(name, query):
-                            continue
-
-                        prices_clean = self.extract_prices(price or "")
-                        results.append({
-                            "store": "Simán",
-                            "name": self.clean_name(name),
-                            "price_original": prices_clean["original"],
-                            "price_discount": prices_clean["discount"],
-                            "url": href or "",
-                            "image": img_src or ""
-                        })
-                    except Exception as e:
-                        results.append({"store": "Simán", "error": str(e)})
+                results = self._extract_products(products, query)
             finally:
+                snapshots.capture_page("siman", query, page)
+                profiling.detach(context)
                 try:
                     browser.close()
                 except Exception:
@@ -106,6 +137,99 @@ class SimanScraper:
         print("Selector usado:", used_selector, "items:", len(results))
         return results
 
+    def parse_rendered(self, html: str, query: str) -> list:
+        """
+        Extracción sobre el DOM que archiva el modo navegador: prueba los
+        selectores de producto en orden de ranking, sin registrar victorias.
+        """
+        doc = static_fetch.soup(html)
+        root = static_fetch.SoupElement(doc)
+        products = []
+        for sel in SelectorRanking("siman", "products", self.SELECTORS + [self.FALLBACK_SELECTOR]).ordered():
+            products = root.query_selector_all(sel)
+            if products:
+                break
+        else:
+            self.last_status = page_signals.classify_html(doc, self.SIGNALS)
+        return self._extract_products(products, query)
+
+    def _extract_products(self, products, query: str) -> list:
+        """Tarjetas a productos; recibe ElementHandles o nodos static_fetch.SoupElement."""
+        results = []
+        for product in products[:self.max_items]:
+            if self.deadline.expired():
+                break
+            try:
+                a = product.query_selector("a[href]")
+                img = product.query_selector("img")
+                href = a.get_attribute("href") if a else None
+                if href and not href.startswith("http"):
+                    href = urljoin(self.BASE, href)
+                img_src = img.get_attribute("src") if img else None
+
+                name_el = product.query_selector("[class*='Name'], [class*='name'], [class*='searchProductsItemName'], h2, h3, a")
+                name = None
+                if name_el:
+                    try:
+                        name = name_el.inner_text().strip()
+                    except Exception:
+                        name = None
+                if not name and a:
+                    try:
+                        name = a.inner_text().strip()
+                    except Exception:
+                        name = None
+                if not name:
+                    try:
+                        tmp = product.inner_text().strip()
+                        name = " ".join(tmp.split())[:200]
+                    except Exception:
+                        name = ""
+
+                price_el = product.query_selector("[class*='Price'], [class*='price'], [class*='searchProductsItemPrice']")
+                price = None
+                if price_el:
+                    try:
+                        price = price_el.inner_text().strip()
+                    except Exception:
+                        price = None
+                if not price:
+                    try:
+                        text = product.inner_text()
+                        m = self.PRICE_RE.search(text)
+                        price = m.group(0).strip() if m else ""
+                    except Exception:
+                        price = ""
+
+                if not self.is_relevant(name, query):
+                    continue
+
+                prices_clean = self.extract_prices(price or "")
+                results.append(Product(
+                    "Simán", self.clean_name(name),
+                    prices_clean["original"], prices_clean["discount"],
+                    url=href or "", image=img_src or ""
+                ))
+            except Exception as e:
+                print(f"Producto omitido en Simán: {e}")
+        return results
+
+    def _from_capture(self, products: list, query: str) -> list:
+        """Resultados desde el JSON de búsqueda de VTEX capturado en la página."""
+        results = []
+        for product in products:
+            if not product["name"] or not self.is_relevant(product["name"], query):
+                continue
+            prices = vtex_capture.format_prices(product)
+            results.append(Product(
+                "Simán", self.clean_name(product["name"]),
+                prices["original"], prices["discount"],
+                url=product["url"], image=product["image"]
+            ))
+            if len(results) >= self.max_items:
+                break
+        return results
+
     def clean_name(self, raw: str) -> str:
         lines = raw.split("\n")
         filtered = [line.strip() for line in lines if not re.search(r"Vendido por|Agregar al carrito|\$\d", line)]
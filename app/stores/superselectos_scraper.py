@@ -1,37 +1,117 @@
 # python
 from playwright.sync_api import sync_playwright, TimeoutError
 from urllib.parse import quote, urljoin
+from typing import Optional
 import re
+from app import browser_pool, page_signals, politeness, profiling, snapshots, static_fetch, waits
+from app.deadline import Deadline
+from app.product import Product
 
 class SelectosScraper:
     BASE = "https://www.superselectos.com"
     SEARCH_URL = BASE + "/products?keyword="
     PRICE_RE = re.compile(r"\$\s?\d[\d,\.]*")
+    READY_SELECTOR = "li.item-producto"
+    SIGNALS = page_signals.signals(no_results={"selectors": [], "text": [r"no se encontraron productos", r"no hay resultados para"]})
 
     def __init__(self, headless: bool = True, max_items: int = 20):
         self.headless = headless
         self.max_items = max_items
+        self.last_mode = None
+        self.last_status: Optional[str] = None
+        self.deadline = Deadline()
 
-    def scrape(self, query: str) -> list:
+    @property
+    def incomplete(self) -> bool:
+        return self.deadline.expired()
+
+    def scrape(self, query: str, deadline: Optional[Deadline] = None) -> list:
+        self.deadline = deadline or Deadline()
+        self.last_status = None
+        results = []
+        if static_fetch.enabled():
+            results = self._scrape_static(query)
+            hit = len(results) >= min(static_fetch.STATIC_MIN_RESULTS, self.max_items)
+            static_fetch.stats.record("selectos", hit)
+            if hit:
+                self.last_mode = "static"
+                return results
+        if self.deadline.expired() or self.last_status == page_signals.NO_RESULTS:
+            # Sin tiempo para el navegador, o el HTML ya dice que no hay
+            # resultados: se entrega lo que dio el modo estático
+            self.last_mode = "static"
+            return results
+        self.last_mode = "browser"
+        return self._scrape_browser(query)
+
+    def _scrape_static(self, query: str) -> list:
+        url = f"{self.SEARCH_URL}{quote(query)}"
+        html = static_fetch.fetch_html(url, timeout=self.deadline.budget_s(10), store="selectos")
+        if not html:
+            return []
+        snapshots.capture("selectos", query, url, html)
+        return self.parse_html(html, query)
+
+    def parse_html(self, html: str, query: str) -> list:
+        """Extracción desde HTML (descargado o archivado en snapshots), sin red."""
+        doc = static_fetch.soup(html)
+
+        results = []
+        for product in doc.select("li.item-producto")[:self.max_items]:
+            name = static_fetch.text(product.select_one("h5.prod-nombre a"))
+            a = product.select_one("a[href]")
+            href = urljoin(self.BASE, a["href"]) if a is not None and a.get("href") else ""
+            img = product.select_one("img")
+            price = static_fetch.text(product.select_one("[class*='price']"))
+            if not price:
+                m = self.PRICE_RE.search(static_fetch.text(product))
+                price = m.group(0).strip() if m else ""
+
+            if not self.is_relevant(name, query):
+                continue
+
+            prices_clean = self.extract_prices(price)
+            results.append(Product(
+                "Super Selectos", self.clean_name(name),
+                prices_clean["original"], prices_clean["discount"],
+                url=href, image=(img.get("src") or "") if img is not None else ""
+            ))
+        if not doc.select_one("li.item-producto"):
+            self.last_status = page_signals.classify_html(doc, self.SIGNALS)
+        return results
+
+    def _scrape_browser(self, query: str) -> list:
         results = []
         search_url = f"{self.SEARCH_URL}{quote(query)}"
 
         with sync_playwright() as p:
-            browser = p.chromium.launch(headless=self.headless)
+            browser = browser_pool.launch(p, headless=self.headless)
+            context = browser.new_context()
+            profiling.attach(context)
+            page = None
             try:
-                page = browser.new_page()
+                page = context.new_page()
                 page.set_extra_http_headers({"Accept-Language": "es-ES"})
                 try:
-                    page.goto(search_url, timeout=30000)
-                    page.wait_for_load_state("networkidle", timeout=20000)
-                    page.wait_for_timeout(5000)
+                    politeness.goto(page, "selectos", search_url, deadline=self.deadline,
+                                    timeout=self.deadline.budget(30000))
+                    state = page_signals.wait_for_outcome(
+                        page, self.READY_SELECTOR, self.SIGNALS, self.deadline.budget(20000), stop=self.deadline.expired)
+                    self.last_status = state if state in page_signals.ORDER else None
+                    if self.last_status is None:
+                        waits.load_state(page, self.deadline, "networkidle", 20000)
+                        waits.pause(page, self.deadline, 5000)
                 except TimeoutError:
                     pass
+                if self.last_status in page_signals.ORDER:
+                    return results
 
                 products = page.locator("li.item-producto")
                 count = products.count()
 
                 for i in range(min(count, self.max_items)):
+                    if self.deadline.expired():
+                        break
                     product = products.nth(i)
                     try:
                         name = ""
@@ -58,17 +138,16 @@ class SelectosScraper:
                             continue
 
                         prices_clean = self.extract_prices(price)
-                        results.append({
-                            "store": "Super Selectos",
-                            "name": self.clean_name(name),
-                            "price_original": prices_clean["original"],
-                            "price_discount": prices_clean["discount"],
-                            "url": href or "",
-                            "image": img_src or ""
-                        })
+                        results.append(Product(
+                            "Super Selectos", self.clean_name(name),
+                            prices_clean["original"], prices_clean["discount"],
+                            url=href or "", image=img_src or ""
+                        ))
                     except Exception as e:
-                        results.append({"store": "Super Selectos", "error": str(e)})
+                        print(f"Producto omitido en Super Selectos: {e}")
             finally:
+                snapshots.capture_page("selectos", query, page)
+                profiling.detach(context)
                 try:
                     browser.close()
                 except Exception:
@@ -2,6 +2,11 @@ import re
 from typing import List, Dict, Optional
 from urllib.parse import quote, urljoin
 from playwright.sync_api import sync_playwright, Page
+from app import browser_pool, page_signals, politeness, profiling, snapshots, static_fetch
+from app.deadline import Deadline
+from app.product import Product
+from app.race import StrategyRace, StrategyStats
+from app.selector_stats import SelectorRanking
 
 class VidriScraper:
     BASE = "https://www.vidri.com.sv"
@@ -10,6 +15,8 @@ class VidriScraper:
         "/#q={q}"
     ]
     API_PATH = "/api/catalog_system/pub/products/search/?ft={q}"
+    READY_SELECTOR = ".vtex-search-result-3-x-galleryItem"
+    SIGNALS = page_signals.signals(no_results=page_signals.VTEX_NO_RESULTS)
     PRICE_RE = re.compile(r"\$\s?\d[\d\.,]*")
     OLD_PRICE_RE = re.compile(r"Antes:\s*(\$\s?\d[\d\.,]*)", re.IGNORECASE)
     STOCK_RE = re.compile(r"Queda\(n\)\s+(\d+)", re.IGNORECASE)
@@ -42,6 +49,9 @@ class VidriScraper:
         "Queda",
     )
 
+    # Compartidas entre instancias: cada request crea un VidriScraper nuevo
+    STRATEGY_STATS = StrategyStats()
+
     def __init__(self,
                  headless: bool = True,
                  max_items: int = 20,
@@ -54,6 +64,13 @@ class VidriScraper:
         self.include_categories = include_categories
         self.debug_html = debug_html
         self.last_html: Optional[str] = None
+        self.last_mode: Optional[str] = None
+        self.last_status: Optional[str] = None
+        self.deadline = Deadline()
+
+    @property
+    def incomplete(self) -> bool:
+        return self.deadline.expired()
 
     def _clean(self, t: Optional[str]) -> str:
         return (t or "").strip()
@@ -139,7 +156,16 @@ class VidriScraper:
                 return block
         return self._refine_title_block(root.inner_text())
 
-    def _extract_structured(self, root, query: str) -> Optional[Dict[str, Optional[str]]]:
+    def _product(self, title: str, url: str, price: Optional[str], old_price: Optional[str] = None,
+                 block: Optional[Dict[str, Optional[str]]] = None) -> Product:
+        # "Antes:" es el precio de lista y el otro el vigente; con un solo precio va como original
+        original, discount = (old_price, price) if old_price else (price, "")
+        block = block or {}
+        stock = block.get("stock")
+        return Product("Vidri", title, original, discount, url=url, brand=block.get("brand"),
+                       model=block.get("model"), stock=int(stock) if stock else None)
+
+    def _extract_structured(self, root, query: str) -> Optional[Product]:
         block = self._extract_title(root)
         title = block["title"]
         if not title:
@@ -155,15 +181,7 @@ class VidriScraper:
         full = urljoin(self.BASE, href)
         if not self._is_product(href, title, price, query):
             return None
-        return {
-            "title": title,
-            "url": full,
-            "price": price,
-            "old_price": old_price,
-            "model": block["model"],
-            "brand": block["brand"],
-            "stock": block["stock"]
-        }
+        return self._product(title, full, price, old_price, block)
 
     def _is_product(self, href: str, title: str, price: Optional[str], query: str) -> bool:
         h = href.lower()
@@ -177,70 +195,149 @@ class VidriScraper:
             return True
         return False
 
-    def _wait_dom_growth(self, page: Page, attempts: int = 5, delay: int = 600):
-        prev = 0
+    def _wait_outcome(self, page: Page, attempts: int = 12, delay: int = 250):
+        """
+        Sondea la página entre esperas hasta ver productos o una firma de
+        bloqueo/error/sin resultados; retorna ese estado o None si no se
+        decidió en attempts * delay ms (se intenta extraer igual).
+        """
         for _ in range(attempts):
-            count = page.evaluate("document.getElementsByTagName('*').length")
-            if count > prev:
-                prev = count
-            page.wait_for_timeout(delay)
+            state = page_signals.check(page, self.READY_SELECTOR, self.SIGNALS)
+            if state is not None:
+                return state
+            yield delay
+        return None
+
+    def _settle(self, page: Page, state: Optional[str]) -> bool:
+        """Registra la firma vista; True si la página no tiene productos que leer."""
+        if state not in page_signals.ORDER:
+            return False
+        print(f"Página sin productos: {state}")
+        self._signals.append(state)
+        snapshots.capture_page("vidri", self._query, page)
+        return True
 
     def _scroll(self, page: Page, limit: int = 6000, step: int = 800):
         for y in range(0, limit, step):
             page.evaluate(f"window.scrollTo(0, {y});")
-            page.wait_for_timeout(120)
+            yield 120
+
+    def _collect_nodes(self, page: Page, query: str) -> List[Product]:
+        # Se prueba primero el selector que ganó la última vez; "a[href]" es
+        # el último recurso cuando ningún selector de producto encuentra nada.
+        ranking = SelectorRanking("vidri", "products", self.PRODUCT_SELECTORS + ["a[href]"])
+        _, out = ranking.pick(lambda sel: self._extract_nodes(page.query_selector_all(sel), query))
+        return out or []
 
-    def _collect_nodes(self, page: Page, query: str) -> List[Dict[str, Optional[str]]]:
-        out: List[Dict[str, Optional[str]]] = []
+    def parse_html(self, html: str, query: str) -> List[Product]:
+        """
+        Misma extracción que _collect_nodes sobre HTML archivado en snapshots.
+        Recorre los selectores en orden fijo: no toca el ranking en vivo.
+        """
+        doc = static_fetch.SoupElement(static_fetch.soup(html))
+        for sel in self.PRODUCT_SELECTORS + ["a[href]"]:
+            out = self._extract_nodes(doc.query_selector_all(sel), query)
+            if out:
+                return out
+        return []
+
+    def _extract_nodes(self, nodes, query: str) -> List[Product]:
+        out: List[Product] = []
         seen = set()
-        nodes = []
-        for sel in self.PRODUCT_SELECTORS:
-            nodes.extend(page.query_selector_all(sel))
-        if not nodes:
-            nodes = page.query_selector_all("a[href]")
         for node in nodes:
             if len(out) >= self.max_items:
                 break
             item = self._extract_structured(node, query)
             if not item:
                 continue
-            if item["url"] in seen:
+            if item.url in seen:
                 continue
             out.append(item)
-            seen.add(item["url"])
+            seen.add(item.url)
         return out
 
-    def _api_search(self, context, query: str) -> List[Dict[str, Optional[str]]]:
-        out: List[Dict[str, Optional[str]]] = []
+    def _api_search(self, context, query: str) -> List[Product]:
         url = urljoin(self.BASE, self.API_PATH.format(q=quote(query)))
         try:
-            resp = context.request.get(url, headers={"Accept": "application/json", "User-Agent": "Mozilla/5.0"}, timeout=10000)
+            with politeness.hit("vidri"):
+                resp = context.request.get(url, headers={"Accept": "application/json", "User-Agent": "Mozilla/5.0"},
+                                           timeout=self.deadline.budget(10000))
+                politeness.observe_status(resp.status)
             if not resp.ok:
-                return out
+                return []
             data = resp.json()
-            if isinstance(data, list):
-                for prod in data:
-                    if len(out) >= self.max_items:
-                        break
-                    name = prod.get("productName") or prod.get("productTitle") or ""
-                    link_text = prod.get("linkText") or ""
-                    rel = f"/{link_text}/p" if link_text else ""
-                    full = urljoin(self.BASE, rel)
-                    price = None
-                    items = prod.get("items") or []
-                    if items:
-                        sellers = items[0].get("sellers") or []
-                        if sellers:
-                            offer = sellers[0].get("commertialOffer") or {}
-                            val = offer.get("Price")
-                            if val:
-                                price = f"${val}"
-                    if name:
-                        out.append({"title": name, "url": full, "price": price})
+            if data == []:
+                # El catálogo VTEX responde la lista vacía cuando no hay coincidencias
+                self._signals.append(page_signals.NO_RESULTS)
+            return self._parse_api(data)
         except Exception:
-            pass
+            return []
+
+    def _parse_api(self, data) -> List[Product]:
+        out: List[Product] = []
+        if not isinstance(data, list):
+            return out
+        for prod in data:
+            if len(out) >= self.max_items:
+                break
+            name = prod.get("productName") or prod.get("productTitle") or ""
+            link_text = prod.get("linkText") or ""
+            rel = f"/{link_text}/p" if link_text else ""
+            full = urljoin(self.BASE, rel)
+            price = None
+            items = prod.get("items") or []
+            if items:
+                sellers = items[0].get("sellers") or []
+                if sellers:
+                    offer = sellers[0].get("commertialOffer") or {}
+                    val = offer.get("Price")
+                    if val:
+                        price = f"${val}"
+            if name:
+                out.append(self._product(name, full, price))
         return out
 
+    def _open_page(self, context, url: str) -> Page:
+        page = context.new_page()
+        self._pages.append(page)
+        # "commit" retorna apenas llega la respuesta; el resto de la carga
+        # sigue en el navegador mientras las otras estrategias avanzan.
+        politeness.goto(page, "vidri", url, deadline=self.deadline, wait_until="commit",
+                        timeout=self.deadline.budget(self.timeout))
+        return page
+
+    def _api_strategy(self, context, query: str):
+        yield 0
+        return self._api_search(context, query)
+
+    def _pattern_strategy(self, context, pattern: str, query: str):
+        page = self._open_page(context, self.BASE + pattern.format(q=quote(query)))
+        if self._settle(page, (yield from self._wait_outcome(page))):
+            return []
+        yield from self._scroll(page)
+        results = self._collect_nodes(page, query)
+        snapshots.capture_page("vidri", query, page)
+        if self.debug_html and not results:
+            self.last_html = page.content()
+        return results
+
+    def _manual_strategy(self, context, query: str):
+        page = self._open_page(context, self.BASE)
+        self._manual_page = page
+        for _ in range(20):
+            if page.query_selector("input[type='search'], input[placeholder*='Buscar'], form input[type='text']"):
+                break
+            yield 250
+        self._manual_search(page, query)
+        if self._settle(page, (yield from self._wait_outcome(page))):
+            return []
+        yield from self._scroll(page)
+        results = self._collect_nodes(page, query)
+        snapshots.capture_page("vidri", query, page)
+        if self.debug_html and not results:
+            self.last_html = page.content()
+        return results
+
     def _manual_search(self, page: Page, query: str):
         selectors = [
             "input[type='search']",
@@ -260,59 +357,94 @@ class VidriScraper:
                 except Exception:
                     continue
 
-    def scrape(self, query: str) -> List[Dict[str, Optional[str]]]:
-        results: List[Dict[str, Optional[str]]] = []
+    def scrape(self, query: str, deadline: Optional[Deadline] = None) -> List[Product]:
+        # La API de catálogo no necesita navegador: se consulta por HTTP
+        # directo y solo si no basta se lanza Chromium.
+        self.deadline = deadline or Deadline()
+        self.last_status = None
+        static_tried = False
+        results: List[Product] = []
+        if static_fetch.enabled():
+            static_tried = True
+            url = urljoin(self.BASE, self.API_PATH.format(q=quote(query)))
+            data = static_fetch.fetch_json(url, timeout=self.deadline.budget_s(10), store="vidri")
+            results = self._parse_api(data)
+            hit = len(results) >= min(static_fetch.STATIC_MIN_RESULTS, self.max_items)
+            static_fetch.stats.record("vidri", hit)
+            if hit:
+                self.last_mode = "static"
+                return results[:self.max_items]
+            if data == []:
+                self.last_status = page_signals.NO_RESULTS
+        if self.deadline.expired() or self.last_status == page_signals.NO_RESULTS:
+            # Sin tiempo para el navegador, o el catálogo ya dijo que no hay
+            # coincidencias: se entrega lo que dio el modo estático
+            self.last_mode = "static"
+            return results[:self.max_items]
+        self.last_mode = "browser"
+        return self._scrape_browser(query, include_api=not static_tried)
+
+    def _scrape_browser(self, query: str, include_api: bool = True) -> List[Product]:
+        results: List[Product] = []
+        self._pages: List[Page] = []
+        self._manual_page: Optional[Page] = None
+        self._signals: List[str] = []
+        self._query = query
+        self.last_strategy = None
         try:
             with sync_playwright() as p:
-                browser = p.chromium.launch(headless=self.headless)
+                browser = browser_pool.launch(p, headless=self.headless)
                 context = browser.new_context(extra_http_headers={
                     "User-Agent": "Mozilla/5.0",
                     "Accept-Language": "es-ES,es;q=0.9"
                 })
-                api = self._api_search(context, query)
-                if api:
-                    browser.close()
-                    return api[:self.max_items]
+                profiling.attach(context)
+                pump_page = context.new_page()
 
-                page = context.new_page()
-                for pattern in self.SEARCH_PATTERNS:
-                    try:
-                        page.goto(self.BASE + pattern.format(q=quote(query)), timeout=self.timeout)
-                        self._wait_dom_growth(page)
-                        self._scroll(page)
-                        partial = self._collect_nodes(page, query)
-                        if partial:
-                            results.extend(partial)
-                            break
-                        if self.debug_html:
-                            self.last_html = page.content()
-                    except Exception:
-                        continue
+                # Todas las estrategias compiten sobre páginas del mismo contexto
+                strategies = {
+                    f"pattern:{i}": (lambda pat=pattern: self._pattern_strategy(context, pat, query))
+                    for i, pattern in enumerate(self.SEARCH_PATTERNS)
+                }
+                strategies["manual"] = lambda: self._manual_strategy(context, query)
+                if include_api:
+                    strategies["api"] = lambda: self._api_strategy(context, query)
 
-                if not results:
-                    try:
-                        page.goto(self.BASE, timeout=self.timeout)
-                        self._manual_search(page, query)
-                        self._wait_dom_growth(page)
-                        self._scroll(page)
-                        results = self._collect_nodes(page, query)
-                        if self.debug_html and not results:
-                            self.last_html = page.content()
-                    except Exception:
-                        pass
+                # Un bot wall, una página de error o "sin resultados" en
+                # cualquier estrategia es la respuesta del sitio: se corta la
+                # carrera en vez de esperar a que las demás se agoten
+                race = StrategyRace(self.STRATEGY_STATS)
+                winner, results = race.run(strategies, pump_page.wait_for_timeout, self.deadline.budget(self.timeout),
+                                           stop=lambda: self.deadline.expired() or bool(self._signals))
+                self.last_strategy = winner
+                if winner:
+                    print(f"Estrategia ganadora: {winner} items: {len(results)}")
+                elif self._signals:
+                    self.last_status = page_signals.summarize(self._signals, False)
+                elif race.timed_out:
+                    self.last_status = page_signals.TIMEOUT
 
-                if not results:
-                    links = page.query_selector_all("a[href*='/catalogo/'],a[href*='/promocion/']")
+                if not results and not self._signals and self._manual_page and not self._manual_page.is_closed():
+                    links = self._manual_page.query_selector_all("a[href*='/catalogo/'],a[href*='/promocion/']")
                     for a in links:
-                        if len(results) >= self.max_items:
+                        if len(results) >= self.max_items or self.deadline.expired():
                             break
                         href = a.get_attribute("href") or ""
                         full = urljoin(self.BASE, href)
                         title = self._clean(a.inner_text())
                         if title:
-                            results.append({"title": title, "url": full, "price": None})
+                            results.append(self._product(title, full, None))
 
+                for page in self._pages:
+                    try:
+                        page.close()
+                    except Exception:
+                        pass
+                profiling.detach(context)
                 browser.close()
-        except Exception:
-            pass
-        return results[:self.max_items]
\ No newline at end of file
+        except browser_pool.BrowserUnavailable:
+            raise
+        except Exception as e:
+            print(f"Vidri: fallo del navegador: {e!r}")
+            self.last_status = page_signals.ERROR
+        return results[:self.max_items]
@@ -1,7 +1,15 @@
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import json
+import os
+import threading
 import time
 import re
-from typing import List, Dict
+from urllib.parse import quote
+from typing import List, Dict, Optional
+from app import browser_pool, page_signals, politeness, profiling, snapshots, static_fetch, vtex_capture, waits
+from app.deadline import Deadline
+from app.product import Product
+from app.utils import data_path
 
 
 class WalmartScraper:
@@ -18,112 +26,240 @@ class WalmartScraper:
         "san_miguel": "walmartsvwm4411"
     }
 
+    HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+        "Accept-Language": "es-SV,es;q=0.9"
+    }
+
+    # Vigencia de los snapshots de storage_state por sucursal
+    STATE_TTL = int(os.getenv("WALMART_STATE_TTL", str(12 * 3600)))
+    _state_locks: Dict[str, threading.Lock] = {}
+    _state_locks_guard = threading.Lock()
+
+    MODES = ("all", "any", "first", "best_price")
+
+    READY_SELECTOR = ".vtex-search-result-3-x-galleryItem"
+    SIGNALS = page_signals.signals(no_results=page_signals.VTEX_NO_RESULTS)
+
+    # Precio mínimo visto por (consulta, sucursal), en Redis para que lo
+    # compartan los workers y sobreviva reinicios; solo lo usa best_price
+    FLOOR_TTL = int(os.getenv("WALMART_FLOOR_TTL", str(6 * 3600)))
+
     def __init__(self, headless: bool = True, max_items: int = 20):
         self.headless = headless
         self.max_items = max_items
-
-    def scrape(self, query: str) -> List[Dict]:
+        # La sucursal se elige en localStorage del lado del cliente, así que
+        # no hay modo estático: siempre se renderiza con Playwright.
+        self.last_mode = "browser"
+        self.last_status: Optional[str] = None
+        self._branch_status: Optional[str] = None
+        # Sucursales que quedaron sin visitar por deadline o cancelación
+        self.last_skipped = 0
+        self.deadline = Deadline()
+
+    @property
+    def incomplete(self) -> bool:
+        return self.deadline.expired()
+
+    @classmethod
+    def resolve_branches(cls, names: Optional[List[str]]) -> List[str]:
+        """
+        Convierte nombres de sucursal ("escalon", "Santa Ana") en claves de
+        STORES. Lanza ValueError si alguno no existe.
+        """
+        if not names:
+            return list(cls.STORES)
+        resolved = []
+        for name in names:
+            key = name.strip().lower().replace(" ", "_")
+            if key not in cls.STORES:
+                raise ValueError(f"Sucursal desconocida: {name}. Opciones: {', '.join(cls.STORES)}")
+            if key not in resolved:
+                resolved.append(key)
+        return resolved
+
+    def scrape(self, query: str, branches: Optional[List[str]] = None, mode: str = "all",
+               deadline: Optional[Deadline] = None) -> List[Product]:
         """
-        Busca en TODAS las sucursales y consolida resultados únicos
-        con información de disponibilidad por tienda.
+        Busca en las sucursales indicadas (todas por defecto) y consolida
+        resultados únicos con información de disponibilidad por tienda.
+
+        mode:
+          all        recorre todas las sucursales.
+          any/first  termina en la primera sucursal con resultados en stock.
+          best_price omite las sucursales que, por lo visto antes para esta
+                     consulta, no pueden mejorar el mejor precio encontrado.
+                     Es una heurística: el piso de una sucursal es el precio
+                     más bajo de cualquiera de sus productos, así que al
+                     omitirla se pierden los productos que solo ella tiene.
+                     Sirve para "¿dónde está más barato?", no para listar
+                     todo el surtido (para eso, all).
+
+        Si se agota el deadline se dejan de visitar sucursales y se
+        consolida lo obtenido hasta ese momento.
         """
+        self.deadline = deadline or Deadline()
+        if mode not in self.MODES:
+            raise ValueError(f"Modo desconocido: {mode}")
+        selected = self.resolve_branches(branches)
+        floors = self._floors(query, selected) if mode == "best_price" else {}
+        if mode == "best_price":
+            selected = self._order_by_floor(selected, floors)
+
         all_products = {}  # {product_key: product_data}
+        best_price = None
+        visited = 0
+        statuses = []
+        self.last_skipped = 0
+
+        for index, store_name in enumerate(selected):
+            if self.deadline.expired():
+                self.last_skipped = len(selected) - index
+                if self.deadline.cancelled:
+                    print(f"🛑 Cliente desconectado, {self.last_skipped} sucursales omitidas")
+                else:
+                    print(f"⏱️ Tiempo agotado, sucursales pendientes omitidas")
+                break
+            store_id = self.STORES[store_name]
+            if mode == "best_price" and best_price is not None and not self._can_beat(floors.get(store_name), best_price):
+                print(f"⏭️ {store_name.replace('_', ' ').title()} no puede mejorar ${best_price:.2f}, se omite")
+                continue
 
-        for store_name, store_id in self.STORES.items():
             print(f"\n{'='*60}")
             print(f"🏪 Buscando en: {store_name.replace('_', ' ').title()}")
             print(f"{'='*60}")
 
             results = self._scrape_single_store(query, store_id, store_name)
+            visited += 1
+            statuses.append(self._branch_status)
+            if self._branch_status == page_signals.BLOCKED:
+                # El bot wall es por IP/sesión: las demás sucursales darían lo mismo
+                print(f"🛑 Bloqueo detectado, se detiene el recorrido de sucursales")
+                break
+
+            branch_min = self._min_price(results)
+            if branch_min is not None:
+                self._record_floor(query, store_name, branch_min)
+                if best_price is None or branch_min < best_price:
+                    best_price = branch_min
 
             for product in results:
                 # Crear clave única basada en nombre normalizado
-                product_key = self._normalize_product_name(product["name"])
+                product_key = self._normalize_product_name(product.name)
+                existing = all_products.get(product_key)
 
-                if product_key in all_products:
+                if existing is not None:
                     # Producto ya existe, agregar sucursal a la lista
-                    all_products[product_key]["available_stores"].append(store_name)
+                    existing.available_stores.append(store_name)
 
                     # Actualizar precio si es mejor en esta sucursal
-                    if product["price_discount"]:
-                        existing_discount = all_products[product_key]["price_discount"]
-                        if not existing_discount or self._compare_prices(product["price_discount"], existing_discount) < 0:
-                            all_products[product_key]["price_discount"] = product["price_discount"]
-                            all_products[product_key]["best_price_store"] = store_name.replace("_", " ").title()
+                    if product.price_discount:
+                        if not existing.price_discount or self._compare_prices(product.price_discount, existing.price_discount) < 0:
+                            existing.set_prices(existing.price_original, product.price_discount)
+                            existing.best_price_store = store_name.replace("_", " ").title()
                 else:
                     # Nuevo producto
-                    product["available_stores"] = [store_name]
-                    product["best_price_store"] = store_name.replace("_", " ").title()
+                    product.available_stores = [store_name]
+                    product.best_price_store = store_name.replace("_", " ").title()
                     all_products[product_key] = product
 
+            if mode in ("any", "first") and results:
+                break
+
         # Convertir a lista y formatear nombres de sucursales
         final_results = []
         for product in all_products.values():
             # Formatear nombres de sucursales
-            stores_formatted = [s.replace("_", " ").title() for s in product["available_stores"]]
-            product["available_stores"] = stores_formatted
-            product["stores_count"] = len(stores_formatted)
+            stores_formatted = [s.replace("_", " ").title() for s in product.available_stores]
+            product.available_stores = stores_formatted
+            product.stores_count = len(stores_formatted)
             final_results.append(product)
 
         # Ordenar por disponibilidad (más sucursales primero)
-        final_results.sort(key=lambda x: x["stores_count"], reverse=True)
+        final_results.sort(key=lambda x: x.stores_count, reverse=True)
+        self.last_status = page_signals.summarize(statuses, bool(final_results))
 
         print(f"\n{'='*60}")
         print(f"📊 RESUMEN FINAL")
         print(f"{'='*60}")
         print(f"✅ Total productos únicos: {len(final_results)}")
-        print(f"🏪 Sucursales consultadas: {len(self.STORES)}")
+        print(f"🏪 Sucursales consultadas: {visited} de {len(selected)}")
 
         return final_results
 
-    def _scrape_single_store(self, query: str, store_id: str, store_name: str) -> List[Dict]:
+    def _scrape_single_store(self, query: str, store_id: str, store_name: str) -> List[Product]:
         """Método interno: scraping de una sola sucursal"""
         results = []
+        self._branch_status = None
 
         with sync_playwright() as p:
-            browser = p.chromium.launch(headless=self.headless)
+            browser = browser_pool.launch(p, headless=self.headless)
+            context = None
+            page = None
             try:
-                page = browser.new_page()
-                page.set_viewport_size({"width": 1920, "height": 1080})
-                page.set_extra_http_headers({
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                    "Accept-Language": "es-SV,es;q=0.9"
-                })
-
-                print(f"⚙️ Configurando sucursal: {store_id}")
-                page.goto(self.BASE, wait_until="domcontentloaded", timeout=30000)
-
-                page.evaluate(f"""
-                    localStorage.setItem('verifySelectedSeller', '{store_id}');
-                """)
-
-                time.sleep(2)
-
-                search_url = f"{self.BASE}/{query}"
-                print(f"🔍 Navegando a búsqueda...")
+                search_url = f"{self.BASE}/{quote(query)}"
+                for attempt in range(2):
+                    try:
+                        state_path = self._storage_state(browser, store_id, refresh=attempt > 0)
+                    except PlaywrightTimeoutError:
+                        return []
+                    context = browser.new_context(
+                        storage_state=state_path,
+                        viewport={"width": 1920, "height": 1080},
+                        extra_http_headers=self.HEADERS
+                    )
+                    profiling.attach(context)
+                    page = context.new_page()
+                    capture = vtex_capture.SearchCapture(page, query, self.BASE)
 
-                try:
-                    page.goto(search_url, wait_until="domcontentloaded", timeout=30000)
+                    print(f"🔍 Navegando a búsqueda...")
                     try:
-                        page.wait_for_load_state("networkidle", timeout=30000)
+                        politeness.goto(page, "walmart", search_url, deadline=self.deadline, wait_until="domcontentloaded",
+                                        timeout=self.deadline.budget(30000))
                     except PlaywrightTimeoutError:
-                        pass
+                        return []
+
+                    # Lo primero que aparezca: el JSON de la búsqueda, productos en
+                    # el DOM, "sin resultados", bot wall o error
+                    state = capture.wait(self.READY_SELECTOR, self.SIGNALS, self.deadline.budget(30000),
+                                          stop=self.deadline.expired)
+
+                    # Si el snapshot ya no surte efecto se regenera una vez
+                    if attempt > 0 or self._seller_applied(capture, store_id) is not False:
+                        break
+                    print(f"♻️ Snapshot de sucursal sin efecto, regenerando: {store_id}")
+                    profiling.detach(context)
+                    context.close()
+
+                products = capture.products() if state == vtex_capture.CAPTURED else None
+                if products is not None:
+                    # Ya con la sucursal aplicada: sin networkidle, sleeps ni scroll
+                    if not products:
+                        self._branch_status = page_signals.NO_RESULTS
+                    results = self._from_capture(products, query)
+                    print(f"⚡ Respuesta de búsqueda capturada: {len(results)}")
+                    return results
+                self._branch_status = state if state in page_signals.ORDER else None
+                if self._branch_status in page_signals.ORDER:
+                    print(f"🚫 {store_name.replace('_', ' ').title()}: {self._branch_status}")
+                    return []
 
-                    time.sleep(5)
+                try:
+                    waits.load_state(page, self.deadline, "networkidle", 30000)
+                except PlaywrightTimeoutError:
+                    pass
 
-                    for i in range(5):
-                        page.evaluate("window.scrollBy(0, 800)")
-                        time.sleep(1.5)
+                self.deadline.sleep(5)
 
-                except PlaywrightTimeoutError:
-                    return []
+                for i in range(5):
+                    if self.deadline.expired():
+                        break
+                    page.evaluate("window.scrollBy(0, 800)")
+                    self.deadline.sleep(1.5)
 
                 try:
-                    page.wait_for_selector(
-                        ".vtex-search-result-3-x-galleryItem section",
-                        timeout=15000,
-                        state="visible"
-                    )
+                    waits.selector(page, self.deadline, ".vtex-search-result-3-x-galleryItem section", 15000,
+                                   state="visible")
                 except PlaywrightTimeoutError:
                     pass
 
@@ -133,96 +269,11 @@ class WalmartScraper:
                 if len(products) == 0:
                     return []
 
-                for idx, product in enumerate(products[:self.max_items]):
-                    try:
-                        all_buttons = product.query_selector_all("button")
-                        is_out_of_stock = False
-
-                        for btn in all_buttons:
-                            text = btn.inner_text().strip().lower()
-                            if text and any(word in text for word in ["agregar", "agotado", "out of stock", "sin stock", "añadir", "comprar"]):
-                                if any(word in text for word in ["agotado", "out of stock", "sin stock", "no disponible"]):
-                                    is_out_of_stock = True
-                                break
-
-                        if is_out_of_stock:
-                            continue
-
-                        href = None
-                        link_elem = product.query_selector("a")
-                        if link_elem:
-                            href = link_elem.get_attribute("href")
-                            if href and not href.startswith("http"):
-                                href = self.BASE + href
-
-                        if not href:
-                            continue
-
-                        img_src = None
-                        img_elem = product.query_selector("img")
-                        if img_elem:
-                            img_src = img_elem.get_attribute("src") or img_elem.get_attribute("data-src")
-
-                        name = None
-                        if link_elem:
-                            name = link_elem.get_attribute("aria-label")
-
-                        if name:
-                            prefixes = ["View product details for ", "Ver detalles del producto "]
-                            for prefix in prefixes:
-                                if name.startswith(prefix):
-                                    name = name[len(prefix):]
-                                    break
-
-                        if not name or len(name) < 5:
-                            for sel in ["span.vtex-product-summary-2-x-productBrand", "span[class*='productName']", "h3", "h2"]:
-                                elem = product.query_selector(sel)
-                                if elem:
-                                    text = elem.inner_text().strip()
-                                    if text and len(text) > 5 and "$" not in text:
-                                        name = text
-                                        break
-
-                        if not name:
-                            continue
-
-                        price_text = product.inner_text()
-                        prices = re.findall(r'\$[\d,]+\.?\d*', price_text)
-
-                        unique_prices = []
-                        for p in prices:
-                            if p not in unique_prices:
-                                unique_prices.append(p)
-
-                        original_price = ""
-                        discount_price = ""
-
-                        if len(unique_prices) >= 2:
-                            original_price = unique_prices[0]
-                            discount_price = unique_prices[1]
-                        elif len(unique_prices) == 1:
-                            original_price = unique_prices[0]
-
-                        if not original_price and not discount_price:
-                            continue
-
-                        if not self.is_relevant(name, query):
-                            continue
-
-                        results.append({
-                            "store": "Walmart",
-                            "name": name,
-                            "price_original": original_price,
-                            "price_discount": discount_price,
-                            "url": href,
-                            "image": img_src or ""
-                        })
-
-                    except Exception as e:
-                        print(f"❌ Error en producto {idx}: {str(e)}")
-                        continue
-
+                results = self._extract_products(products, query)
             finally:
+                snapshots.capture_page("walmart", query, page)
+                if context is not None:
+                    profiling.detach(context)
                 try:
                     browser.close()
                 except Exception:
@@ -231,6 +282,221 @@ class WalmartScraper:
         print(f"✅ Productos válidos: {len(results)}")
         return results
 
+    def _extract_products(self, products, query: str) -> List[Product]:
+        """
+        Tarjetas de la galería a productos. Recibe ElementHandles de Playwright
+        o nodos static_fetch.SoupElement de un snapshot archivado.
+        """
+        results = []
+        for idx, product in enumerate(products[:self.max_items]):
+            if self.deadline.expired():
+                break
+            try:
+                all_buttons = product.query_selector_all("button")
+                is_out_of_stock = False
+
+                for btn in all_buttons:
+                    text = btn.inner_text().strip().lower()
+                    if text and any(word in text for word in ["agregar", "agotado", "out of stock", "sin stock", "añadir", "comprar"]):
+                        if any(word in text for word in ["agotado", "out of stock", "sin stock", "no disponible"]):
+                            is_out_of_stock = True
+                        break
+
+                if is_out_of_stock:
+                    continue
+
+                href = None
+                link_elem = product.query_selector("a")
+                if link_elem:
+                    href = link_elem.get_attribute("href")
+                    if href and not href.startswith("http"):
+                        href = self.BASE + href
+
+                if not href:
+                    continue
+
+                img_src = None
+                img_elem = product.query_selector("img")
+                if img_elem:
+                    img_src = img_elem.get_attribute("src") or img_elem.get_attribute("data-src")
+
+                name = None
+                if link_elem:
+                    name = link_elem.get_attribute("aria-label")
+
+                if name:
+                    prefixes = ["View product details for ", "Ver detalles del producto "]
+                    for prefix in prefixes:
+                        if name.startswith(prefix):
+                            name = name[len(prefix):]
+                            break
+
+                if not name or len(name) < 5:
+                    for sel in ["span.vtex-product-summary-2-x-productBrand", "span[class*='productName']", "h3", "h2"]:
+                        elem = product.query_selector(sel)
+                        if elem:
+                            text = elem.inner_text().strip()
+                            if text and len(text) > 5 and "$" not in text:
+                                name = text
+                                break
+
+                if not name:
+                    continue
+
+                price_text = product.inner_text()
+                prices = re.findall(r'\$[\d,]+\.?\d*', price_text)
+
+                unique_prices = []
+                for p in prices:
+                    if p not in unique_prices:
+                        unique_prices.append(p)
+
+                original_price = ""
+                discount_price = ""
+
+                if len(unique_prices) >= 2:
+                    original_price = unique_prices[0]
+                    discount_price = unique_prices[1]
+                elif len(unique_prices) == 1:
+                    original_price = unique_prices[0]
+
+                if not original_price and not discount_price:
+                    continue
+
+                if not self.is_relevant(name, query):
+                    continue
+
+                results.append(Product(
+                    "Walmart", name,
+                    original_price, discount_price,
+                    url=href, image=img_src or ""
+                ))
+
+            except Exception as e:
+                print(f"❌ Error en producto {idx}: {str(e)}")
+                continue
+        return results
+
+    def _from_capture(self, products: List[Dict], query: str) -> List[Product]:
+        """Resultados desde el JSON de búsqueda de VTEX; omite agotados como el camino del DOM."""
+        results = []
+        for product in products:
+            name = product["name"]
+            if not name or product["available"] is False or not product["price"]:
+                continue
+            if not self.is_relevant(name, query):
+                continue
+            prices = vtex_capture.format_prices(product)
+            results.append(Product(
+                "Walmart", name,
+                prices["original"], prices["discount"],
+                url=product["url"], image=product["image"]
+            ))
+            if len(results) >= self.max_items:
+                break
+        return results
+
+    def parse_html(self, html: str, query: str) -> List[Product]:
+        """Extracción sobre el DOM archivado en snapshots, sin navegador."""
+        doc = static_fetch.soup(html)
+        products = [static_fetch.SoupElement(node) for node in doc.select(".vtex-search-result-3-x-galleryItem section")]
+        if not products:
+            self.last_status = page_signals.classify_html(doc, self.SIGNALS)
+        return self._extract_products(products, query)
+
+    def _min_price(self, products: List[Product]) -> Optional[float]:
+        values = [p.price for p in products if p.price is not None]
+        return min(values) if values else None
+
+    def _floor_key(self, query: str, store_name: str) -> str:
+        return f"walmart:floor:{self._normalize_product_name(query)}:{store_name}"
+
+    def _record_floor(self, query: str, store_name: str, price: float):
+        # Import tardío: el bench importa los scrapers sin JWT_SECRET ni Redis
+        from app.auth import redis_client
+        try:
+            redis_client.set(self._floor_key(query, store_name), price, ex=self.FLOOR_TTL)
+        except Exception as e:
+            print(f"⚠️ Pisos de precio no disponibles: {e}")
+
+    def _floors(self, query: str, branches: List[str]) -> Dict[str, Optional[float]]:
+        """Piso vigente de cada sucursal; sin Redis ninguno (no se omite nada)."""
+        from app.auth import redis_client
+        try:
+            values = redis_client.mget([self._floor_key(query, b) for b in branches])
+        except Exception as e:
+            print(f"⚠️ Pisos de precio no disponibles: {e}")
+            values = [None] * len(branches)
+        return {b: float(v) if v is not None else None for b, v in zip(branches, values)}
+
+    def _order_by_floor(self, branches: List[str], floors: Dict[str, Optional[float]]) -> List[str]:
+        # Primero las sucursales que antes fueron más baratas; las
+        # desconocidas al final porque no se pueden descartar.
+        return sorted(branches, key=lambda b: (floors.get(b) is None, floors.get(b) or 0.0))
+
+    def _can_beat(self, floor: Optional[float], best_price: float) -> bool:
+        return floor is None or floor < best_price
+
+    def _state_lock(self, store_id: str) -> threading.Lock:
+        with self._state_locks_guard:
+            return self._state_locks.setdefault(store_id, threading.Lock())
+
+    def _state_is_fresh(self, path: str) -> bool:
+        try:
+            if time.time() - os.path.getmtime(path) > self.STATE_TTL:
+                return False
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        now = time.time()
+        for cookie in state.get("cookies", []):
+            expires = cookie.get("expires", -1)
+            if 0 < expires < now:
+                return False
+        return True
+
+    def _storage_state(self, browser, store_id: str, refresh: bool = False) -> str:
+        """
+        Snapshot (cookies + localStorage) con la sucursal ya seleccionada.
+        Se crea una sola vez por sucursal y se reutiliza hasta que vence.
+        """
+        path = data_path("walmart_state", f"{store_id}.json")
+        with self._state_lock(store_id):
+            if not refresh and self._state_is_fresh(path):
+                return path
+
+            print(f"⚙️ Configurando sucursal: {store_id}")
+            context = browser.new_context(extra_http_headers=self.HEADERS)
+            try:
+                page = context.new_page()
+                politeness.goto(page, "walmart", self.BASE, deadline=self.deadline, wait_until="domcontentloaded",
+                                timeout=self.deadline.budget(30000))
+                page.evaluate("(id) => localStorage.setItem('verifySelectedSeller', id)", store_id)
+                # Margen para que la tienda asiente la sucursal; corta con el deadline o la cancelación
+                self.deadline.sleep(2)
+                if self.deadline.expired():
+                    # Sin el margen completo el snapshot podría quedar a medias y duraría STATE_TTL
+                    raise PlaywrightTimeoutError(f"Sucursal {store_id} sin configurar: deadline agotado")
+                tmp = f"{path}.tmp"
+                context.storage_state(path=tmp)
+                os.replace(tmp, path)
+            finally:
+                context.close()
+            return path
+
+    def _seller_applied(self, capture: vtex_capture.SearchCapture, store_id: str) -> Optional[bool]:
+        """
+        Si la búsqueda que la página hizo vino con la oferta de la sucursal:
+        los sellers del JSON capturado. localStorage no sirve de prueba porque
+        sale del mismo snapshot. None si no hay con qué saberlo (sin JSON o
+        sin productos).
+        """
+        sellers = capture.sellers()
+        if not sellers:
+            return None
+        return store_id in sellers
+
     def _normalize_product_name(self, name: str) -> str:
         """
         Normaliza nombre de producto para consolidación.
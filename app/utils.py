@@ -1,2 +1,110 @@
+import json
+import os
+import re
+import tempfile
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Optional
+
+
 def normalize_query(query: str) -> str:
     return query.strip().replace(" ", "+")
+
+
+@lru_cache(maxsize=1)
+def _synonyms() -> Dict[str, str]:
+    """
+    Mapa opcional de sinónimos (JSON {"frase": "canónica"}) en
+    QUERY_SYNONYMS_PATH. Las claves se canonicalizan igual que las consultas.
+    """
+    path = os.getenv("QUERY_SYNONYMS_PATH")
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"No se pudo leer el mapa de sinónimos {path}: {e}")
+        return {}
+    return {_fold(k): _fold(v) for k, v in raw.items()}
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.strip().lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text)
+
+
+def canonicalize_query(query: str) -> str:
+    """
+    Forma canónica de una consulta: sin espacios sobrantes, en minúsculas,
+    sin acentos y con los sinónimos configurados aplicados. Es la clave de
+    caché, deduplicación y feed de cambios; a las tiendas va search_query().
+    """
+    canonical = _fold(query)
+    synonyms = _synonyms()
+    if not synonyms:
+        return canonical
+    words = canonical.split(" ")
+    out = []
+    i = 0
+    # Frases más largas primero ("aire acondicionado" antes que "aire")
+    longest = max(len(k.split(" ")) for k in synonyms)
+    while i < len(words):
+        for size in range(min(longest, len(words) - i), 0, -1):
+            phrase = " ".join(words[i:i + size])
+            if phrase in synonyms:
+                out.append(synonyms[phrase])
+                i += size
+                break
+        else:
+            out.append(words[i])
+            i += 1
+    return " ".join(out)
+
+
+def search_query(query: str) -> str:
+    """
+    Lo que se envía a la tienda: la consulta sin espacios sobrantes pero con
+    sus acentos y eñes. Los is_relevant comparan contra los nombres tal como
+    los muestra la tienda, así que "cafe" no encontraría "Café".
+    """
+    return re.sub(r"\s+", " ", query.strip())
+
+
+_PRICE_NUMBER_RE = re.compile(r"\d[\d.,]*")
+
+
+def parse_price(text: Optional[str]) -> Optional[float]:
+    """
+    Primer monto de un texto de precio como número: "$1,299.99",
+    "US$ 1.299,99", "$25" -> 1299.99, 1299.99, 25.0. None si no hay monto.
+    """
+    if not text:
+        return None
+    m = _PRICE_NUMBER_RE.search(text)
+    if not m:
+        return None
+    raw = m.group(0).rstrip(".,")
+    if "." in raw and "," in raw:
+        # El separador que aparece último es el decimal
+        decimal = "." if raw.rfind(".") > raw.rfind(",") else ","
+        thousands = "," if decimal == "." else "."
+        raw = raw.replace(thousands, "").replace(decimal, ".")
+    elif "," in raw:
+        whole, _, tail = raw.rpartition(",")
+        raw = f"{whole.replace(',', '')}.{tail}" if len(tail) != 3 else raw.replace(",", "")
+    elif raw.count(".") > 1 or (raw.count(".") == 1 and len(raw.rpartition(".")[2]) == 3):
+        raw = raw.replace(".", "")
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def data_path(*parts: str) -> str:
+    """Ruta dentro del directorio de datos persistentes (DATA_DIR)."""
+    base = os.getenv("DATA_DIR", os.path.join(tempfile.gettempdir(), "kerroscraper"))
+    path = os.path.join(base, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
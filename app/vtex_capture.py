@@ -0,0 +1,199 @@
+import base64
+import json
+import time
+from typing import Callable, Dict, List, Optional, Set
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+from app import page_signals
+from app.utils import canonicalize_query
+
+# Estado extra de SearchCapture.wait: llegó el JSON de la búsqueda
+CAPTURED = "captured"
+
+GRAPHQL_PATHS = ("/_v/segment/graphql/v1", "/_v/private/graphql/v1", "/_v/public/graphql/v1")
+INTELLIGENT_SEARCH_PATH = "intelligent-search/product_search"
+
+
+def _graphql_operation(url: str, post_data: Optional[str]) -> Dict:
+    """operationName y variables de un request GraphQL de VTEX IO (GET persistido o POST)."""
+    if post_data:
+        try:
+            body = json.loads(post_data)
+            return {"operation": body.get("operationName") or "", "variables": body.get("variables") or {}}
+        except (ValueError, AttributeError):
+            return {"operation": "", "variables": {}}
+    params = parse_qs(urlsplit(url).query)
+    variables = {}
+    try:
+        # Las consultas persistidas llevan las variables en base64 dentro de extensions
+        extensions = json.loads(params.get("extensions", ["{}"])[0])
+        raw = extensions.get("variables")
+        if raw:
+            variables = json.loads(base64.b64decode(raw + "=" * (-len(raw) % 4)))
+    except (ValueError, TypeError, AttributeError):
+        pass
+    return {"operation": params.get("operationName", [""])[0], "variables": variables}
+
+
+def search_terms(url: str, post_data: Optional[str] = None) -> Optional[str]:
+    """
+    Texto buscado si la URL es la búsqueda de productos de VTEX
+    ("" si no se pudo leer), o None si es cualquier otra respuesta.
+    """
+    path = urlsplit(url).path
+    if INTELLIGENT_SEARCH_PATH in path:
+        params = parse_qs(urlsplit(url).query)
+        return params.get("query", params.get("q", [""]))[0]
+    if any(path.endswith(p) for p in GRAPHQL_PATHS):
+        op = _graphql_operation(url, post_data)
+        if not op["operation"].startswith("productSearch"):
+            return None
+        variables = op["variables"] if isinstance(op["variables"], dict) else {}
+        return variables.get("fullText") or variables.get("query") or ""
+    return None
+
+
+def _offer(item: Dict) -> Dict:
+    sellers = item.get("sellers") or []
+    seller = next((s for s in sellers if s.get("sellerDefault")), sellers[0] if sellers else {})
+    return seller.get("commertialOffer") or {}
+
+
+def _search_payload(data) -> Optional[Dict]:
+    # productSearch de GraphQL o la respuesta de intelligent-search, con la lista de productos
+    if not isinstance(data, dict):
+        return None
+    payload = (data.get("data") or {}).get("productSearch") if "data" in data else data
+    if not isinstance(payload, dict) or not isinstance(payload.get("products"), list):
+        return None
+    return payload
+
+
+def parse_products(data, base: str) -> Optional[List[Dict]]:
+    """
+    Productos de una respuesta productSearch (GraphQL) o intelligent-search.
+    Retorna dicts crudos {name, brand, url, image, price, list_price,
+    available}; None si el JSON no tiene esa forma.
+    """
+    payload = _search_payload(data)
+    if payload is None:
+        return None
+
+    out = []
+    for prod in payload["products"]:
+        if not isinstance(prod, dict):
+            continue
+        items = prod.get("items") or []
+        item = items[0] if items else {}
+        offer = _offer(item)
+        images = item.get("images") or []
+        price_range = prod.get("priceRange") or {}
+        price = offer.get("Price") or (price_range.get("sellingPrice") or {}).get("lowPrice")
+        list_price = offer.get("ListPrice") or (price_range.get("listPrice") or {}).get("highPrice")
+        link = prod.get("link") or (f"/{prod['linkText']}/p" if prod.get("linkText") else "")
+        stock = offer.get("AvailableQuantity")
+        out.append({
+            "name": prod.get("productName") or "",
+            "brand": prod.get("brand") or None,
+            "url": urljoin(base, link) if link else "",
+            "image": images[0].get("imageUrl", "") if images and isinstance(images[0], dict) else "",
+            "price": float(price) if price else None,
+            "list_price": float(list_price) if list_price else None,
+            "available": stock > 0 if isinstance(stock, (int, float)) else None
+        })
+    return out
+
+
+def seller_ids(data) -> Optional[Set[str]]:
+    """sellerId de las ofertas de una respuesta de búsqueda; None si el JSON no tiene esa forma."""
+    payload = _search_payload(data)
+    if payload is None:
+        return None
+    return {
+        seller["sellerId"]
+        for prod in payload["products"] if isinstance(prod, dict)
+        for item in prod.get("items") or []
+        for seller in item.get("sellers") or []
+        if seller.get("sellerId")
+    }
+
+
+def format_prices(product: Dict) -> Dict[str, str]:
+    """price_original/price_discount en el mismo formato de texto que el DOM."""
+    price, list_price = product["price"], product["list_price"]
+    fmt = lambda value: f"${value:,.2f}"
+    if price and list_price and list_price > price:
+        return {"original": fmt(list_price), "discount": fmt(price)}
+    return {"original": fmt(price) if price else "", "discount": ""}
+
+
+class SearchCapture:
+    """
+    Escucha las respuestas de la página y guarda las de la búsqueda de
+    productos de VTEX (productSearch / intelligent-search) para `query`.
+    Registrar antes de page.goto() para no perder la primera.
+    """
+
+    def __init__(self, page, query: str, base: str):
+        self.page = page
+        self.base = base
+        self.query_tokens = canonicalize_query(query).split()
+        self.responses = []
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        # Solo propiedades locales: en el handler no se hacen llamadas al navegador
+        try:
+            if response.status != 200:
+                return
+            terms = search_terms(response.url, response.request.post_data)
+        except Exception:
+            return
+        if terms is None:
+            return
+        folded = canonicalize_query(terms)
+        # Búsquedas de otros componentes (sugerencias, vitrinas) no cuentan
+        if folded and self.query_tokens and self.query_tokens[0] not in folded:
+            return
+        self.responses.append(response)
+
+    def wait(self, ready: str, store_signals: Dict, timeout_ms: int, poll_ms: int = 250,
+             stop: Optional[Callable[[], bool]] = None) -> str:
+        """
+        Lo primero que ocurra: llega el JSON (CAPTURED), aparecen productos
+        en el DOM, o la página muestra "sin resultados"/bot wall/error.
+        `stop` (p. ej. deadline.expired) corta la espera entre sondeos.
+        """
+        end = time.monotonic() + timeout_ms / 1000
+        while True:
+            if self.responses:
+                return CAPTURED
+            remaining = int((end - time.monotonic()) * 1000)
+            if remaining <= 0 or (stop is not None and stop()):
+                return page_signals.TIMEOUT
+            state = page_signals.wait_for_outcome(self.page, ready, store_signals, min(poll_ms, remaining), poll_ms)
+            if state != page_signals.TIMEOUT:
+                # Con productos ya en el DOM el JSON casi siempre llegó antes
+                return CAPTURED if self.responses else state
+
+    def products(self) -> Optional[List[Dict]]:
+        """Productos del último JSON capturado que se pudo leer; None si ninguno sirve."""
+        for response in reversed(self.responses):
+            try:
+                parsed = parse_products(response.json(), self.base)
+            except Exception:
+                continue
+            if parsed is not None:
+                return parsed
+        return None
+
+    def sellers(self) -> Optional[Set[str]]:
+        """Sellers (sucursales, en Walmart) del último JSON capturado que se pudo leer."""
+        for response in reversed(self.responses):
+            try:
+                found = seller_ids(response.json())
+            except Exception:
+                continue
+            if found is not None:
+                return found
+        return None
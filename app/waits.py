@@ -0,0 +1,52 @@
+import os
+import time
+from typing import Callable, TypeVar
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from app.deadline import Deadline
+
+# La API sync de Playwright no se puede interrumpir desde otro hilo: una
+# espera de 30 s sigue aunque deadline.cancel() llegue al primer segundo.
+# Las esperas largas se hacen en tramos de este tamaño y entre tramos se
+# revisa el deadline, así un cancel() se nota en a lo sumo un tramo.
+WAIT_SLICE_MS = int(os.getenv("WAIT_SLICE_MS", "250"))
+
+T = TypeVar("T")
+
+
+def sliced(deadline: Deadline, wait: Callable[[int], T], ms: float) -> T:
+    """
+    Llama wait(timeout_ms) en tramos hasta que retorne sin timeout. Si se
+    agota budget(ms) o el deadline vence/se cancela lanza TimeoutError de
+    Playwright, igual que la espera de una sola vez.
+    """
+    end = time.monotonic() + deadline.budget(ms) / 1000
+    while True:
+        remaining = int((end - time.monotonic()) * 1000)
+        if remaining <= 0 or deadline.expired():
+            raise PlaywrightTimeoutError(f"Espera cortada tras {int(ms)} ms o por el deadline")
+        try:
+            return wait(max(1, min(WAIT_SLICE_MS, remaining)))
+        except PlaywrightTimeoutError:
+            continue
+
+
+def load_state(page, deadline: Deadline, state: str, ms: float):
+    """page.wait_for_load_state en tramos. El estado lo registra la página: repetir la espera no lo reinicia."""
+    sliced(deadline, lambda timeout: page.wait_for_load_state(state, timeout=timeout), ms)
+
+
+def selector(page, deadline: Deadline, css: str, ms: float, **kwargs):
+    """page.wait_for_selector en tramos."""
+    return sliced(deadline, lambda timeout: page.wait_for_selector(css, timeout=timeout, **kwargs), ms)
+
+
+def pause(page, deadline: Deadline, ms: float):
+    """page.wait_for_timeout (procesa eventos de Playwright mientras espera) que despierta con el deadline."""
+    end = time.monotonic() + deadline.budget(ms) / 1000
+    while not deadline.expired():
+        remaining = int((end - time.monotonic()) * 1000)
+        if remaining <= 0:
+            return
+        page.wait_for_timeout(min(WAIT_SLICE_MS, remaining))
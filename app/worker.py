@@ -0,0 +1,161 @@
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+import redis
+
+from app import politeness, profiling
+from app.deadline import Deadline
+from app.product import json_default
+from app.auth import redis_client
+from app.jobs import (DEAD_STREAM, JOB_MAX_ATTEMPTS, JOB_TIMEOUT, JOBS_GROUP, JOBS_MAXLEN, JOBS_STREAM,
+                      RECLAIM_MARGIN, RESULT_TTL, decode_job, encode_job, result_key)
+
+from app.stores import SCRAPERS
+
+
+class Worker:
+    """
+    Consume trabajos de scraping del stream de Redis como miembro del grupo
+    de consumidores. Cada trabajo se confirma (XACK) solo después de publicar
+    su resultado; si el worker muere o se cuelga, el trabajo queda pendiente
+    y otro worker lo reclama pasado JOB_TIMEOUT (más un margen).
+
+    Todo scrape se acota al deadline del trabajo, que nunca pasa de
+    JOB_TIMEOUT: cuando la API ya respondió 504 nadie sigue navegando, y
+    un trabajo reclamado ya vencido se descarta en vez de repetirse.
+    """
+
+    def __init__(self, name: Optional[str] = None, block_ms: Optional[int] = 5000):
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.block_ms = block_ms
+        self.processed = 0
+        self.failed = 0
+        self._stop = threading.Event()
+
+    def ensure_group(self):
+        try:
+            redis_client.xgroup_create(JOBS_STREAM, JOBS_GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _reclaim(self) -> List[Tuple[str, Dict]]:
+        # Trabajos de workers caídos o colgados. min_idle queda por encima de
+        # cualquier deadline: un worker vivo ya terminó (o cortó) su scrape
+        reply = redis_client.xautoclaim(JOBS_STREAM, JOBS_GROUP, self.name,
+                                        min_idle_time=int((JOB_TIMEOUT + RECLAIM_MARGIN) * 1000),
+                                        start_id="0-0", count=10)
+        return [entry for entry in reply[1] if entry and entry[1]]
+
+    def _deliveries(self, entry_id: str) -> int:
+        info = redis_client.xpending_range(JOBS_STREAM, JOBS_GROUP, min=entry_id, max=entry_id, count=1)
+        return info[0]["times_delivered"] if info else 1
+
+    def _publish(self, pipe, job_id: str, payload: Dict):
+        key = result_key(job_id)
+        pipe.rpush(key, orjson.dumps(payload, default=json_default))
+        pipe.expire(key, RESULT_TTL)
+
+    def _dead_letter(self, entry_id: str, fields: Dict, job_id: str, error: str):
+        print(f"☠️ Job {job_id} a dead-letter: {error}")
+        self.failed += 1
+        pipe = redis_client.pipeline()
+        pipe.xadd(DEAD_STREAM, {**fields, "error": error, "consumer": self.name, "failed_at": f"{time.time():.3f}"},
+                  maxlen=JOBS_MAXLEN, approximate=True)
+        self._publish(pipe, job_id, {"error": error})
+        pipe.xack(JOBS_STREAM, JOBS_GROUP, entry_id)
+        pipe.execute()
+
+    def execute(self, job: Dict) -> Tuple[List[Dict], Optional[str], bool, Optional[str]]:
+        scraper = SCRAPERS[job["store"]]()
+        # Deadline(0) no limitaría nada: un trabajo al borde vence igual
+        deadline = Deadline(max(1.0, (job["deadline"] - time.time()) * 1000))
+        with politeness.session(job["store"], job["user"], deadline=deadline) as session:
+            with profiling.profile(job["store"], job["query"]):
+                results = scraper.scrape(job["query"], deadline=deadline, **job["kwargs"])
+            session.status = getattr(scraper, "last_status", None)
+        return (results, getattr(scraper, "last_mode", None), deadline.expired(),
+                getattr(scraper, "last_status", None))
+
+    def handle(self, entry_id: str, fields: Dict):
+        try:
+            job = decode_job(fields)
+        except (KeyError, ValueError) as e:
+            self._dead_letter(entry_id, fields, fields.get("id", entry_id), f"Job inválido: {e!r}")
+            return
+
+        # Intentos explícitos (reencolados) más reentregas por reclamo
+        attempt = job["attempt"] + self._deliveries(entry_id) - 1
+        if time.time() > job["deadline"]:
+            # La API ya respondió con timeout; nadie espera este resultado
+            print(f"⏱️ Job {job['id']} vencido ({job['store']}/{job['query']}), se descarta")
+            redis_client.xack(JOBS_STREAM, JOBS_GROUP, entry_id)
+            return
+        if job["store"] not in SCRAPERS:
+            self._dead_letter(entry_id, fields, job["id"], f"Tienda desconocida: {job['store']}")
+            return
+        if attempt > JOB_MAX_ATTEMPTS:
+            self._dead_letter(entry_id, fields, job["id"], f"Se agotaron {JOB_MAX_ATTEMPTS} intentos")
+            return
+
+        try:
+            results, mode, incomplete, status = self.execute(job)
+        except Exception as e:
+            if attempt >= JOB_MAX_ATTEMPTS:
+                self._dead_letter(entry_id, fields, job["id"], repr(e))
+                return
+            print(f"🔁 Job {job['id']} falló (intento {attempt}/{JOB_MAX_ATTEMPTS}): {e}")
+            pipe = redis_client.pipeline()
+            pipe.xadd(JOBS_STREAM, encode_job(job["id"], job["store"], job["query"], job["kwargs"],
+                                              attempt + 1, job["deadline"], job["budgeted"], job["user"]),
+                      maxlen=JOBS_MAXLEN, approximate=True)
+            pipe.xack(JOBS_STREAM, JOBS_GROUP, entry_id)
+            pipe.execute()
+            return
+
+        pipe = redis_client.pipeline()
+        self._publish(pipe, job["id"], {"results": results, "mode": mode, "incomplete": incomplete,
+                                        "status": status})
+        pipe.xack(JOBS_STREAM, JOBS_GROUP, entry_id)
+        pipe.execute()
+        self.processed += 1
+
+    def run_once(self) -> int:
+        entries = self._reclaim()
+        if not entries:
+            reply = redis_client.xreadgroup(JOBS_GROUP, self.name, {JOBS_STREAM: ">"},
+                                            count=1, block=self.block_ms)
+            entries = reply[0][1] if reply else []
+        for entry_id, fields in entries:
+            self.handle(entry_id, fields)
+        return len(entries)
+
+    def run(self):
+        self.ensure_group()
+        print(f"Worker {self.name} escuchando {JOBS_STREAM} (grupo {JOBS_GROUP})")
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except redis.ConnectionError as e:
+                print(f"Redis no disponible: {e}")
+                self._stop.wait(2)
+        print(f"Worker {self.name} detenido: {self.processed} ok, {self.failed} en dead-letter")
+
+    def stop(self, *_):
+        self._stop.set()
+
+
+def main():
+    worker = Worker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import random
+from typing import Dict, List
+
+# Piezas con las que se arman tarjetas como las que devuelven las tiendas:
+# acentos, eñes, mayúsculas mezcladas, pulgadas, espacios de más, líneas de
+# botones, vendedores y precios con formatos distintos.
+BRANDS = ["SAMSUNG", "LG", "Oster", "Mabe", "Whirlpool", "Black+Decker", "TRUPER", "Hamilton Beach",
+          "Sony", "Panasonic", "Frigidaire", "Imusa", "Nestlé", "Diana", "Coca-Cola", "Pedigree", "3M",
+          "Tefal", "Xiaomi", "Hisense", "Durex", "Colgate", "Lizano", "Pilsener", "Señorial"]
+PRODUCTS = ["Televisor", "Lavadora", "Refrigeradora", "Licuadora", "Microondas", "Cafetera", "Plancha",
+            "Arroz", "Frijoles Rojos", "Aceite Vegetal", "Azúcar Morena", "Café Molido", "Leche Entera",
+            "Taladro Percutor", "Juego de Sartenes", "Olla de Presión", "Ventilador de Pie", "Aire Acondicionado",
+            "Champú Anticaspa", "Pañales Etapa 3", "Cepillo Dental", "Silla Ergonómica", "Colchón Ortopédico"]
+DETAILS = ['55" 4K UHD Smart', "18 kg Carga Superior", "14 pies³ No Frost", "10 velocidades 1.25 L",
+           "1.1 pie³ 1000W", "12 tazas Programable", "Vapor Antiadherente", "Precocido 2 lb", "Bolsa 800 g",
+           "Botella 1 L", "1 kg", "Tostado Oscuro 454 g", "UHT 946 ml", '1/2" 750W', "3 piezas",
+           "6 L Acero Inoxidable", '16" 3 velocidades', "12000 BTU Inverter", "400 ml", "Paquete x 40",
+           "Cerdas Suaves x2", "Malla Transpirable", "Matrimonial Firmeza Media", "Edición Limitada ¡Nuevo!"]
+NOISE_LINES = ["Vendido por Simán", "Vendido por Walmart", "Agregar al carrito", "AGREGAR", "Añadir",
+               "Comprar", "Ver más", "Envío gratis", "Productos similares", "Válido hasta 31/12",
+               "¡Oferta!", "Exclusivo en línea", "  ", "4.5 ★ (123)"]
+QUERIES = ["televisor samsung", "lavadora", "refrigeradora lg", "arroz", "cafe molido", "café",
+           "licuadora oster", "aire acondicionado inverter", "pañales", "olla presion", "taladro truper",
+           "leche", "silla ergonómica", "aceite", "microondas 1000w", "xiaomi"]
+
+
+def _price(rng: random.Random) -> str:
+    value = rng.choice([rng.uniform(0.5, 15), rng.uniform(15, 250), rng.uniform(250, 3500)])
+    style = rng.randrange(6)
+    if style == 0:
+        return f"${value:,.2f}"
+    if style == 1:
+        return f"$ {value:,.2f}"
+    if style == 2:
+        return f"${int(value)}"
+    if style == 3:
+        return f"${value:.2f}"
+    if style == 4:
+        return f"$ {value:,.2f} c/u"
+    return f"${value:,.0f}.-"
+
+
+def _spacing(rng: random.Random, text: str) -> str:
+    """Ruido de espaciado y mayúsculas como el que deja inner_text()."""
+    roll = rng.random()
+    if roll < 0.15:
+        text = text.upper()
+    elif roll < 0.25:
+        text = text.lower()
+    if rng.random() < 0.3:
+        text = text.replace(" ", "  ", 1)
+    if rng.random() < 0.2:
+        text = f"  {text} "
+    return text
+
+
+def _name(rng: random.Random) -> str:
+    parts = [rng.choice(PRODUCTS), rng.choice(BRANDS), rng.choice(DETAILS)]
+    if rng.random() < 0.3:
+        parts.insert(0, parts.pop(1))
+    return _spacing(rng, " ".join(parts))
+
+
+def _card_text(rng: random.Random, name: str) -> str:
+    """Texto crudo de una tarjeta (líneas de nombre, precios y botones)."""
+    lines = [name]
+    if rng.random() < 0.4:
+        lines.insert(0, rng.choice(NOISE_LINES))
+    lines.append(_price(rng))
+    if rng.random() < 0.5:
+        lines.append(_price(rng))
+    lines.extend(rng.sample(NOISE_LINES, rng.randrange(3)))
+    rng.shuffle(lines[1:])
+    return "\n".join(lines)
+
+
+def _vidri_block(rng: random.Random) -> str:
+    """Bloque de título de Vidri: marca en mayúsculas, modelo, stock, Antes:, precio."""
+    lines = []
+    if rng.random() < 0.7:
+        lines.append(rng.choice([b.upper() for b in BRANDS]))
+    lines.append(_name(rng))
+    if rng.random() < 0.6:
+        lines.append(f"Modelo # {rng.choice('ABCDEFGHJK')}{rng.randrange(100, 99999)}-{rng.choice(['N', 'SV', 'X'])}")
+    if rng.random() < 0.5:
+        lines.append(f"Queda(n) {rng.randrange(1, 40)} en existencia")
+    if rng.random() < 0.5:
+        lines.append(f"Antes: {_price(rng)}")
+    lines.append(_price(rng))
+    lines.extend(rng.sample(NOISE_LINES, rng.randrange(3)))
+    if rng.random() < 0.2:
+        lines.append(str(rng.randrange(1, 9)))
+    return "\n".join(lines)
+
+
+def build(size: int = 2000, seed: int = 2024) -> List[Dict[str, str]]:
+    """
+    Corpus determinista: mismo `seed` y `size`, mismos casos. Cada caso
+    trae un nombre limpio, la tarjeta cruda, un bloque de Vidri, una consulta
+    y dos precios para comparar.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        name = _name(rng)
+        corpus.append({
+            "name": name,
+            "card": _card_text(rng, name),
+            "vidri": _vidri_block(rng),
+            "query": rng.choice(QUERIES) if rng.random() < 0.7 else " ".join(name.split()[:2]).lower(),
+            "price_a": _price(rng),
+            "price_b": rng.choice([_price(rng), "N/D", "", "$--"])
+        })
+    return corpus
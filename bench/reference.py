@@ -0,0 +1,158 @@
+import re
+from typing import Dict, Optional, Tuple
+
+# Oráculo: copia congelada de los helpers tal como estaban al crear los
+# baselines. Una optimización de app/stores debe devolver exactamente lo
+# mismo que esto sobre todo el corpus; si un cambio de comportamiento es
+# intencional, se actualiza aquí en el mismo commit.
+
+PRICE_RE = re.compile(r"\$\s?\d[\d,\.]*")
+
+
+def _prices(raw: str) -> Dict[str, str]:
+    matches = re.findall(r"\$\s?\d[\d,\.]*", raw)
+    return {
+        "original": matches[0] if matches else "",
+        "discount": matches[1] if len(matches) > 1 else ""
+    }
+
+
+def siman_clean_name(raw: str) -> str:
+    lines = raw.split("\n")
+    filtered = [line.strip() for line in lines if not re.search(r"Vendido por|Agregar al carrito|\$\d", line)]
+    return " ".join(filtered)
+
+
+def siman_is_relevant(name: str, query: str) -> bool:
+    query_words = query.lower().split()
+    name_lower = name.lower()
+    return all(word in name_lower for word in query_words)
+
+
+def curacao_clean_name(raw: str) -> str:
+    lines = raw.split("\n")
+    filtered = [l.strip() for l in lines if l.strip() and not re.search(r"Vendido por|Agregar|\$\d|Añadir", l)]
+    return " ".join(filtered)[:200]
+
+
+def curacao_is_relevant(name: str, query: str) -> bool:
+    query_words = query.lower().split()
+    name_lower = name.lower()
+    return any(word in name_lower for word in query_words)
+
+
+def prismamoda_clean_name(raw: str) -> str:
+    lines = raw.split("\n")
+    filtered = [l.strip() for l in lines
+                if l.strip() and not re.search(r"Agregar|\$\d|Comprar|Ver|Añadir", l, re.IGNORECASE)]
+    return " ".join(filtered)[:200]
+
+
+def prismamoda_is_relevant(name: str, query: str) -> bool:
+    query_words = query.lower().split()
+    name_lower = name.lower()
+    return any(word in name_lower or name_lower in word for word in query_words)
+
+
+def selectos_clean_name(raw: str) -> str:
+    lines = raw.split("\n")
+    filtered = [line.strip() for line in lines if not re.search(r"Agregar al carrito|\$\d", line)]
+    return " ".join(filtered)
+
+
+def selectos_is_relevant(name: str, query: str) -> bool:
+    query_words = query.lower().split()
+    name_lower = name.lower()
+    matches = sum(1 for word in query_words if word in name_lower)
+    return matches >= max(1, len(query_words) // 2)
+
+
+def walmart_is_relevant(name: str, query: str) -> bool:
+    query_words = query.lower().split()
+    name_lower = name.lower()
+    matches = sum(1 for word in query_words if word in name_lower)
+    return matches >= len(query_words) * 0.5
+
+
+def walmart_normalize_product_name(name: str) -> str:
+    normalized = name.lower()
+    normalized = re.sub(r'[^\w\s]', '', normalized)
+    normalized = re.sub(r'\s+', ' ', normalized)
+    return normalized.strip()
+
+
+def walmart_compare_prices(price1: str, price2: str) -> int:
+    try:
+        val1 = float(price1.replace('$', '').replace(',', ''))
+        val2 = float(price2.replace('$', '').replace(',', ''))
+        if val1 < val2:
+            return -1
+        elif val1 > val2:
+            return 1
+        else:
+            return 0
+    except:
+        return 0
+
+
+VIDRI_OLD_PRICE_RE = re.compile(r"Antes:\s*(\$\s?\d[\d\.,]*)", re.IGNORECASE)
+VIDRI_STOCK_RE = re.compile(r"Queda\(n\)\s+(\d+)", re.IGNORECASE)
+VIDRI_EXCLUDE_PREFIXES = ("Productos similares", "Válido hasta", "Antes:", "AGREGAR", "Modelo #", "Queda")
+
+
+def vidri_refine_title_block(raw: str) -> Dict[str, Optional[str]]:
+    lines = [(l or "").strip() for l in raw.splitlines() if (l or "").strip()]
+    model = None
+    brand = None
+    title = None
+    stock = None
+    for l in lines:
+        if l.lower().startswith("modelo #"):
+            model = l.split("#", 1)[-1].strip()
+    for l in lines:
+        m = VIDRI_STOCK_RE.search(l)
+        if m:
+            stock = m.group(1)
+    for l in lines:
+        if l.isupper() and len(l.split()) <= 3 and l not in ("AGREGAR",) and not l.startswith("MODELO"):
+            brand = l
+    filtered = []
+    for l in lines:
+        if any(l.startswith(pref) for pref in VIDRI_EXCLUDE_PREFIXES):
+            continue
+        if l.isdigit():
+            continue
+        if PRICE_RE.search(l):
+            continue
+        if VIDRI_OLD_PRICE_RE.search(l):
+            continue
+        if l == brand or (model and model in l):
+            continue
+        filtered.append(l)
+    if filtered:
+        title = filtered[-1] if len(filtered) > 1 else filtered[0]
+    return {"title": title, "model": model, "brand": brand, "stock": stock}
+
+
+def vidri_extract_prices(raw: str) -> Tuple[Optional[str], Optional[str]]:
+    prices = PRICE_RE.findall(raw)
+    old = None
+    m_old = VIDRI_OLD_PRICE_RE.search(raw)
+    if m_old:
+        old = m_old.group(1)
+    current = None
+    if prices:
+        if old:
+            for p in prices:
+                if p != old:
+                    current = p
+                    break
+            if not current:
+                current = prices[0]
+        else:
+            current = prices[0]
+    return current, old
+
+
+# extract_prices es idéntico en las cuatro tiendas que lo tienen
+siman_extract_prices = curacao_extract_prices = prismamoda_extract_prices = selectos_extract_prices = _prices
@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from bench import corpus as corpus_mod
+from bench import reference
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_TOLERANCE = 0.20
+# Cada pasada cronometrada dura al menos esto; más corto y manda el ruido
+MIN_PASS_S = 0.05
+
+# (nombre, tienda, método, campos del corpus que recibe, referencia)
+CASES: List[Tuple[str, str, str, Tuple[str, ...], Callable]] = [
+    ("siman.clean_name", "siman", "clean_name", ("card",), reference.siman_clean_name),
+    ("siman.extract_prices", "siman", "extract_prices", ("card",), reference.siman_extract_prices),
+    ("siman.is_relevant", "siman", "is_relevant", ("name", "query"), reference.siman_is_relevant),
+    ("curacao.clean_name", "curacao", "clean_name", ("card",), reference.curacao_clean_name),
+    ("curacao.extract_prices", "curacao", "extract_prices", ("card",), reference.curacao_extract_prices),
+    ("curacao.is_relevant", "curacao", "is_relevant", ("name", "query"), reference.curacao_is_relevant),
+    ("prismamoda.clean_name", "prismamoda", "clean_name", ("card",), reference.prismamoda_clean_name),
+    ("prismamoda.extract_prices", "prismamoda", "extract_prices", ("card",), reference.prismamoda_extract_prices),
+    ("prismamoda.is_relevant", "prismamoda", "is_relevant", ("name", "query"), reference.prismamoda_is_relevant),
+    ("selectos.clean_name", "selectos", "clean_name", ("card",), reference.selectos_clean_name),
+    ("selectos.extract_prices", "selectos", "extract_prices", ("card",), reference.selectos_extract_prices),
+    ("selectos.is_relevant", "selectos", "is_relevant", ("name", "query"), reference.selectos_is_relevant),
+    ("vidri._refine_title_block", "vidri", "_refine_title_block", ("vidri",), reference.vidri_refine_title_block),
+    ("vidri._extract_prices", "vidri", "_extract_prices", ("vidri",), reference.vidri_extract_prices),
+    ("walmart.is_relevant", "walmart", "is_relevant", ("name", "query"), reference.walmart_is_relevant),
+    ("walmart._normalize_product_name", "walmart", "_normalize_product_name", ("name",),
+     reference.walmart_normalize_product_name),
+    ("walmart._compare_prices", "walmart", "_compare_prices", ("price_a", "price_b"),
+     reference.walmart_compare_prices),
+]
+
+
+def _calibrate() -> float:
+    """
+    Segundos de una carga fija de Python puro (strings y regex, como los
+    helpers). Los baselines se guardan relativos a esto para que sirvan
+    en otra máquina.
+    """
+    pattern = re.compile(r"\$\s?\d[\d,\.]*")
+    text = "Licuadora Oster 10 velocidades\nAntes: $49.99\n$39.99\nAgregar al carrito"
+    start = time.perf_counter()
+    for _ in range(5000):
+        lines = [line.strip().lower() for line in text.split("\n") if line]
+        pattern.findall(text)
+        " ".join(lines)
+    return time.perf_counter() - start
+
+
+def _args(cases: List[Dict[str, str]], fields: Tuple[str, ...]) -> List[Tuple[str, ...]]:
+    return [tuple(case[field] for field in fields) for case in cases]
+
+
+def check(fn: Callable, ref: Callable, args: List[Tuple[str, ...]], show: int = 3) -> List[str]:
+    """Diferencias contra el oráculo (vacía si todo coincide)."""
+    errors = []
+    for item in args:
+        got, expected = fn(*item), ref(*item)
+        if got != expected:
+            errors.append(f"  {item!r}\n    esperado {expected!r}\n    obtenido {got!r}")
+            if len(errors) >= show:
+                break
+    return errors
+
+
+def _run(fn: Callable, args: List[Tuple[str, ...]], loops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(loops):
+        for item in args:
+            fn(*item)
+    return time.perf_counter() - start
+
+
+def measure(fn: Callable, args: List[Tuple[str, ...]], repeat: int) -> Tuple[float, float]:
+    """
+    (µs por ítem, costo relativo) de `fn` sobre el corpus. Cada pasada dura
+    al menos MIN_PASS_S y va pegada a una calibración; se toma la mediana
+    de `repeat` pares, así una ráfaga de carga de la máquina no mueve el
+    resultado. El costo relativo es el tiempo por ítem en milésimas de la
+    carga de calibración.
+    """
+    loops = max(1, int(MIN_PASS_S / max(_run(fn, args, 1), 1e-6)) + 1)
+    items = loops * len(args)
+    samples = []
+    for _ in range(repeat):
+        unit = _calibrate()
+        elapsed = _run(fn, args, loops)
+        unit = (unit + _calibrate()) / 2
+        samples.append((elapsed / items, elapsed / items / unit * 1000))
+    per_item = statistics.median(s[0] for s in samples)
+    relative = statistics.median(s[1] for s in samples)
+    return per_item * 1e6, relative
+
+
+def load_baselines(path: str = BASELINES_PATH) -> Dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m bench",
+        description="Micro-benchmarks de los helpers de parseo de los scrapers"
+    )
+    parser.add_argument("--only", default=None, help="Casos a correr (prefijos separados por coma, p. ej. 'vidri,walmart')")
+    parser.add_argument("--size", type=int, default=2000, help="Casos del corpus")
+    parser.add_argument("--seed", type=int, default=2024, help="Semilla del corpus")
+    parser.add_argument("--repeat", type=int, default=7, help="Pasadas por caso; se toma la mediana")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Regresión permitida sobre el baseline (0.2 = 20%% más lento)")
+    parser.add_argument("--baselines", default=BASELINES_PATH, help="Archivo de baselines")
+    parser.add_argument("--update", action="store_true", help="Guardar los resultados como nuevos baselines")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    from app.stores import SCRAPERS
+
+    prefixes = [p.strip() for p in (args.only or "").split(",") if p.strip()]
+    cases = [case for case in CASES if not prefixes or any(case[0].startswith(p) for p in prefixes)]
+    if not cases:
+        sys.exit(f"Ningún caso coincide con --only {args.only}")
+
+    data = corpus_mod.build(args.size, args.seed)
+    scrapers = {store: SCRAPERS[store]() for store in {case[1] for case in cases}}
+
+    # Primero correctitud: un helper más rápido que devuelve otra cosa no cuenta
+    failed = False
+    for name, store, method, fields, ref in cases:
+        errors = check(getattr(scrapers[store], method), ref, _args(data, fields))
+        if errors:
+            failed = True
+            print(f"✗ {name} difiere del oráculo:\n" + "\n".join(errors))
+    if failed:
+        return 1
+
+    baselines = load_baselines(args.baselines)
+    stored = baselines.get("cases", {})
+    results: Dict[str, float] = {}
+    regressions = []
+
+    print(f"{'caso':34} {'µs/ítem':>9} {'relativo':>9} {'baseline':>9} {'cambio':>8}")
+    for name, store, method, fields, _ in cases:
+        micros, relative = measure(getattr(scrapers[store], method), _args(data, fields), args.repeat)
+        results[name] = round(relative, 4)
+        base = stored.get(name)
+        change = ""
+        if base:
+            delta = relative / base - 1
+            change = f"{delta:+.0%}"
+            if delta > args.tolerance:
+                regressions.append((name, delta))
+                change += " ✗"
+        print(f"{name:34} {micros:9.2f} {relative:9.3f} {base if base else '-':>9} {change:>8}")
+
+    if args.update:
+        merged = {**stored, **results}
+        with open(args.baselines, "w") as f:
+            json.dump({"corpus": {"size": args.size, "seed": args.seed}, "cases": merged}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines guardados en {args.baselines}")
+        return 0
+
+    if stored and baselines.get("corpus") != {"size": args.size, "seed": args.seed}:
+        print("Aviso: el corpus no es el de los baselines; la comparación es orientativa")
+    if regressions:
+        print(f"\n{len(regressions)} regresión(es) por encima de {args.tolerance:.0%}:")
+        for name, delta in regressions:
+            print(f"  {name}: {delta:+.0%}")
+        return 1
+    return 0
@@ -0,0 +1,196 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Imagen GIF 1x1 para que las páginas no generen 404 al cargar imágenes
+PIXEL = bytes.fromhex("47494638396101000100800000ffffff00000021f90401000000002c00000000010001000002024401003b")
+
+
+def _card_siman(i: int, name: str) -> str:
+    return f"""
+    <li class="ais-Hits-item">
+      <span class="searchProductsItemName">{name}</span>
+      <a href="/siman/{i}-producto/p"><img src="/img/{i}.gif"></a>
+      <span class="searchProductsItemPrice">$ {199 + i}.99 $ {149 + i}.99</span>
+    </li>"""
+
+
+def _card_vtex(store: str, i: int, name: str) -> str:
+    # Estructura mínima común a Curacao, Walmart y PrismaModa (VTEX IO)
+    return f"""
+    <div class="vtex-search-result-3-x-galleryItem">
+      <section>
+        <a class="vtex-product-summary-2-x-clearLink" href="/{store}/{i}-producto/p" aria-label="{name}">
+          <img src="/img/{i}.gif" alt="{name}">
+          <div class="vtex-product-summary-2-x-nameContainer"><h3>{name}</h3></div>
+        </a>
+        <div><span class="vtex-product-price-1-x-sellingPrice">$ {299 + i}.00</span> <span>$ {249 + i}.00</span></div>
+        <button>Agregar</button>
+      </section>
+    </div>"""
+
+
+def _card_selectos(i: int, name: str) -> str:
+    return f"""
+    <li class="item-producto">
+      <a href="/selectos/producto/{i}"><img src="/img/{i}.gif"></a>
+      <h5 class="prod-nombre"><a href="/selectos/producto/{i}">{name}</a></h5>
+      <span class="precio-price">$ {2 + i}.45</span>
+    </li>"""
+
+
+def render_search(store: str, query: str, products: int) -> str:
+    name = lambda i: f"{query.title()} Modelo {i} Marca Prueba"
+    if query.startswith("nada"):
+        # Consultas "nada..." simulan la página de "sin resultados"
+        body = f'<div class="vtex-search-result-3-x-searchNotFound"><p>No se encontraron productos para "{query}"</p></div>'
+    elif store == "siman":
+        cards = "".join(_card_siman(i, name(i)) for i in range(products))
+        body = f'<ol class="ais-Hits-list">{cards}</ol>'
+    elif store == "selectos":
+        cards = "".join(_card_selectos(i, name(i)) for i in range(products))
+        body = f"<ul>{cards}</ul>"
+    else:
+        cards = "".join(_card_vtex(store, i, name(i)) for i in range(products))
+        body = f'<div class="vtex-search-result-3-x-gallery">{cards}</div>'
+    return f"<!doctype html><html><head><meta charset='utf-8'><title>{store}</title></head><body>{body}</body></html>"
+
+
+def render_vtex_api(query: str, products: int) -> list:
+    return [
+        {
+            "productName": f"{query.title()} Modelo {i} Marca Prueba",
+            "linkText": f"{i}-producto",
+            "productReference": f"MOD-{i}",
+            "allSpecifications": ["Color"],
+            "Color": ["Negro"],
+            "items": [{
+                "itemId": str(1000 + i),
+                "sellers": [{
+                    "sellerName": "Tienda Prueba",
+                    "sellerDefault": True,
+                    "commertialOffer": {"Price": 99.0 + i, "ListPrice": 129.0 + i, "AvailableQuantity": 10 + i}
+                }]
+            }]
+        }
+        for i in range(products)
+    ]
+
+
+def _query_from(store: str, rest: str, params: Dict[str, list]) -> str:
+    if store == "siman":
+        return params.get("_q", [""])[0]
+    if store == "selectos":
+        return params.get("keyword", [""])[0]
+    if store == "vidri":
+        return params.get("ft", [""])[0]
+    return unquote(rest.strip("/").split("/")[-1]) if rest.strip("/") else ""
+
+
+class FakeStoreServer:
+    """
+    Servidor HTTP local que imita las páginas de búsqueda de las tiendas.
+
+    Cada tienda vive bajo un prefijo (/siman, /curacao, /walmart,
+    /prismamoda, /selectos, /vidri) y sus páginas usan los mismos
+    selectores que los scrapers de app/stores. La latencia de cada
+    respuesta es `delay_ms` +/- `jitter_ms`.
+    """
+
+    STORES = ("siman", "curacao", "walmart", "prismamoda", "selectos", "vidri")
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 delay_ms: int = 200, jitter_ms: int = 50, products: int = 24):
+        self.delay_ms = delay_ms
+        self.jitter_ms = jitter_ms
+        self.products = products
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def store_base(self, store: str) -> str:
+        return f"{self.base_url}/{store}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                parts = urlsplit(self.path)
+                if parts.path.startswith("/img/"):
+                    self._send(200, PIXEL, "image/gif")
+                    return
+
+                segments = parts.path.lstrip("/").split("/", 1)
+                store = segments[0]
+                rest = segments[1] if len(segments) > 1 else ""
+                if store == "api":
+                    # VidriScraper arma la URL de la API con urljoin desde la raíz
+                    store, rest = "vidri", parts.path.lstrip("/")
+                if store not in server.STORES:
+                    self._send(404, b"not found", "text/plain")
+                    return
+
+                delay = server.delay_ms + random.uniform(-server.jitter_ms, server.jitter_ms)
+                time.sleep(max(0.0, delay) / 1000)
+
+                params = parse_qs(parts.query)
+                query = _query_from(store, rest, params)
+                if rest.startswith("api/catalog_system/"):
+                    body = json.dumps(render_vtex_api(query, server.products)).encode("utf-8")
+                    self._send(200, body, "application/json")
+                    return
+                html = render_search(store, query or "producto", server.products)
+                self._send(200, html.encode("utf-8"), "text/html; charset=utf-8")
+
+        return Handler
+
+    def start(self) -> "FakeStoreServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def point_scrapers_at(server: FakeStoreServer):
+    """Redirige las URLs base de los scrapers al servidor falso."""
+    from app.stores.siman_scraper import SimanScraper
+    from app.stores.curacao_scraper import CuracaoScraper
+    from app.stores.walmart_scraper import WalmartScraper
+    from app.stores.prismamoda_scraper import PrismaModaScraper
+    from app.stores.superselectos_scraper import SelectosScraper
+    from app.stores.vidri_scraper import VidriScraper
+
+    SimanScraper.BASE = server.store_base("siman")
+    CuracaoScraper.BASE = server.store_base("curacao")
+    WalmartScraper.BASE = server.store_base("walmart")
+    PrismaModaScraper.BASE = server.store_base("prismamoda")
+    SelectosScraper.BASE = server.store_base("selectos")
+    SelectosScraper.SEARCH_URL = SelectosScraper.BASE + "/products?keyword="
+    VidriScraper.BASE = server.store_base("vidri")
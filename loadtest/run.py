@@ -0,0 +1,314 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import socket
+import statistics
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _prepare_env(redis_url: Optional[str]):
+    """Variables que app.auth lee al importarse; se respetan las existentes."""
+    os.environ.setdefault("JWT_SECRET", secrets.token_hex(32))
+    if redis_url:
+        parts = httpx.URL(redis_url)
+        os.environ["REDIS_HOST"] = parts.host or "127.0.0.1"
+        os.environ["REDIS_PORT"] = str(parts.port or 6379)
+    else:
+        os.environ.setdefault("REDIS_HOST", "127.0.0.1")
+        os.environ.setdefault("REDIS_PORT", "6379")
+
+
+def _install_fake_redis():
+    try:
+        import fakeredis
+    except ImportError:
+        sys.exit("Sin --redis se necesita 'fakeredis' (pip install -r loadtest/requirements.txt)")
+    import app.auth
+    app.auth.redis_client = fakeredis.FakeRedis(decode_responses=True)
+
+
+def mint_token(subject: str, ttl: int = 3600) -> str:
+    """Token HS384 válido para app.auth.verify_token."""
+    from jose import jwt
+    from app.auth import JWT_SECRET, decode_secret
+    now = int(time.time())
+    return jwt.encode({"sub": subject, "iat": now, "exp": now + ttl}, decode_secret(JWT_SECRET), algorithm="HS384")
+
+
+class ChromiumMemorySampler:
+    """Suma el RSS de los procesos de Chromium del host (Linux, vía /proc)."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.peak_bytes = 0
+        self.peak_processes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def sample():
+        total, count = 0, 0
+        if not os.path.isdir("/proc"):
+            return 0, 0
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(f"/proc/{pid}/cmdline", "rb") as f:
+                    cmd = f.read().lower()
+                if b"chrom" not in cmd and b"headless_shell" not in cmd:
+                    continue
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1]) * 1024
+                            count += 1
+                            break
+            except (OSError, ValueError):
+                continue
+        return total, count
+
+    def _run(self):
+        while not self._stop.is_set():
+            total, count = self.sample()
+            self.peak_bytes = max(self.peak_bytes, total)
+            self.peak_processes = max(self.peak_processes, count)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return round(ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo), 1)
+
+
+class LoadRun:
+    def __init__(self, base_url: str, stores: List[str], queries: List[str],
+                 users: int, request_timeout: float):
+        self.base_url = base_url
+        self.stores = stores
+        self.queries = queries
+        self.tokens = [mint_token(f"loadtest-{i}") for i in range(users)]
+        self.request_timeout = request_timeout
+        self.samples: List[Dict] = []
+
+    async def _one(self, client: httpx.AsyncClient):
+        store = random.choice(self.stores)
+        query = random.choice(self.queries)
+        token = random.choice(self.tokens)
+        start = time.perf_counter()
+        status, error = None, None
+        try:
+            resp = await client.get(f"/scrape/{store}", params={"query": query},
+                                    headers={"Authorization": f"Bearer {token}"})
+            status = resp.status_code
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        self.samples.append({
+            "store": store,
+            "status": status,
+            "error": error,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "finished": time.time()
+        })
+
+    async def closed_loop(self, concurrency: int, duration: float):
+        """N clientes que envían un request apenas termina el anterior."""
+        deadline = time.monotonic() + duration
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.request_timeout) as client:
+            async def worker():
+                while time.monotonic() < deadline:
+                    await self._one(client)
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def open_loop(self, rates: List[float], duration: float):
+        """Llegadas Poisson; con varias tasas se recorren en escalones iguales."""
+        step = duration / len(rates)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.request_timeout, limits=limits) as client:
+            tasks = []
+            for rate in rates:
+                step_end = time.monotonic() + step
+                while time.monotonic() < step_end:
+                    tasks.append(asyncio.create_task(self._one(client)))
+                    await asyncio.sleep(random.expovariate(rate))
+            await asyncio.gather(*tasks)
+
+    def report(self, elapsed: float, profile: Dict, memory: ChromiumMemorySampler) -> Dict:
+        ok = [s for s in self.samples if s["status"] == 200]
+        latencies = [s["latency_ms"] for s in ok]
+        statuses: Dict[str, int] = {}
+        for s in self.samples:
+            key = str(s["status"]) if s["status"] is not None else s["error"]
+            statuses[key] = statuses.get(key, 0) + 1
+
+        per_store = {}
+        for store in self.stores:
+            store_ok = [s["latency_ms"] for s in ok if s["store"] == store]
+            total = sum(1 for s in self.samples if s["store"] == store)
+            per_store[store] = {
+                "requests": total,
+                "errors": total - len(store_ok),
+                "p50_ms": _percentile(store_ok, 50),
+                "p95_ms": _percentile(store_ok, 95)
+            }
+
+        total = len(self.samples)
+        return {
+            "profile": profile,
+            "elapsed_s": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+            "error_rate": round((total - len(ok)) / total, 4) if total else 0.0,
+            "statuses": statuses,
+            "latency_ms": {
+                "mean": round(statistics.mean(latencies), 1) if latencies else None,
+                "p50": _percentile(latencies, 50),
+                "p90": _percentile(latencies, 90),
+                "p95": _percentile(latencies, 95),
+                "p99": _percentile(latencies, 99),
+                "max": round(max(latencies), 1) if latencies else None
+            },
+            "per_store": per_store,
+            "chromium_peak_rss_mb": round(memory.peak_bytes / 1024 / 1024, 1),
+            "chromium_peak_processes": memory.peak_processes
+        }
+
+
+def compare(current: Dict, baseline: Dict) -> str:
+    """Tabla de diferencias entre dos reportes (antes/después de un cambio)."""
+    rows = [
+        ("throughput_rps", current["throughput_rps"], baseline["throughput_rps"]),
+        ("error_rate", current["error_rate"], baseline["error_rate"]),
+        ("chromium_peak_rss_mb", current["chromium_peak_rss_mb"], baseline["chromium_peak_rss_mb"]),
+    ]
+    for pct in ("p50", "p95", "p99"):
+        rows.append((f"latency_{pct}_ms", current["latency_ms"][pct], baseline["latency_ms"][pct]))
+
+    lines = [f"{'métrica':<24}{'antes':>12}{'después':>12}{'cambio':>10}"]
+    for name, now, before in rows:
+        if now is None or before is None:
+            change = "n/a"
+        elif before == 0:
+            change = "n/a" if now == 0 else "+inf"
+        else:
+            change = f"{(now - before) / before * 100:+.1f}%"
+        lines.append(f"{name:<24}{str(before):>12}{str(now):>12}{change:>10}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m loadtest",
+        description="Prueba de carga de /scrape/* contra tiendas simuladas"
+    )
+    parser.add_argument("--stores", default="siman,curacao,prismamoda,selectos,vidri,walmart",
+                        help="Rutas /scrape/<tienda> a ejercitar, separadas por coma")
+    parser.add_argument("--queries", default="televisor samsung,lavadora,refrigeradora lg,arroz",
+                        help="Consultas separadas por coma")
+    parser.add_argument("--concurrency", type=int, default=4, help="Clientes simultáneos (lazo cerrado)")
+    parser.add_argument("--rate", default=None,
+                        help="Tasa de llegada en req/s (lazo abierto); '0.5,1,2' recorre escalones")
+    parser.add_argument("--duration", type=float, default=60, help="Duración de la medición en segundos")
+    parser.add_argument("--users", type=int, default=8, help="Cantidad de tokens (sub) distintos")
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--delay-ms", type=int, default=200, help="Latencia de las tiendas simuladas")
+    parser.add_argument("--jitter-ms", type=int, default=50)
+    parser.add_argument("--products", type=int, default=24, help="Productos por página simulada")
+    parser.add_argument("--redis", default=None,
+                        help="redis://host:port local; si se omite se usa fakeredis en proceso")
+    parser.add_argument("--target", default=None,
+                        help="URL de un servicio ya levantado (no se levanta app ni tiendas simuladas)")
+    parser.add_argument("--output", default=None, help="Ruta del reporte JSON")
+    parser.add_argument("--compare", default=None, help="Reporte JSON previo para comparar")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    _prepare_env(args.redis)
+
+    fake = None
+    server = None
+    base_url = args.target
+    if not base_url:
+        import uvicorn
+        from loadtest.fake_stores import FakeStoreServer, point_scrapers_at
+
+        if not args.redis:
+            _install_fake_redis()
+        fake = FakeStoreServer(delay_ms=args.delay_ms, jitter_ms=args.jitter_ms, products=args.products).start()
+        point_scrapers_at(fake)
+
+        from app.main import app
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+        base_url = f"http://127.0.0.1:{port}"
+        print(f"API en {base_url}, tiendas simuladas en {fake.base_url}")
+
+    stores = [s.strip() for s in args.stores.split(",") if s.strip()]
+    queries = [q.strip() for q in args.queries.split(",") if q.strip()]
+    run = LoadRun(base_url, stores, queries, args.users, args.request_timeout)
+
+    if args.rate:
+        rates = [float(r) for r in args.rate.split(",")]
+        profile = {"mode": "open", "rates": rates, "duration": args.duration}
+        scenario = run.open_loop(rates, args.duration)
+    else:
+        profile = {"mode": "closed", "concurrency": args.concurrency, "duration": args.duration}
+        scenario = run.closed_loop(args.concurrency, args.duration)
+    profile.update({"stores": stores, "delay_ms": args.delay_ms, "products": args.products,
+                    "target": args.target or "in-process"})
+
+    memory = ChromiumMemorySampler()
+    memory.start()
+    start = time.perf_counter()
+    try:
+        asyncio.run(scenario)
+    finally:
+        elapsed = time.perf_counter() - start
+        memory.stop()
+        if server:
+            server.should_exit = True
+        if fake:
+            fake.stop()
+
+    report = run.report(elapsed, profile, memory)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print(compare(report, json.load(f)))
+
+
+if __name__ == "__main__":
+    main()
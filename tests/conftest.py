@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+# app.auth exige JWT_SECRET y REDIS_* al importarse, y /image su propia
+# IMAGE_SIGNING_KEY; los datos van a un directorio temporal por corrida
+os.environ.setdefault("JWT_SECRET", "tests-secret")
+os.environ.setdefault("IMAGE_SIGNING_KEY", "tests-image-key")
+os.environ.setdefault("REDIS_HOST", "127.0.0.1")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="kerroscraper-tests-"))
+
+import fakeredis
+import pytest
+
+import app.auth
+
+# Los módulos importan redis_client por nombre: se reemplaza antes de que
+# cualquier test los importe (igual que loadtest/)
+app.auth.redis_client = fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture(autouse=True)
+def redis():
+    app.auth.redis_client.flushall()
+    yield app.auth.redis_client
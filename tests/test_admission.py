@@ -0,0 +1,116 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app import admission
+from app.admission import USER_QUOTA_BURST, USER_QUOTA_RATE, WeightedLimiter, check_quota
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj de pared controlado para el token bucket (el script recibe `now` como argumento)."""
+    now = SimpleNamespace(value=1_700_000_000.0)
+    monkeypatch.setattr(admission, "time", SimpleNamespace(time=lambda: now.value, monotonic=time.monotonic))
+    return now
+
+
+def _rejected(username, cost):
+    with pytest.raises(HTTPException) as err:
+        check_quota(username, cost)
+    return err.value
+
+
+def test_burst_then_429_with_retry_after(clock):
+    for _ in range(int(USER_QUOTA_BURST)):
+        check_quota("ana", 1)
+
+    err = _rejected("ana", 1)
+
+    assert err.status_code == 429
+    # Falta un token entero: 1 / USER_QUOTA_RATE segundos
+    assert err.headers["Retry-After"] == str(int(1 / USER_QUOTA_RATE))
+
+
+def test_tokens_refill_with_time(clock):
+    check_quota("ana", USER_QUOTA_BURST)
+    _rejected("ana", 2)
+
+    clock.value += 2 / USER_QUOTA_RATE
+    check_quota("ana", 2)
+    _rejected("ana", 1)
+
+
+def test_refill_is_capped_at_burst(clock):
+    check_quota("ana", 1)
+    clock.value += 10 * USER_QUOTA_BURST / USER_QUOTA_RATE
+
+    check_quota("ana", USER_QUOTA_BURST)
+    assert _rejected("ana", 1).status_code == 429
+
+
+def test_buckets_are_per_user_and_cost_is_capped_at_burst(clock):
+    # Un costo mayor que la ráfaga se cobra como la ráfaga entera
+    check_quota("ana", USER_QUOTA_BURST * 3)
+    _rejected("ana", 1)
+    check_quota("beto", 1)
+
+
+def test_limiter_rejects_with_503_when_queue_is_full():
+    limiter = WeightedLimiter(capacity=2, max_queue=1, max_wait=5)
+    limiter.acquire(2)
+    waiter = threading.Thread(target=limiter.acquire, args=(1,))
+    waiter.start()
+    while limiter.stats()["queue_depth"] < 1:
+        time.sleep(0.01)
+
+    with pytest.raises(HTTPException) as err:
+        limiter.acquire(1)
+
+    assert err.value.status_code == 503
+    assert int(err.value.headers["Retry-After"]) >= 1
+    assert limiter.stats()["rejected_queue_full"] == 1
+    limiter.release(2, 0.1)
+    waiter.join(timeout=1)
+    assert limiter.stats()["admitted"] == 2
+
+
+def test_limiter_times_out_queued_request_with_503():
+    limiter = WeightedLimiter(capacity=4, max_queue=4, max_wait=0.1)
+    limiter.acquire(4)
+
+    with pytest.raises(HTTPException) as err:
+        limiter.acquire(1)
+
+    assert err.value.status_code == 503
+    assert limiter.stats()["rejected_timeout"] == 1
+    assert limiter.stats()["queue_depth"] == 0
+
+
+def test_limiter_admits_by_weight_in_fifo_order():
+    limiter = WeightedLimiter(capacity=4, max_queue=4, max_wait=5)
+    limiter.acquire(3)
+    order = []
+
+    def enter(name, weight):
+        limiter.acquire(weight)
+        order.append(name)
+
+    heavy = threading.Thread(target=enter, args=("walmart", 4))
+    heavy.start()
+    while limiter.stats()["queue_depth"] < 1:
+        time.sleep(0.01)
+    light = threading.Thread(target=enter, args=("siman", 1))
+    light.start()
+    time.sleep(0.05)
+    # Cabría el liviano, pero no se adelanta al pesado que espera primero
+    assert order == []
+
+    limiter.release(3, 0.1)
+    heavy.join(timeout=1)
+    assert order == ["walmart"]
+    limiter.release(4, 0.1)
+    light.join(timeout=1)
+    assert order == ["walmart", "siman"]
@@ -0,0 +1,116 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import browser_pool
+from app.browser_pool import BrowserUnavailable, EndpointPool
+from app.stores.siman_scraper import SimanScraper
+from loadtest.run import mint_token
+
+
+class FakeBrowser:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def disconnect(self):
+        self.handlers["disconnected"](self)
+
+
+class FakeChromium:
+    """chromium de Playwright: los endpoints en `down` rechazan la conexión."""
+
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.calls = []
+
+    def _open(self, method, endpoint):
+        self.calls.append((method, endpoint))
+        if endpoint in self.down:
+            raise ConnectionError("connection refused")
+        return FakeBrowser(endpoint)
+
+    def connect(self, endpoint, timeout=None):
+        return self._open("connect", endpoint)
+
+    def connect_over_cdp(self, endpoint, timeout=None):
+        return self._open("cdp", endpoint)
+
+    def launch(self, headless=True, args=None):
+        return FakeBrowser("local")
+
+
+class FakePlaywright:
+    def __init__(self, down=()):
+        self.chromium = FakeChromium(down)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    fresh = EndpointPool(["ws://a:3000/", "ws://b:3000/", "cdp+http://c:9222"])
+    monkeypatch.setattr(browser_pool, "pool", fresh)
+    return fresh
+
+
+def test_candidates_prefer_least_busy_and_push_down_endpoints_last(pool, monkeypatch):
+    pool.acquire("ws://a:3000/")
+    assert pool.candidates()[-1] == "ws://a:3000/"
+
+    pool.mark_down("ws://b:3000/")
+    assert pool.candidates() == ["cdp+http://c:9222", "ws://a:3000/", "ws://b:3000/"]
+    assert pool.snapshot()["ws://b:3000/"] == {"active": 0, "up": False, "failures": 1}
+
+    # Pasado BROWSER_RETRY_AFTER vuelve a la rotación
+    monkeypatch.setattr(browser_pool, "BROWSER_RETRY_AFTER", 0)
+    pool.mark_down("ws://b:3000/")
+    assert pool.snapshot()["ws://b:3000/"]["up"]
+
+
+def test_launch_fails_over_to_next_endpoint(pool):
+    p = FakePlaywright(down={"ws://a:3000/"})
+
+    browser = browser_pool.launch(p)
+
+    assert browser.endpoint == "ws://b:3000/"
+    assert p.chromium.calls == [("connect", "ws://a:3000/"), ("connect", "ws://b:3000/")]
+    state = pool.snapshot()
+    assert not state["ws://a:3000/"]["up"] and state["ws://a:3000/"]["failures"] == 1
+    assert state["ws://b:3000/"]["active"] == 1
+
+    # La siguiente sesión ya no intenta el caído primero, y la desconexión libera
+    second = browser_pool.launch(p)
+    assert second.endpoint == "http://c:9222" and p.chromium.calls[-1] == ("cdp", "http://c:9222")
+    browser.disconnect()
+    assert pool.snapshot()["ws://b:3000/"]["active"] == 0
+
+
+def test_launch_raises_when_every_endpoint_is_down(pool):
+    p = FakePlaywright(down=set(pool.endpoints) | {"http://c:9222"})
+    with pytest.raises(BrowserUnavailable) as err:
+        browser_pool.launch(p)
+    assert "ws://a:3000/" in str(err.value) and "cdp+http://c:9222" in str(err.value)
+    assert all(not entry["up"] for entry in pool.snapshot().values())
+
+
+def test_local_fallback(pool, monkeypatch):
+    monkeypatch.setattr(browser_pool, "BROWSER_LOCAL_FALLBACK", True)
+    p = FakePlaywright(down=set(pool.endpoints) | {"http://c:9222"})
+    assert browser_pool.launch(p).endpoint == "local"
+
+
+def test_scrape_answers_503_without_browser_servers(pool, monkeypatch):
+    def scrape(self, query, deadline=None):
+        self.last_mode = "browser"
+        browser_pool.launch(FakePlaywright(down=set(pool.endpoints) | {"http://c:9222"}))
+
+    monkeypatch.setattr(SimanScraper, "scrape", scrape)
+    from app.main import app
+    client = TestClient(app, headers={"Authorization": f"Bearer {mint_token('sin-navegador')}"})
+
+    resp = client.get("/scrape/siman", params={"query": "licuadora"})
+
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == str(int(browser_pool.BROWSER_RETRY_AFTER))
+    assert "Sin servidores de navegador" in resp.json()["detail"]
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.auth
+from app import admission, catalog, main
+from app.product import Product
+from loadtest.run import mint_token
+
+
+def _wait_until(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "condición no alcanzada"
+        time.sleep(0.02)
+
+
+def test_refresh_queue_dedupes_and_drops_when_full():
+    queue = catalog.RefreshQueue(workers=1, max_pending=2)
+    release = threading.Event()
+    ran = []
+
+    def job(name):
+        release.wait(5)
+        ran.append(name)
+
+    assert queue.submit(("siman", "tele"), job, "a")
+    assert not queue.submit(("siman", "tele"), job, "a-bis")
+    assert queue.submit(("curacao", "tele"), job, "b")
+    assert queue.full()
+    assert not queue.submit(("vidri", "tele"), job, "c")
+
+    release.set()
+    _wait_until(lambda: queue.snapshot()["pending"] == 0)
+    assert sorted(ran) == ["a", "b"]
+    assert queue.snapshot() == {"pending": 0, "max_pending": 2, "submitted": 2, "deduped": 1, "dropped": 1}
+    # Terminado, la misma clave vuelve a entrar
+    assert queue.submit(("siman", "tele"), job, "a")
+
+
+def test_search_refresh_runs_once_inside_admission(monkeypatch):
+    monkeypatch.setattr(catalog, "refresher", catalog.RefreshQueue(workers=2, max_pending=8))
+    limiter = admission.WeightedLimiter(8, 16, max_wait=5)
+    monkeypatch.setattr(admission, "limiter", limiter)
+    release = threading.Event()
+    seen = []
+
+    class SlowScraper:
+        def scrape(self, query, deadline=None):
+            seen.append((query, limiter.in_use))
+            release.wait(5)
+            self.last_mode, self.last_status = "static", "ok"
+            return [Product("siman", "Licuadora Oster", "$49.99")]
+
+    monkeypatch.setitem(main.SCRAPERS, "siman", SlowScraper)
+    client = TestClient(main.app, headers={"Authorization": f"Bearer {mint_token('catalogo')}"})
+    params = {"query": "licuadora", "store": "siman", "refresh": "true"}
+
+    first = client.get("/search", params=params).json()
+    _wait_until(lambda: seen)
+    tokens = float(app.auth.redis_client.hget("quota:catalogo", "tokens"))
+    second = client.get("/search", params=params).json()
+
+    assert first["refreshing"] == second["refreshing"] == ["siman"]
+    # El segundo /search encuentra el refresco pendiente: ni cuota ni otro scrape
+    assert float(app.auth.redis_client.hget("quota:catalogo", "tokens")) >= tokens
+    release.set()
+    _wait_until(lambda: catalog.refresher.snapshot()["pending"] == 0)
+    assert seen == [("licuadora", admission.STORE_WEIGHTS["siman"])]
+    assert limiter.stats()["admitted"] == 1 and limiter.stats()["in_use"] == 0
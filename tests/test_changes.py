@@ -0,0 +1,72 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.changes import read_changes, record_changes
+from app.product import Product
+from loadtest.run import mint_token
+
+
+def _item(name, price, url=None):
+    return Product("siman", name, price, url=url or f"https://tienda.test/{name}/p")
+
+
+def _events(**kwargs):
+    return [(c["type"], c["name"] if "name" in c else c["url"]) for c in read_changes(None, **kwargs)["changes"]]
+
+
+def test_first_scrape_publishes_every_product_as_added():
+    record_changes("siman", "licuadora", [_item("oster", "$50"), _item("ninja", "$80")])
+    assert _events() == [("added", "oster"), ("added", "ninja")]
+
+
+def test_diff_publishes_only_added_removed_and_repriced():
+    record_changes("siman", "licuadora", [_item("oster", "$50"), _item("ninja", "$80"), _item("black", "$30")])
+    cursor = read_changes(None)["cursor"]
+
+    record_changes("siman", "licuadora", [_item("oster", "$50"), _item("ninja", "$75"), _item("hamilton", "$40")])
+
+    changes = read_changes(cursor)["changes"]
+    assert sorted((c["type"], c["url"]) for c in changes) == [
+        ("added", "https://tienda.test/hamilton/p"),
+        ("removed", "https://tienda.test/black/p"),
+        ("repriced", "https://tienda.test/ninja/p"),
+    ]
+    repriced = next(c for c in changes if c["type"] == "repriced")
+    assert repriced["price_original"] == "$75"
+
+
+def test_same_result_publishes_nothing():
+    items = [_item("oster", "$50")]
+    fingerprint = record_changes("siman", "licuadora", items)
+    cursor = read_changes(None)["cursor"]
+
+    assert record_changes("siman", "licuadora", items) == fingerprint
+    assert read_changes(cursor)["changes"] == []
+
+
+def test_empty_result_publishes_no_removals():
+    record_changes("siman", "licuadora", [_item("oster", "$50")])
+    cursor = read_changes(None)["cursor"]
+
+    record_changes("siman", "licuadora", [])
+
+    assert read_changes(cursor)["changes"] == []
+
+
+def test_query_filter_includes_variants():
+    record_changes("walmart", "licuadora", [_item("oster", "$50")])
+    record_changes("walmart", "licuadora#escalon:best_price", [_item("ninja", "$80")])
+    record_changes("walmart", "licuadora oster", [_item("hamilton", "$40")])
+
+    assert _events(query="licuadora") == [("added", "oster"), ("added", "ninja")]
+
+
+@pytest.mark.parametrize("since", ["abc", "1700000000000", "1-2-3", "(0-0", "1-1\n"])
+def test_malformed_cursor_is_a_400(since):
+    from app.main import app
+    client = TestClient(app, headers={"Authorization": f"Bearer {mint_token('feed')}"})
+
+    resp = client.get("/changes", params={"since": since})
+
+    assert resp.status_code == 400
+    assert "Cursor inválido" in resp.json()["detail"]
@@ -0,0 +1,129 @@
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app import images
+from loadtest.run import mint_token
+
+
+def _jpeg(size: int = 400) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (size, size), (200, 30, 30)).save(out, format="JPEG")
+    return out.getvalue()
+
+
+class ImageServer:
+    """Origen local: /foto.jpg tarda `delay` segundos y cuenta cuántas veces se pidió."""
+
+    def __init__(self):
+        server = self
+        self.hits = 0
+        self.delay = 0.0
+        self.body = _jpeg()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.hits += 1
+                time.sleep(server.delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(server.body)))
+                self.end_headers()
+                self.wfile.write(server.body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/foto.jpg"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def origin():
+    server = ImageServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "cache", images.DiskLRU(str(tmp_path / "images"), 10 * 1024 * 1024))
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+    return TestClient(app, headers={"Authorization": f"Bearer {mint_token('fotos')}"})
+
+
+def test_rejects_unsigned_url(client, origin):
+    resp = client.get("/image", params={"url": origin.url, "sig": "0" * 32})
+    assert resp.status_code == 403
+    assert origin.hits == 0
+
+
+def test_serves_signed_thumbnail(client, origin):
+    resp = client.get("/image", params={"url": origin.url, "sig": images.sign(origin.url), "w": 100, "fmt": "jpeg"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/jpeg"
+    assert max(Image.open(io.BytesIO(resp.content)).size) == images.snap_size(100)
+
+
+def test_empty_signing_key_disables_proxy(client, origin, monkeypatch):
+    monkeypatch.setattr(images, "IMAGE_SIGNING_KEY", b"")
+    # Con la clave vacía la firma sería calculable por cualquiera
+    assert not images.verify(origin.url, images.sign(origin.url))
+    assert client.get("/image", params={"url": origin.url, "sig": images.sign(origin.url)}).status_code == 503
+    row = {"image": origin.url}
+    assert images.rewrite([row], 160) == [row]
+
+
+def test_source_size_cap(origin, monkeypatch):
+    monkeypatch.setattr(images, "IMAGE_MAX_SOURCE_MB", 1 / 1024)
+    origin.body = b"\xff" * 4096
+    with pytest.raises(images.ImageError) as err:
+        images.get(origin.url, 160, "jpeg")
+    assert err.value.status_code == 502
+    assert "demasiado grande" in err.value.detail
+
+
+def test_disk_lru_evicts_least_recently_used(tmp_path):
+    lru = images.DiskLRU(str(tmp_path / "lru"), max_bytes=250)
+    lru.put("aa1", b"x" * 100)
+    lru.put("bb2", b"x" * 100)
+    assert lru.get("aa1") is not None
+    lru.put("cc3", b"x" * 100)
+
+    assert lru.get("bb2") is None
+    assert lru.get("aa1") is not None and lru.get("cc3") is not None
+    assert lru.snapshot()["evictions"] == 1
+    assert lru.snapshot()["bytes"] <= 250
+    # El orden sobrevive a un reinicio: se rearma desde el disco
+    reloaded = images.DiskLRU(str(tmp_path / "lru"), 250)
+    assert reloaded.get("cc3") is not None and reloaded.snapshot()["entries"] == 2
+
+
+def test_concurrent_misses_share_one_download(origin):
+    origin.delay = 0.3
+    before = images._flights.coalesced
+    bodies = []
+    threads = [threading.Thread(target=lambda: bodies.append(images.get(origin.url, 160, "webp")))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert origin.hits == 1
+    assert images._flights.coalesced - before == 4
+    assert len({body for body, _ in bodies}) == 1
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import admission, politeness
+from app.stores.walmart_scraper import WalmartScraper
+from app.product import Product
+from loadtest.run import mint_token
+
+
+class Response:
+    status = 200
+
+
+class Page:
+    def goto(self, url, **kwargs):
+        time.sleep(0.1)
+        return Response()
+
+
+@pytest.fixture
+def fresh_schedulers(monkeypatch):
+    monkeypatch.setattr(politeness, "POLITENESS_ENABLED", True)
+    monkeypatch.setattr(politeness, "_schedulers", {})
+    monkeypatch.setitem(politeness.STORE_MIN_INTERVAL, "walmart", 0.05)
+
+
+def test_walmart_requests_beyond_capacity_do_not_deadlock(fresh_schedulers, monkeypatch):
+    # 2 scrapes de peso 4 llenan ADMISSION_CAPACITY (8) y Walmart tiene 2
+    # turnos: los que llegan después esperan admisión sin retener los
+    # turnos que los primeros necesitan para cada sucursal
+    assert politeness.STORE_CONCURRENCY["walmart"] == 2
+    limiter = admission.WeightedLimiter(8, 16, max_wait=5)
+    monkeypatch.setattr(admission, "limiter", limiter)
+
+    def scrape(self, query, deadline=None, branches=None, mode="all"):
+        self.deadline = deadline
+        for branch in ("escalon", "santa_ana", "san_miguel"):
+            politeness.goto(Page(), "walmart", f"https://walmart.test/{branch}")
+        self.last_status = "ok"
+        return [Product("walmart", f"Arroz {query}", "$1.00")]
+
+    monkeypatch.setattr(WalmartScraper, "scrape", scrape)
+    from app.main import app
+    client = TestClient(app)
+
+    statuses = {}
+
+    def call(i):
+        resp = client.get("/scrape/walmart", params={"query": f"arroz {i}"},
+                          headers={"Authorization": f"Bearer {mint_token(f'walmart-{i}')}"})
+        statuses[i] = resp.status_code
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for t in threads[:2]:
+        t.start()
+    # Los dos primeros ya están recorriendo sucursales cuando llegan los otros
+    time.sleep(0.15)
+    for t in threads[2:]:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert statuses == {0: 200, 1: 200, 2: 200, 3: 200}
+    assert time.monotonic() - started < 5
+    assert limiter.stats()["rejected_timeout"] == 0
+    assert politeness.scheduler("walmart").granted == 12
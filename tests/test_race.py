@@ -0,0 +1,128 @@
+import time
+
+from app.race import StrategyRace, StrategyStats
+
+
+def _pump(ms):
+    time.sleep(ms / 1000)
+
+
+def _strategy(steps, result, log=None, name=None, wait=10):
+    """Cede `steps` esperas de `wait` ms y retorna `result`; anota en `log` si la cerraron antes."""
+    try:
+        for _ in range(steps):
+            yield wait
+    except GeneratorExit:
+        if log is not None:
+            log.append(name)
+        raise
+    return result
+
+
+def _race(**kwargs):
+    return StrategyRace(StrategyStats(), **kwargs)
+
+
+def test_first_non_empty_result_wins_and_losers_are_closed():
+    closed = []
+    race = _race()
+
+    winner, results = race.run({
+        "lenta": lambda: _strategy(20, ["lenta"], closed, "lenta"),
+        "vacia": lambda: _strategy(1, [], closed, "vacia"),
+        "rapida": lambda: _strategy(3, ["rapida"], closed, "rapida"),
+    }, _pump, 5000)
+
+    assert (winner, results) == ("rapida", ["rapida"])
+    # La vacía terminó sola antes; solo la lenta quedó a medias y se cerró
+    assert closed == ["lenta"]
+    assert not race.timed_out
+    stats = race.stats.snapshot()
+    assert stats["rapida"]["wins"] == 1 and stats["lenta"]["wins"] == 0
+    assert all(entry["attempts"] == 1 for entry in stats.values())
+
+
+def test_strategies_are_interleaved():
+    steps = []
+
+    def strategy(name):
+        for i in range(3):
+            steps.append(name)
+            yield 5
+        return []
+
+    _race().run({"a": lambda: strategy("a"), "b": lambda: strategy("b")}, _pump, 5000)
+
+    assert steps == ["a", "b", "a", "b", "a", "b"]
+
+
+def test_is_valid_decides_the_winner():
+    winner, results = _race().run({
+        "uno": lambda: _strategy(1, ["x"]),
+        "tres": lambda: _strategy(2, ["x", "y", "z"]),
+    }, _pump, 5000, is_valid=lambda r: len(r) >= 3)
+
+    assert (winner, results) == ("tres", ["x", "y", "z"])
+
+
+def test_timeout_closes_running_strategies():
+    closed = []
+    race = _race()
+
+    started = time.monotonic()
+    winner, results = race.run({"eterna": lambda: _strategy(10_000, ["tarde"], closed, "eterna", wait=20)},
+                               _pump, 100)
+
+    assert (winner, results) == (None, [])
+    assert race.timed_out
+    assert closed == ["eterna"]
+    assert time.monotonic() - started < 0.5
+
+
+def test_stop_cuts_the_race_without_timing_out():
+    closed = []
+    race = _race()
+    deadline = time.monotonic() + 0.05
+
+    winner, _ = race.run({"eterna": lambda: _strategy(10_000, ["tarde"], closed, "eterna")},
+                         _pump, 5000, stop=lambda: time.monotonic() >= deadline)
+
+    assert winner is None
+    assert not race.timed_out
+    assert closed == ["eterna"]
+
+
+def test_failing_strategy_does_not_stop_the_others():
+    def broken():
+        yield 0
+        raise RuntimeError("selector roto")
+
+    winner, _ = _race().run({"rota": broken, "buena": lambda: _strategy(2, ["ok"])}, _pump, 5000)
+
+    assert winner == "buena"
+
+
+def test_rarely_winning_strategy_is_skipped_or_started_late():
+    stats = StrategyStats()
+    for _ in range(10):
+        stats.record_attempt("perdedora")
+        stats.record_attempt("regular")
+    stats.record_win("regular", 100)
+    race = StrategyRace(stats, min_samples=10, late_below=0.2, skip_below=0.05, late_start_ms=60, explore=0)
+    started = {}
+
+    def strategy(name, result):
+        started[name] = time.monotonic()
+        yield 0
+        return result
+
+    t0 = time.monotonic()
+    winner, _ = race.run({
+        "perdedora": lambda: strategy("perdedora", ["p"]),
+        "regular": lambda: strategy("regular", ["r"]),
+    }, _pump, 5000)
+
+    assert winner == "regular"
+    assert "perdedora" not in started
+    # 10% de victorias: por debajo de late_below arranca con retraso
+    assert started["regular"] - t0 >= 0.05
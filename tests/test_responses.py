@@ -0,0 +1,52 @@
+import orjson
+from starlette.requests import Request
+
+from app.product import Product
+from app.responses import ResultView, scrape_response
+
+
+def _request():
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+
+
+def _view(**kwargs):
+    params = {"fields": None, "limit": None, "offset": 0, "if_fingerprint": None, "enrich": False,
+              "enrich_top": None, "timeout_ms": None, "thumb": None}
+    params.update(kwargs)
+    return ResultView(**params)
+
+
+def _products():
+    # Solo los pares traen SKU (p. ej. enriquecidos)
+    out = []
+    for i in range(6):
+        product = Product("siman", f"Televisor {i}", "$100")
+        if i % 2 == 0:
+            product.sku = f"SKU{i}"
+        out.append(product)
+    return out
+
+
+def _payload(view):
+    return orjson.loads(scrape_response(_request(), "ana", _products(), view).body)
+
+
+def test_total_and_window_count_only_projected_rows():
+    payload = _payload(_view(fields="sku", limit=2, offset=1))
+
+    assert payload["total"] == 3
+    assert payload["results"] == [{"sku": "SKU2"}, {"sku": "SKU4"}]
+
+
+def test_window_past_projected_rows_is_empty():
+    payload = _payload(_view(fields="sku", offset=3))
+
+    assert payload["total"] == 3
+    assert payload["results"] == []
+
+
+def test_without_fields_every_result_counts():
+    payload = _payload(_view(limit=2, offset=4))
+
+    assert payload["total"] == 6
+    assert [row["name"] for row in payload["results"]] == ["Televisor 4", "Televisor 5"]
@@ -0,0 +1,44 @@
+import json
+
+from app.selector_stats import SelectorRanking, SelectorStatsStore
+
+
+def test_processes_sharing_the_file_add_up_their_wins(tmp_path):
+    path = str(tmp_path / "selector_stats.json")
+    # Dos workers que cargaron el archivo antes de que el otro escribiera
+    a, b = SelectorStatsStore(path), SelectorStatsStore(path)
+
+    for _ in range(5):
+        a.record("siman:products", ".ais-Hits-item")
+    for _ in range(3):
+        b.record("siman:products", ".ais-Hits-item")
+    b.record("curacao:name", "h3")
+    a.flush()
+    b.flush()
+
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    assert saved["siman:products"]["wins"] == {".ais-Hits-item": 8}
+    assert saved["curacao:name"]["winner"] == "h3"
+    # Al escribir, un proceso también recoge lo que guardaron los demás
+    assert a.get("siman:products")["wins"] == {".ais-Hits-item": 8}
+    assert a.get("curacao:name")["winner"] == "h3"
+
+
+def test_latest_winner_change_survives_other_writers(tmp_path):
+    path = str(tmp_path / "selector_stats.json")
+    a = SelectorStatsStore(path)
+    a.record("vidri:products", ".producto")
+    b = SelectorStatsStore(path)
+
+    # b ve el cambio de layout: tres victorias seguidas de otro selector
+    for _ in range(3):
+        b.record("vidri:products", ".product-card")
+    # a todavía cree en el ganador viejo y guarda después
+    a.record("vidri:products", ".producto")
+    a.flush()
+
+    fresh = SelectorStatsStore(path)
+    assert fresh.get("vidri:products")["winner"] == ".product-card"
+    assert fresh.get("vidri:products")["wins"] == {".producto": 2, ".product-card": 3}
+    assert SelectorRanking("vidri", "products", [".producto", ".product-card"], fresh).ordered()[0] == ".product-card"
@@ -0,0 +1,86 @@
+import pytest
+
+from app import snapshots
+
+# DOM tal como lo deja el navegador: sin la galería VTEX renderizada en
+# servidor que busca el parser estático
+CURACAO_RENDERED = """
+<html><body>
+  <div class="search-results">
+    <div class="card">
+      <a href="/televisor-lg-50/p"><img src="https://img.test/tv.jpg"></a>
+      <h3>Televisor LG 50 pulgadas</h3>
+      <span class="product-price">$399.99</span>
+    </div>
+    <div class="card">
+      <a href="/televisor-tcl-43/p"><img src="https://img.test/tcl.jpg"></a>
+      <h3>Televisor TCL 43</h3>
+      <span class="product-price">$249.00</span>
+    </div>
+  </div>
+</body></html>
+"""
+
+SIMAN_RENDERED = """
+<html><body>
+  <ol class="ais-Hits-list">
+    <li class="ais-Hits-item">
+      <a href="/televisor-samsung/p">
+        <img src="https://img.test/s.jpg">
+        <h2 class="productName">Televisor Samsung 55</h2>
+      </a>
+      <span class="sellingPrice">$599.00</span>
+    </li>
+  </ol>
+</body></html>
+"""
+
+PRISMA_RENDERED = """
+<html><body>
+  <section>
+    <div class="tile">
+      <a href="/camisa-oxford-azul/producto/123"><img src="/c.jpg" alt="Camisa Oxford azul"></a>
+      <span>$29.95</span>
+    </div>
+  </section>
+</body></html>
+"""
+
+
+@pytest.fixture(autouse=True)
+def sample_all(monkeypatch):
+    monkeypatch.setattr(snapshots, "SNAPSHOT_SAMPLE_RATE", 1.0)
+
+
+class Page:
+    def __init__(self, html, url):
+        self.html = html
+        self.url = url
+
+    def content(self):
+        return self.html
+
+
+@pytest.mark.parametrize("store, query, html, names", [
+    ("curacao", "televisor", CURACAO_RENDERED, ["Televisor LG 50 pulgadas", "Televisor TCL 43"]),
+    ("siman", "televisor", SIMAN_RENDERED, ["Televisor Samsung 55"]),
+    ("prismamoda", "camisa", PRISMA_RENDERED, ["Camisa Oxford azul"]),
+])
+def test_browser_snapshot_uses_browser_extraction(store, query, html, names):
+    snapshot_id = snapshots.capture_page(store, query, Page(html, "https://tienda.test/"))
+    meta = snapshots.get(snapshot_id)
+    assert meta["mode"] == "browser"
+
+    out = snapshots.reextract(meta)
+
+    assert [item["name"] for item in out["results"]] == names
+    assert all(item["url"].startswith("http") for item in out["results"])
+
+
+def test_static_snapshot_keeps_static_parser():
+    snapshot_id = snapshots.capture("curacao", "televisor", "https://tienda.test/", CURACAO_RENDERED)
+    meta = snapshots.get(snapshot_id)
+    assert meta["mode"] == "static"
+
+    # El parser estático solo entiende la galería VTEX del HTML del servidor
+    assert snapshots.reextract(meta)["results"] == []
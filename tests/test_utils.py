@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from app import utils
+from app.utils import canonicalize_query, parse_price, search_query
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,299.00", 1299.0),
+    ("1.299,00", 1299.0),
+    ("$1,299.99", 1299.99),
+    ("US$ 1.299,99", 1299.99),
+    ("C$ 1.234.567,89", 1234567.89),
+    ("$ 12", 12.0),
+    ("$25", 25.0),
+    ("$0.99", 0.99),
+    ("12,5", 12.5),
+    ("$1,299", 1299.0),
+    ("1.299", 1299.0),
+    ("Antes: $45.50", 45.5),
+    ("$19.99 $24.99", 19.99),
+    ("$12.", 12.0),
+    ("", None),
+    (None, None),
+    ("   ", None),
+    ("Agotado", None),
+])
+def test_parse_price(text, expected):
+    assert parse_price(text) == expected
+
+
+@pytest.mark.parametrize("query, canonical", [
+    ("Licuadora OSTER", "licuadora oster"),
+    ("  licuadora \t  oster\n", "licuadora oster"),
+    ("Café Ñandú", "cafe nandu"),
+    ("CAFÉ", "cafe"),
+    ("cafe", "cafe"),
+    ("", ""),
+])
+def test_canonicalize_query_folds_case_accents_and_spaces(query, canonical):
+    assert canonicalize_query(query) == canonical
+
+
+def test_canonicalize_query_keeps_token_order():
+    # Cada orden es una búsqueda distinta en la tienda: no se reordena
+    assert canonicalize_query("Oster licuadora") == "oster licuadora"
+    assert canonicalize_query("licuadora Oster") == "licuadora oster"
+
+
+def test_canonicalize_query_applies_longest_synonym(tmp_path, monkeypatch):
+    path = tmp_path / "sinonimos.json"
+    path.write_text(json.dumps({"Aire Acondicionado": "climatizador", "aire": "ventilador", "tele": "televisor"}), encoding="utf-8")
+    monkeypatch.setenv("QUERY_SYNONYMS_PATH", str(path))
+    utils._synonyms.cache_clear()
+    try:
+        assert canonicalize_query("Aire  acondicionado Split") == "climatizador split"
+        assert canonicalize_query("aire de piso") == "ventilador de piso"
+        assert canonicalize_query("tele LG") == "televisor lg"
+    finally:
+        monkeypatch.delenv("QUERY_SYNONYMS_PATH")
+        utils._synonyms.cache_clear()
+
+
+@pytest.mark.parametrize("query, sent", [
+    ("  Café   Ñandú ", "Café Ñandú"),
+    ("Licuadora OSTER", "Licuadora OSTER"),
+    ("oster\tlicuadora", "oster licuadora"),
+])
+def test_search_query_keeps_accents_and_case(query, sent):
+    assert search_query(query) == sent
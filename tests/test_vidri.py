@@ -0,0 +1,127 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import browser_pool, page_signals, static_fetch
+from app.query_cache import is_negative
+from app.stores import vidri_scraper
+from loadtest.run import mint_token
+
+
+class Response:
+    status = 200
+    ok = True
+
+
+class Page:
+    """Página de Playwright cuyo sondeo de firmas siempre ve `state`."""
+
+    def __init__(self, state):
+        self.state = state
+        self.url = "https://www.vidri.com.sv/"
+        self.closed = False
+
+    def goto(self, url, **kwargs):
+        self.url = url
+        return Response()
+
+    def evaluate(self, script, arg=None):
+        # Solo el sondeo de page_signals lleva la configuración de firmas
+        return self.state if isinstance(arg, dict) and "order" in arg else None
+
+    def wait_for_timeout(self, ms):
+        time.sleep(ms / 1000)
+
+    def query_selector(self, selector):
+        return None
+
+    def query_selector_all(self, selector):
+        return []
+
+    def content(self):
+        return "<html><body>Access denied</body></html>"
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+class Browser:
+    def __init__(self, state):
+        self.state = state
+        self.pages = []
+
+    def new_context(self, **kwargs):
+        return self
+
+    def new_page(self):
+        page = Page(self.state)
+        self.pages.append(page)
+        return page
+
+    def close(self):
+        pass
+
+
+class Playwright:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def site(monkeypatch):
+    """Vidri sin red: el fetch estático retorna `data` y el navegador muestra `state`."""
+    def setup(data, state=None):
+        browser = Browser(state)
+        monkeypatch.setattr(static_fetch, "fetch_json", lambda url, timeout=None, store=None: data)
+        monkeypatch.setattr(vidri_scraper, "sync_playwright", Playwright)
+        monkeypatch.setattr(browser_pool, "launch", lambda p, headless=True: browser)
+        return browser
+    return setup
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+    return TestClient(app, headers={"Authorization": f"Bearer {mint_token('vidri')}"})
+
+
+def test_bot_wall_ends_race_and_is_not_negative_cached(site, client):
+    browser = site(None, page_signals.BLOCKED)
+
+    started = time.monotonic()
+    resp = client.get("/scrape/vidri", params={"query": "taladro"})
+    elapsed = time.monotonic() - started
+
+    assert resp.status_code == 200
+    assert resp.json()["status"] == page_signals.BLOCKED
+    assert resp.json()["results"] == []
+    # La primera estrategia que ve el bot wall corta la carrera
+    assert elapsed < 1.5
+    assert browser.pages and all(page.closed for page in browser.pages[1:])
+    assert not is_negative("vidri", "taladro")
+
+
+def test_empty_catalog_answer_skips_browser(site, client, monkeypatch):
+    site([])
+    monkeypatch.setattr(browser_pool, "launch", lambda p, headless=True: pytest.fail("no debía abrir el navegador"))
+
+    resp = client.get("/scrape/vidri", params={"query": "zzzz"})
+
+    assert resp.status_code == 200
+    assert resp.json()["status"] == page_signals.NO_RESULTS
+    assert is_negative("vidri", "zzzz")
+
+
+def test_race_timeout_is_reported(site):
+    site(None)
+    scraper = vidri_scraper.VidriScraper(timeout=300)
+
+    assert scraper.scrape("taladro") == []
+    assert scraper.last_status == page_signals.TIMEOUT
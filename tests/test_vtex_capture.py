@@ -0,0 +1,127 @@
+import base64
+import json
+
+import pytest
+
+from app.vtex_capture import format_prices, parse_products, search_terms, seller_ids
+
+BASE = "https://tienda.test"
+
+# productSearch de GraphQL (VTEX IO) como lo recibe la página, recortado
+GRAPHQL_PAYLOAD = {
+    "data": {
+        "productSearch": {
+            "recordsFiltered": 4,
+            "products": [
+                {
+                    "productName": "Licuadora Oster 10 velocidades",
+                    "brand": "Oster",
+                    "link": "/licuadora-oster-10v/p",
+                    "items": [{
+                        "images": [{"imageUrl": "https://img.test/oster.jpg"}],
+                        "sellers": [
+                            {"sellerId": "1", "sellerDefault": False,
+                             "commertialOffer": {"Price": 99.0, "ListPrice": 99.0, "AvailableQuantity": 3}},
+                            {"sellerId": "walmartsvwm4382", "sellerDefault": True,
+                             "commertialOffer": {"Price": 49.99, "ListPrice": 64.99, "AvailableQuantity": 12}}
+                        ]
+                    }]
+                },
+                {
+                    # SKU agotado: la oferta sigue trayendo precio
+                    "productName": "Licuadora Ninja",
+                    "brand": "",
+                    "linkText": "licuadora-ninja",
+                    "items": [{
+                        "images": [],
+                        "sellers": [{"sellerId": "1", "commertialOffer": {
+                            "Price": 89.0, "ListPrice": 89.0, "AvailableQuantity": 0}}]
+                    }]
+                },
+                {
+                    # Sin precio en la oferta ni rango: producto sin precio publicado
+                    "productName": "Licuadora Hamilton",
+                    "linkText": "licuadora-hamilton",
+                    "items": [{"sellers": [{"sellerId": "1", "commertialOffer": {"Price": 0, "ListPrice": 0}}]}]
+                },
+                {
+                    # Sin items: el precio sale de priceRange
+                    "productName": "Licuadora Black+Decker",
+                    "link": "/licuadora-bd/p",
+                    "priceRange": {"sellingPrice": {"lowPrice": 35.5}, "listPrice": {"highPrice": 40}},
+                    "items": []
+                },
+                "basura"
+            ]
+        }
+    }
+}
+
+# intelligent-search/product_search: la lista viene en la raíz
+INTELLIGENT_SEARCH_PAYLOAD = {
+    "products": [{
+        "productName": "Camisa Oxford",
+        "link": "https://tienda.test/camisa-oxford/p",
+        "items": [{"sellers": [{"sellerId": "1", "commertialOffer": {"Price": 29.95, "AvailableQuantity": 1}}]}]
+    }]
+}
+
+
+def test_parse_graphql_product_search():
+    products = parse_products(GRAPHQL_PAYLOAD, BASE)
+
+    assert [p["name"] for p in products] == [
+        "Licuadora Oster 10 velocidades", "Licuadora Ninja", "Licuadora Hamilton", "Licuadora Black+Decker"]
+    oster, ninja, hamilton, bd = products
+    # La oferta del seller por defecto, no la primera
+    assert oster == {"name": "Licuadora Oster 10 velocidades", "brand": "Oster",
+                     "url": "https://tienda.test/licuadora-oster-10v/p", "image": "https://img.test/oster.jpg",
+                     "price": 49.99, "list_price": 64.99, "available": True}
+    assert ninja["available"] is False and ninja["price"] == 89.0
+    assert ninja["url"] == "https://tienda.test/licuadora-ninja/p" and ninja["brand"] is None and ninja["image"] == ""
+    assert hamilton["price"] is None and hamilton["list_price"] is None and hamilton["available"] is None
+    assert (bd["price"], bd["list_price"], bd["available"]) == (35.5, 40.0, None)
+
+
+def test_parse_intelligent_search():
+    assert parse_products(INTELLIGENT_SEARCH_PAYLOAD, BASE) == [{
+        "name": "Camisa Oxford", "brand": None, "url": "https://tienda.test/camisa-oxford/p", "image": "",
+        "price": 29.95, "list_price": None, "available": True}]
+
+
+def test_empty_search_is_an_empty_list():
+    assert parse_products({"data": {"productSearch": {"products": []}}}, BASE) == []
+
+
+@pytest.mark.parametrize("data", [
+    None, [], "texto", {"data": {}}, {"data": {"productSearch": None}}, {"products": None}, {"facets": []}])
+def test_other_json_is_not_a_search(data):
+    assert parse_products(data, BASE) is None
+    assert seller_ids(data) is None
+
+
+def test_seller_ids():
+    assert seller_ids(GRAPHQL_PAYLOAD) == {"1", "walmartsvwm4382"}
+
+
+@pytest.mark.parametrize("product, prices", [
+    ({"price": 49.99, "list_price": 64.99}, {"original": "$64.99", "discount": "$49.99"}),
+    ({"price": 1299.0, "list_price": 1299.0}, {"original": "$1,299.00", "discount": ""}),
+    ({"price": None, "list_price": None}, {"original": "", "discount": ""}),
+])
+def test_format_prices(product, prices):
+    assert format_prices(product) == prices
+
+
+def test_search_terms():
+    variables = base64.b64encode(json.dumps({"fullText": "licuadora"}).encode()).decode().rstrip("=")
+    extensions = json.dumps({"variables": variables})
+    persisted = f"{BASE}/_v/segment/graphql/v1?operationName=productSearchV3&extensions={extensions}"
+    assert search_terms(persisted) == "licuadora"
+
+    post = json.dumps({"operationName": "productSearchV3", "variables": {"query": "camisa"}})
+    assert search_terms(f"{BASE}/_v/private/graphql/v1", post) == "camisa"
+
+    assert search_terms(f"{BASE}/api/io/_v/api/intelligent-search/product_search/?query=tv") == "tv"
+    assert search_terms(f"{BASE}/_v/segment/graphql/v1?operationName=autocompleteSearchSuggestions") is None
+    assert search_terms(f"{BASE}/static/app.js") is None
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from app import page_signals, politeness, waits
+from app.deadline import Deadline
+
+
+class Page:
+    """Página que nunca termina de cargar: cada espera agota su timeout."""
+
+    def __init__(self):
+        self.gotos = []
+        self.waits = []
+
+    def goto(self, url, **kwargs):
+        self.gotos.append(kwargs)
+        return None
+
+    def _block(self, timeout):
+        self.waits.append(timeout)
+        time.sleep(timeout / 1000)
+        raise PlaywrightTimeoutError(f"Timeout {timeout}ms exceeded.")
+
+    def wait_for_load_state(self, state, timeout=None):
+        self._block(timeout)
+
+    def wait_for_selector(self, selector, timeout=None, **kwargs):
+        self._block(timeout)
+
+    def wait_for_function(self, script, arg=None, timeout=None, polling=None):
+        self._block(timeout)
+
+    def wait_for_timeout(self, timeout):
+        self.waits.append(timeout)
+        time.sleep(timeout / 1000)
+
+
+def _cancel_after(deadline, seconds):
+    timer = threading.Timer(seconds, deadline.cancel)
+    timer.start()
+    return timer
+
+
+@pytest.mark.parametrize("wait", [
+    lambda page, deadline: waits.load_state(page, deadline, "networkidle", 30000),
+    lambda page, deadline: waits.selector(page, deadline, ".gallery", 30000, state="visible"),
+    lambda page, deadline: politeness.goto(page, "walmart", "https://tienda.test/", deadline=deadline,
+                                           wait_until="domcontentloaded", timeout=30000),
+])
+def test_cancel_interrupts_long_waits(wait):
+    page, deadline = Page(), Deadline()
+    _cancel_after(deadline, 0.2)
+
+    started = time.monotonic()
+    with pytest.raises(PlaywrightTimeoutError):
+        wait(page, deadline)
+
+    assert time.monotonic() - started < 0.2 + 2 * waits.WAIT_SLICE_MS / 1000
+    assert max(page.waits) <= waits.WAIT_SLICE_MS
+
+
+def test_goto_with_deadline_only_waits_for_commit():
+    page = Page()
+    deadline = Deadline()
+    deadline.cancel()
+
+    with pytest.raises(PlaywrightTimeoutError):
+        politeness.goto(page, "siman", "https://tienda.test/", deadline=deadline, timeout=30000)
+
+    assert page.gotos == [{"wait_until": "commit", "timeout": 30000}]
+
+
+def test_pause_and_outcome_wake_on_cancel():
+    page, deadline = Page(), Deadline()
+    _cancel_after(deadline, 0.2)
+
+    started = time.monotonic()
+    waits.pause(page, deadline, 30000)
+    state = page_signals.wait_for_outcome(page, ".item", page_signals.signals(), 30000, stop=deadline.expired)
+
+    assert state == page_signals.TIMEOUT
+    assert time.monotonic() - started < 0.2 + 2 * waits.WAIT_SLICE_MS / 1000
+
+
+def test_sliced_wait_returns_once_ready():
+    calls = []
+
+    def wait(timeout):
+        calls.append(timeout)
+        if len(calls) < 3:
+            raise PlaywrightTimeoutError("todavía no")
+        return "listo"
+
+    assert waits.sliced(Deadline(), wait, 30000) == "listo"
+    assert calls == [waits.WAIT_SLICE_MS] * 3
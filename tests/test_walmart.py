@@ -0,0 +1,60 @@
+import pytest
+
+from app.product import Product
+from app.stores.walmart_scraper import WalmartScraper
+
+PRICES = {"escalon": "$10.00", "santa_ana": "$25.00", "san_miguel": "$8.00"}
+
+
+class Scraper(WalmartScraper):
+    """Sucursales sin navegador: cada una devuelve un producto propio con su precio."""
+
+    def __init__(self):
+        super().__init__()
+        self.visited = []
+
+    def _scrape_single_store(self, query, store_id, store_name):
+        self.visited.append(store_name)
+        self._branch_status = None
+        return [Product("Walmart", f"Licuadora {store_name}", PRICES[store_name])]
+
+
+BRANCHES = ["escalon", "santa_ana", "san_miguel"]
+
+
+def test_best_price_skips_branches_that_cannot_beat_shared_floor():
+    # Otro worker (otra instancia) ya vio los pisos de esta consulta
+    Scraper().scrape("licuadora", branches=BRANCHES, mode="all")
+
+    scraper = Scraper()
+    results = scraper.scrape("Licuadora", branches=BRANCHES, mode="best_price")
+
+    # Primero la más barata conocida; las demás tienen piso por encima
+    assert scraper.visited == ["san_miguel"]
+    assert [p.price for p in results] == [8.0]
+
+
+def test_best_price_without_floors_visits_every_branch():
+    scraper = Scraper()
+    scraper.scrape("licuadora", branches=BRANCHES, mode="best_price")
+    assert sorted(scraper.visited) == sorted(BRANCHES)
+
+
+def test_other_modes_never_prune():
+    Scraper().scrape("licuadora", branches=BRANCHES, mode="all")
+
+    scraper = Scraper()
+    results = scraper.scrape("licuadora", branches=BRANCHES, mode="all")
+
+    assert scraper.visited == BRANCHES
+    assert len(results) == 3
+
+
+@pytest.mark.parametrize("floor, best, can_beat", [
+    (None, 10.0, True),
+    (8.0, 10.0, True),
+    (10.0, 10.0, False),
+    (25.0, 10.0, False),
+])
+def test_can_beat(floor, best, can_beat):
+    assert WalmartScraper()._can_beat(floor, best) is can_beat
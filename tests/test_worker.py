@@ -0,0 +1,164 @@
+import threading
+import time
+
+import orjson
+import pytest
+
+import app.auth
+from app import jobs, worker as worker_mod
+from app.product import Product
+
+
+class FakeScraper:
+    """Scraper sin navegador: falla `fail` veces y después retorna un producto."""
+
+    calls = 0
+    fail = 0
+    last_deadline = None
+
+    def __init__(self):
+        self.last_mode = "static"
+        self.last_status = "ok"
+
+    def scrape(self, query, deadline=None):
+        FakeScraper.calls += 1
+        FakeScraper.last_deadline = deadline
+        if FakeScraper.calls <= FakeScraper.fail:
+            raise RuntimeError("tienda caída")
+        return [Product("siman", f"Televisor {query}", "$399")]
+
+
+class SlowScraper(FakeScraper):
+    """Sigue navegando hasta que el deadline lo corta."""
+
+    def scrape(self, query, deadline=None):
+        FakeScraper.last_deadline = deadline
+        while not deadline.expired():
+            deadline.sleep(0.05)
+        return []
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    FakeScraper.calls = 0
+    FakeScraper.fail = 0
+    FakeScraper.last_deadline = None
+    monkeypatch.setitem(worker_mod.SCRAPERS, "siman", FakeScraper)
+    monkeypatch.setitem(worker_mod.SCRAPERS, "slow", SlowScraper)
+    w = worker_mod.Worker(name="w1", block_ms=None)
+    w.ensure_group()
+    return w
+
+
+def app_redis():
+    return app.auth.redis_client
+
+
+def enqueue(store="siman", query="tv", attempt=1, deadline_in=60.0, budgeted=False, job_id="job1"):
+    fields = jobs.encode_job(job_id, store, query, {}, attempt, time.time() + deadline_in, budgeted, "ana")
+    return app_redis().xadd(jobs.JOBS_STREAM, fields)
+
+
+def result(job_id="job1"):
+    raw = app_redis().lrange(jobs.result_key(job_id), 0, -1)
+    return orjson.loads(raw[0]) if raw else None
+
+
+def pending():
+    return app_redis().xpending(jobs.JOBS_STREAM, jobs.JOBS_GROUP)["pending"]
+
+
+def test_success_publishes_result_and_acks(worker):
+    enqueue()
+    assert worker.run_once() == 1
+    payload = result()
+    assert payload["results"][0]["name"] == "Televisor tv"
+    assert payload["incomplete"] is False
+    assert pending() == 0
+
+
+def test_failure_is_requeued_with_next_attempt(worker):
+    FakeScraper.fail = 1
+    enqueue()
+    worker.run_once()
+    assert result() is None
+    assert pending() == 0
+    entries = app_redis().xrange(jobs.JOBS_STREAM)
+    assert [jobs.decode_job(fields)["attempt"] for _, fields in entries] == [1, 2]
+
+    worker.run_once()
+    assert result()["results"]
+    assert FakeScraper.calls == 2
+
+
+def test_dead_letter_after_max_attempts(worker):
+    FakeScraper.fail = jobs.JOB_MAX_ATTEMPTS
+    enqueue()
+    for _ in range(jobs.JOB_MAX_ATTEMPTS):
+        worker.run_once()
+    assert FakeScraper.calls == jobs.JOB_MAX_ATTEMPTS
+    dead = app_redis().xrange(jobs.DEAD_STREAM)
+    assert len(dead) == 1
+    assert "tienda caída" in dead[0][1]["error"]
+    assert "tienda caída" in result()["error"]
+    assert pending() == 0
+
+
+def test_submit_surfaces_dead_letter_as_job_failed(worker, monkeypatch):
+    monkeypatch.setattr(jobs, "SCRAPE_EXECUTION", "queue")
+    FakeScraper.fail = jobs.JOB_MAX_ATTEMPTS
+
+    def drain():
+        for _ in range(200):
+            worker.run_once()
+            if app_redis().xlen(jobs.DEAD_STREAM):
+                return
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=drain)
+    thread.start()
+    with pytest.raises(jobs.JobFailed):
+        jobs.submit("siman", "tv", timeout_ms=5000, user="ana")
+    thread.join()
+
+
+def test_submit_times_out_without_workers(monkeypatch):
+    monkeypatch.setattr(jobs, "RESULT_GRACE", 0)
+    start = time.monotonic()
+    with pytest.raises(jobs.JobTimeout):
+        jobs.submit("siman", "tv", timeout_ms=200, user="ana")
+    assert time.monotonic() - start < 3
+
+
+def test_expired_job_is_discarded_without_scraping(worker):
+    enqueue(deadline_in=-1)
+    worker.run_once()
+    assert FakeScraper.calls == 0
+    assert result() is None
+    assert pending() == 0
+
+
+def test_unbudgeted_job_is_bounded_by_its_deadline(worker):
+    enqueue(store="slow", deadline_in=0.3, budgeted=False)
+    start = time.monotonic()
+    worker.run_once()
+    assert time.monotonic() - start < 2
+    assert FakeScraper.last_deadline.timeout_ms is not None
+    assert result()["incomplete"] is True
+
+
+def test_reclaim_waits_past_the_job_deadline(monkeypatch, worker):
+    # Un worker que tomó el trabajo y murió sin confirmarlo
+    enqueue(deadline_in=0.2)
+    app_redis().xreadgroup(jobs.JOBS_GROUP, "w0", {jobs.JOBS_STREAM: ">"}, count=1)
+
+    # Dentro de JOB_TIMEOUT + margen no se reclama (el dueño podría seguir vivo)
+    assert worker._reclaim() == []
+
+    monkeypatch.setattr(worker_mod, "JOB_TIMEOUT", 0)
+    monkeypatch.setattr(worker_mod, "RECLAIM_MARGIN", 0.3)
+    time.sleep(0.35)
+    # Reclamado ya vencido: se descarta en vez de correr por segunda vez
+    assert worker.run_once() == 1
+    assert FakeScraper.calls == 0
+    assert pending() == 0